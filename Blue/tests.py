@@ -1,3 +1,112 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from Blue import vouchers
+from utils.testing import FakeConnection
+
+PELANGGAN = '7b0d5a8e-0000-4000-8000-000000000001'
+VOUCHER = {'HEMAT': (7, 3, Decimal('20000')), 'SUPER': (30, 10, Decimal('50000'))}
+
+
+class FakeVoucherDB(FakeConnection):
+    """
+    Meniru efek PURCHASE_QUERY/REPLAY_QUERY: unique index (IdPelanggan,
+    KunciIdempoten) dan debit saldo MyPay yang hanya terjadi bila pembelian
+    benar-benar tersisip. Perubahan baru tersimpan saat commit.
+    """
+
+    def __init__(self, saldo):
+        super().__init__()
+        self.saldo = saldo
+        self.pembelian = {}  # (pelanggan, kunci) -> (id, kode, tgl_akhir)
+        self._pending = None
+        self._row = None
+
+    def execute(self, query, params=None):
+        super().execute(query, params)
+        if query is vouchers.REPLAY_QUERY:
+            pembelian = self.pembelian.get(params)
+            if pembelian is None:
+                self._row = None
+            else:
+                hari, kuota, _ = VOUCHER[pembelian[1]]
+                self._row = (hari, kuota, pembelian[0], pembelian[2], pembelian[1])
+            return
+
+        hari, kuota, harga = VOUCHER[params['kode']]
+        kunci = (params['user_id'], params['kunci'])
+        if params['kunci'] is not None and kunci in self.pembelian:
+            self._row = (hari, kuota, None, None, None)
+            return
+        tgl_akhir = date.today() + timedelta(days=hari)
+        saldo = self.saldo - harga if params['is_mypay'] and self.saldo >= harga else None
+        self._pending = (kunci, (params['pembelian_id'], params['kode'], tgl_akhir), saldo)
+        self._row = (hari, kuota, params['pembelian_id'], tgl_akhir, saldo)
+
+    def fetchone(self):
+        return self._row
+
+    def commit(self):
+        super().commit()
+        if self._pending:
+            kunci, pembelian, saldo = self._pending
+            if kunci[1] is not None:
+                self.pembelian[kunci] = pembelian
+            if saldo is not None:
+                self.saldo = saldo
+        self._pending = None
+
+    def rollback(self):
+        super().rollback()
+        self._pending = None
+
+
+@mock.patch('Blue.vouchers.get_kategori_mypay_id', return_value='kategori-voucher')
+@mock.patch('Blue.vouchers.get_metode_bayar_name', return_value='MyPay')
+class PurchaseVoucherReplayTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeVoucherDB(Decimal('100000'))
+        patcher = mock.patch('Blue.vouchers.get_db_connection', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replay_returns_first_purchase_without_second_debit(self, *_):
+        first = vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', 'klik-1')
+        replay = vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', ' klik-1 ')
+
+        self.assertFalse(first['replayed'])
+        self.assertEqual(first['saldo'], Decimal('80000'))
+        self.assertTrue(replay['replayed'])
+        self.assertEqual(replay['pembelian_id'], first['pembelian_id'])
+        self.assertEqual(replay['tgl_akhir'], first['tgl_akhir'])
+        self.assertIsNone(replay['saldo'])
+        self.assertEqual(self.db.saldo, Decimal('80000'))
+
+    def test_key_reused_for_other_voucher_is_conflict(self, *_):
+        vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', 'klik-1')
+        with self.assertRaises(vouchers.VoucherPurchaseError) as error:
+            vouchers.purchase_voucher(PELANGGAN, 'SUPER', 'mypay', 'klik-1')
+        self.assertEqual(error.exception.status, 409)
+        self.assertEqual(self.db.saldo, Decimal('80000'))
+
+    def test_without_key_every_request_is_a_new_purchase(self, *_):
+        first = vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay')
+        second = vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', '  ')
+        self.assertNotEqual(first['pembelian_id'], second['pembelian_id'])
+        self.assertEqual(self.db.saldo, Decimal('60000'))
+
+    def test_failed_purchase_does_not_consume_key(self, *_):
+        self.db.saldo = Decimal('10000')
+        with self.assertRaises(vouchers.VoucherPurchaseError):
+            vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', 'klik-1')
+        self.db.saldo = Decimal('100000')
+        purchase = vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', 'klik-1')
+        self.assertFalse(purchase['replayed'])
+        self.assertEqual(self.db.saldo, Decimal('80000'))
+
+    def test_overlong_key_is_rejected(self, *_):
+        with self.assertRaises(vouchers.VoucherPurchaseError):
+            vouchers.purchase_voucher(PELANGGAN, 'HEMAT', 'mypay', 'x' * (vouchers.MAX_IDEMPOTENCY_KEY_LENGTH + 1))
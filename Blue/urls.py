@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('discount/', views.discount_view, name='discount'),
     path('purchase_voucher/', views.purchase_voucher, name='purchase_voucher'),
+    path('api/voucher-saya/', views.voucher_wallet, name='voucher_wallet'),
 ]
@@ -8,10 +8,11 @@ from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.contrib import messages
 from decimal import Decimal
-import uuid
-from datetime import datetime, timedelta
 from utils.db_connection import get_db_connection
 from utils.decorators import custom_login_required
+from utils.reference_data import list_metode_bayar
+from Blue import vouchers
+from Blue.vouchers import VoucherPurchaseError
 import logging
 
 # Configure logger using your app's name
@@ -56,6 +57,7 @@ def discount_view(request):
         SELECT p.kode, p.tglakhirberlaku, d.potongan, d.mintrpemesanan
         FROM promo p
         JOIN diskon d ON p.kode = d.kode
+        WHERE p.tglakhirberlaku >= CURRENT_DATE
     """
     promos = execute_query(promo_query)
     promo_list = [
@@ -68,18 +70,13 @@ def discount_view(request):
         for row in promos
     ]
 
-    # Fetch available payment methods
-    payment_method_query = """
-        SELECT id, nama
-        FROM metode_bayar
-    """
-    payment_methods = execute_query(payment_method_query)
+    # Fetch available payment methods (cached reference data)
     payment_method_list = [
         {
-            'id': row[0],
-            'nama': row[1]
+            'id': metode_id,
+            'nama': nama
         }
-        for row in payment_methods
+        for metode_id, nama in list_metode_bayar()
     ]
 
     context = {
@@ -114,6 +111,7 @@ def purchase_voucher(request):
 
     voucher_code = request.POST.get('voucher_code')
     payment_method_id = request.POST.get('payment_method_id')
+    idempotency_key = request.POST.get('idempotency_key') or request.headers.get('Idempotency-Key')
 
     logger.debug(f"Voucher purchase details - voucher_code: {voucher_code}, payment_method_id: {payment_method_id}")
 
@@ -121,136 +119,52 @@ def purchase_voucher(request):
         logger.warning("Invalid request parameters.")
         return JsonResponse({'status': 'error', 'message': 'Parameter permintaan tidak valid.'}, status=400)
 
+    try:
+        purchase = vouchers.purchase_voucher(user_id, voucher_code, payment_method_id, idempotency_key)
+    except VoucherPurchaseError as e:
+        logger.warning(f"Voucher purchase failed for user {user_id}: {e}")
+        status = 'failure' if e.status == 400 else 'error'
+        return JsonResponse({'status': status, 'message': str(e)}, status=e.status)
+    except Exception as e:
+        logger.exception(f"Error processing voucher purchase for user {user_id}: {e}")
+        return JsonResponse({'status': 'error', 'message': 'Terjadi kesalahan saat memproses pembelian.'}, status=500)
 
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Voucher berhasil dibeli.',
+        'kode': purchase['kode'],
+        'hari_berlaku': purchase['hari_berlaku'],
+        'kuota': purchase['kuota'],
+        'tgl_akhir': purchase['tgl_akhir'].strftime('%Y-%m-%d'),
+        'replayed': purchase['replayed'],
+    })
 
-    # Fetch voucher details
-    voucher_query = """
-        SELECT v.jmlhariberlaku, v.kuotapenggunaan, v.harga, d.potongan, d.mintrpemesanan
-        FROM voucher v
-        JOIN diskon d ON v.kode = d.kode
-        WHERE v.kode = %s
-    """
-    voucher = execute_query(voucher_query, (voucher_code,), fetchone=True)
-    if not voucher:
-        logger.error(f"Voucher not found: {voucher_code}")
-        return JsonResponse({'status': 'error', 'message': 'Voucher tidak ditemukan.'}, status=404)
-
-    jml_hari_berlaku, kuota_penggunaan, harga_voucher, potongan, min_tr_pemesanan = voucher
-    logger.debug(f"Fetched voucher details - JmlHariBerlaku: {jml_hari_berlaku}, KuotaPenggunaan: {kuota_penggunaan}, Harga: {harga_voucher}")
 
-    # Check if user exists in pelanggan
-    pelanggan_query = """
-        SELECT u.id, u.saldomypay
-        FROM pelanggan p
-        JOIN "USER" u ON p.id = u.id
-        WHERE p.id = %s
+@custom_login_required
+def voucher_wallet(request):
     """
-    pelanggan = execute_query(pelanggan_query, (user_id,), fetchone=True)
-    if not pelanggan:
-        logger.error(f"User not found as Pelanggan: {user_id}")
-        return JsonResponse({'status': 'error', 'message': 'Pengguna tidak ditemukan sebagai Pelanggan.'}, status=404)
-
-    pelanggan_id, saldo_mypay = pelanggan
-    logger.debug(f"Pelanggan details - Id: {pelanggan_id}, SaldoMyPay: {saldo_mypay}")
-
-    # Fetch selected payment method name
-    payment_method_query = """
-        SELECT nama
-        FROM metode_bayar
-        WHERE id = %s
+    API voucher milik pelanggan yang masih bisa dipakai (belum kedaluwarsa
+    dan kuotanya belum habis).
     """
-    payment_method = execute_query(payment_method_query, (payment_method_id,), fetchone=True)
-    if not payment_method:
-        logger.error(f"Payment method not found: {payment_method_id}")
-        return JsonResponse({'status': 'error', 'message': 'Metode pembayaran tidak ditemukan.'}, status=404)
-
-    payment_method_name = payment_method[0]
-    logger.debug(f"Selected payment method: {payment_method_name}")
-
-    # Initialize transaction variables
-    transaction_success = False
-    failure_message = ''
+    user_id = request.session['user']['Id']
+    if request.session['user']['role'] != 'pelanggan':
+        return JsonResponse({'success': False, 'error': 'Hanya pelanggan yang memiliki voucher.'}, status=403)
 
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            if payment_method_name.lower() == 'mypay':
-                # Check if user has sufficient balance
-                if saldo_mypay >= harga_voucher:
-                    new_saldo = saldo_mypay - Decimal(harga_voucher)
-                    logger.debug(f"Deducting SaldoMyPay: {saldo_mypay} - {harga_voucher} = {new_saldo}")
-
-                    # Update SaldoMyPay
-                    update_saldo_query = """
-                        UPDATE "USER"
-                        SET saldomypay = %s
-                        WHERE id = %s
-                    """
-                    cursor.execute(update_saldo_query, (new_saldo, user_id))
-                    logger.debug("SaldoMyPay updated successfully.")
-
-                    # Insert into tr_pembelian_voucher
-                    tgl_awal = datetime.now().date()
-                    tgl_akhir = tgl_awal + timedelta(days=jml_hari_berlaku)
-                    insert_voucher_query = """
-                        INSERT INTO tr_pembelian_voucher (id, tglawal, tglakhir, telahdigunakan, idpelanggan, idvoucher, idmetodebayar)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    cursor.execute(insert_voucher_query, (
-                        str(uuid.uuid4()),
-                        tgl_awal,
-                        tgl_akhir,
-                        0,  # TelahDigunakan
-                        pelanggan_id,
-                        voucher_code,
-                        payment_method_id
-                    ))
-                    logger.debug("TR_PEMBELIAN_VOUCHER inserted successfully.")
-                    transaction_success = True
-                else:
-                    logger.warning(f"Insufficient SaldoMyPay: {saldo_mypay} < {harga_voucher}")
-                    failure_message = 'Saldo MyPay Anda tidak cukup untuk membeli voucher ini.'
-            else:
-                # For other payment methods, proceed without balance check
-                logger.debug("Processing voucher purchase with non-MyPay payment method.")
-
-                tgl_awal = datetime.now().date()
-                tgl_akhir = tgl_awal + timedelta(days=jml_hari_berlaku)
-                insert_voucher_query = """
-                    INSERT INTO tr_pembelian_voucher (id, tglawal, tglakhir, telahdigunakan, idpelanggan, idvoucher, idmetodebayar)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(insert_voucher_query, (
-                    str(uuid.uuid4()),
-                    tgl_awal,
-                    tgl_akhir,
-                    0,  # TelahDigunakan
-                    pelanggan_id,
-                    voucher_code,
-                    payment_method_id
-                ))
-                logger.debug("TR_PEMBELIAN_VOUCHER inserted successfully with non-MyPay method.")
-                transaction_success = True
-
-            if transaction_success:
-                conn.commit()
-                logger.info(f"Voucher purchased successfully by user {user_id}: {voucher_code}")
-                return JsonResponse({
-                    'status': 'success',
-                    'message': 'Voucher berhasil dibeli.',
-                    'kode': voucher_code,
-                    'hari_berlaku': jml_hari_berlaku,
-                    'kuota': kuota_penggunaan
-                })
-            else:
-                conn.rollback()
-                logger.warning(f"Voucher purchase failed for user {user_id}: {failure_message}")
-                return JsonResponse({'status': 'failure', 'message': failure_message}, status=400)
-
+        wallet = vouchers.fetch_wallet(user_id)
     except Exception as e:
-        conn.rollback()
-        logger.exception(f"Error processing voucher purchase for user {user_id}: {e}")
-        return JsonResponse({'status': 'error', 'message': 'Terjadi kesalahan saat memproses pembelian.'}, status=500)
-    finally:
-        conn.close()
-        logger.debug("Database connection closed in purchase_voucher view.")
+        logger.exception(f"Error fetching voucher wallet for user {user_id}: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'vouchers': [
+            {
+                **voucher,
+                'tgl_akhir': voucher['tgl_akhir'].strftime('%Y-%m-%d'),
+                'potongan': float(voucher['potongan'] or 0),
+                'min_transaksi': float(voucher['min_transaksi'] or 0),
+            }
+            for voucher in wallet
+        ],
+    })
@@ -0,0 +1,196 @@
+# Blue/vouchers.py
+
+import logging
+import uuid
+from datetime import datetime
+
+from utils.db_connection import get_db_connection
+from utils.reference_data import KategoriMyPay, MetodeBayar, get_kategori_mypay_id, get_metode_bayar_name
+
+logger = logging.getLogger(__name__)
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+
+
+class VoucherPurchaseError(Exception):
+    """Pembelian voucher ditolak; pesan ditujukan untuk ditampilkan ke pengguna."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# Satu statement: ambil voucher, sisipkan pembelian (idempoten lewat unique
+# index (IdPelanggan, KunciIdempoten)), lalu potong saldo dan catat tr_mypay
+# hanya bila pembelian benar-benar tersisip. Saldo dicek oleh debit_dompet.
+PURCHASE_QUERY = """
+    WITH voucher AS (
+        SELECT v.Kode, v.JmlHariBerlaku, v.KuotaPenggunaan, v.Harga
+        FROM VOUCHER v
+        WHERE v.Kode = %(kode)s
+    ), pembelian AS (
+        INSERT INTO TR_PEMBELIAN_VOUCHER
+            (Id, TglAwal, TglAkhir, TelahDigunakan, IdPelanggan, IdVoucher, IdMetodeBayar, KunciIdempoten)
+        SELECT %(pembelian_id)s, CURRENT_DATE, CURRENT_DATE + voucher.JmlHariBerlaku, 0,
+               pl.Id, voucher.Kode, %(metode_id)s, %(kunci)s
+        FROM voucher
+        JOIN PELANGGAN pl ON pl.Id = %(user_id)s
+        ON CONFLICT (IdPelanggan, KunciIdempoten) DO NOTHING
+        RETURNING Id, TglAkhir
+    ), saldo AS (
+        SELECT %(user_id)s::uuid AS Id, debit_dompet(%(user_id)s, voucher.Harga) AS SaldoMyPay, voucher.Harga
+        FROM voucher, pembelian
+        WHERE %(is_mypay)s
+    ), ledger AS (
+        INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+        SELECT %(tr_id)s, saldo.Id, %(tgl)s, -saldo.Harga, %(kategori)s
+        FROM saldo
+        WHERE saldo.SaldoMyPay IS NOT NULL
+    )
+    SELECT voucher.JmlHariBerlaku, voucher.KuotaPenggunaan,
+           (SELECT Id FROM pembelian), (SELECT TglAkhir FROM pembelian),
+           (SELECT SaldoMyPay FROM saldo)
+    FROM voucher
+"""
+
+REPLAY_QUERY = """
+    SELECT v.JmlHariBerlaku, v.KuotaPenggunaan, tpv.Id, tpv.TglAkhir, tpv.IdVoucher
+    FROM TR_PEMBELIAN_VOUCHER tpv
+    JOIN VOUCHER v ON v.Kode = tpv.IdVoucher
+    WHERE tpv.IdPelanggan = %s AND tpv.KunciIdempoten = %s
+"""
+
+
+def _result(kode, hari_berlaku, kuota, pembelian_id, tgl_akhir, saldo, replayed=False):
+    return {
+        'kode': kode,
+        'hari_berlaku': hari_berlaku,
+        'kuota': kuota,
+        'pembelian_id': str(pembelian_id),
+        'tgl_akhir': tgl_akhir,
+        'saldo': saldo,
+        'replayed': replayed,
+    }
+
+
+def purchase_voucher(user_id, kode, metode_id, idempotency_key=None):
+    """
+    Beli voucher ``kode`` untuk pelanggan dalam satu transaksi pada satu koneksi.
+    Dengan MyPay, saldo dipotong dan dicatat di tr_mypay hanya bila cukup.
+    ``idempotency_key`` dari klien membuat pengulangan request yang sama
+    mengembalikan pembelian pertama tanpa memotong saldo lagi.
+    Mengembalikan dict hasil pembelian, atau raise VoucherPurchaseError.
+    """
+    metode_nama = get_metode_bayar_name(metode_id)
+    if not metode_nama:
+        raise VoucherPurchaseError('Metode pembayaran tidak ditemukan.', status=404)
+    is_mypay = metode_nama.lower() == MetodeBayar.MYPAY.lower()
+
+    kategori_id = get_kategori_mypay_id(KategoriMyPay.PEMBELIAN_VOUCHER)
+    if is_mypay and kategori_id is None:
+        logger.error(f"Kategori tr_mypay '{KategoriMyPay.PEMBELIAN_VOUCHER}' tidak ditemukan.")
+        raise VoucherPurchaseError('Kategori transaksi tidak valid.', status=500)
+
+    idempotency_key = (idempotency_key or '').strip() or None
+    if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise VoucherPurchaseError('Kunci idempotensi tidak valid.')
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(PURCHASE_QUERY, {
+                'kode': kode,
+                'pembelian_id': str(uuid.uuid4()),
+                'metode_id': metode_id,
+                'kunci': idempotency_key,
+                'user_id': user_id,
+                'is_mypay': is_mypay,
+                'tr_id': str(uuid.uuid4()),
+                'tgl': datetime.now(),
+                'kategori': kategori_id,
+            })
+            row = cursor.fetchone()
+            if not row:
+                raise VoucherPurchaseError('Voucher tidak ditemukan.', status=404)
+            hari_berlaku, kuota, pembelian_id, tgl_akhir, saldo = row
+
+            if pembelian_id is None:
+                # Kunci sudah dipakai (request diulang) atau bukan pelanggan
+                replay = None
+                if idempotency_key:
+                    cursor.execute(REPLAY_QUERY, (user_id, idempotency_key))
+                    replay = cursor.fetchone()
+                if not replay:
+                    raise VoucherPurchaseError('Pengguna tidak ditemukan sebagai Pelanggan.', status=404)
+                if replay[4] != kode:
+                    raise VoucherPurchaseError('Kunci idempotensi sudah dipakai untuk voucher lain.', status=409)
+                conn.commit()
+                logger.info(f"Voucher purchase replayed for user {user_id}: {kode}")
+                return _result(kode, replay[0], replay[1], replay[2], replay[3], None, replayed=True)
+
+            if is_mypay and saldo is None:
+                raise VoucherPurchaseError('Saldo MyPay Anda tidak cukup untuk membeli voucher ini.')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"Voucher purchased by user {user_id}: {kode}")
+    return _result(kode, hari_berlaku, kuota, pembelian_id, tgl_akhir, saldo)
+
+
+# Voucher milik pelanggan yang masih bisa dipakai; kondisinya sama dengan
+# trigger validate_voucher_usage_and_expiry dan memakai indeks
+# idx_pembelian_voucher_dompet (IdPelanggan, IdVoucher, TglAkhir).
+WALLET_QUERY = """
+    SELECT tpv.Id, tpv.IdVoucher, tpv.TglAkhir, tpv.TelahDigunakan, v.KuotaPenggunaan,
+           d.Potongan, d.MinTrPemesanan
+    FROM TR_PEMBELIAN_VOUCHER tpv
+    JOIN VOUCHER v ON v.Kode = tpv.IdVoucher
+    JOIN DISKON d ON d.Kode = tpv.IdVoucher
+    WHERE tpv.IdPelanggan = %(pelanggan)s
+      {kode_filter}
+      AND tpv.TglAkhir >= CURRENT_DATE
+      AND (v.KuotaPenggunaan IS NULL OR tpv.TelahDigunakan < v.KuotaPenggunaan)
+    ORDER BY tpv.IdVoucher, tpv.TglAkhir, tpv.TglAwal DESC
+"""
+
+
+def fetch_wallet(pelanggan_id, kode=None):
+    """
+    Voucher pelanggan yang belum kedaluwarsa dan kuotanya belum habis,
+    satu entri per pembelian. ``kode`` membatasi ke satu kode voucher.
+    """
+    params = {'pelanggan': pelanggan_id}
+    kode_filter = ""
+    if kode:
+        kode_filter = "AND tpv.IdVoucher = %(kode)s"
+        params['kode'] = kode
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(WALLET_QUERY.format(kode_filter=kode_filter), params)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            'pembelian_id': str(pembelian_id),
+            'kode': kode,
+            'tgl_akhir': tgl_akhir,
+            'telah_digunakan': telah_digunakan,
+            'sisa_kuota': kuota - telah_digunakan if kuota is not None else None,
+            'potongan': potongan,
+            'min_transaksi': min_transaksi,
+        }
+        for pembelian_id, kode, tgl_akhir, telah_digunakan, kuota, potongan, min_transaksi in rows
+    ]
+
+
+def has_usable_voucher(pelanggan_id, kode):
+    """True bila pelanggan memiliki pembelian voucher ``kode`` yang masih bisa dipakai."""
+    return bool(fetch_wallet(pelanggan_id, kode))
@@ -0,0 +1,82 @@
+# benchmark/database.py
+
+import logging
+from pathlib import Path
+
+from django.conf import settings
+
+from utils.db_connection import get_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+TRIGGER_DIR = Path(settings.BASE_DIR) / 'trigger'
+
+# Urutan penerapan trigger/*.sql; MERAH membuat proyeksi status terkini
+TRIGGER_FILES = ('TRIGGER_KUNING.sql', 'TRIGGER_HIJAU.sql', 'TRIGGER_BIRU.sql', 'TRIGGER_MERAH.sql')
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+LOCAL_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+INFO_TABLE = "BENCHMARK_INFO"
+
+
+def is_local_database():
+    """Basis data terkonfigurasi (DATABASE_URL) dan berada di mesin ini."""
+    database = settings.DATABASES['default']
+    if not database.get('NAME') or database.get('ENGINE', 'django.db.backends.dummy') == 'django.db.backends.dummy':
+        return False
+    return (database.get('HOST') or '') in LOCAL_HOSTS
+
+
+def scale_sizes(pesanan):
+    """Jumlah pelanggan dan pekerja untuk sejumlah pesanan."""
+    return {
+        'pesanan': pesanan,
+        'pelanggan': max(200, pesanan // 10),
+        'pekerja': max(80, pesanan // 40),
+    }
+
+
+def seeded_scale():
+    """(skala, seed) yang terakhir di-seed, atau None bila skema belum dibuat."""
+    conn = get_dedicated_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", (f"sijarta.{INFO_TABLE.lower()}",))
+            if cursor.fetchone()[0] is None:
+                return None
+            cursor.execute(f"SELECT Skala, Seed FROM {INFO_TABLE}")
+            return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _execute_file(cursor, path, params=None):
+    logger.info(f"Executing {path.name}")
+    cursor.execute(path.read_text(), params)
+
+
+def create_and_seed(scale, seed=0.42, stdout=None):
+    """
+    Buat ulang skema sijarta, isi data sesuai ``scale`` (kunci SCALES), lalu
+    terapkan trigger/*.sql sehingga fungsi, indeks, dan tabel proyeksi
+    dibangun dari data yang sudah ada. Seluruhnya dalam satu transaksi.
+    """
+    sizes = scale_sizes(SCALES[scale])
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            _execute_file(cursor, BENCHMARK_DIR / 'schema.sql')
+            if stdout:
+                stdout.write(f"Seeding {sizes['pesanan']} pesanan, {sizes['pelanggan']} pelanggan, {sizes['pekerja']} pekerja...")
+            _execute_file(cursor, BENCHMARK_DIR / 'seed.sql', {'seed': seed, **sizes})
+            for name in TRIGGER_FILES:
+                _execute_file(cursor, TRIGGER_DIR / name)
+            cursor.execute(f"CREATE TABLE {INFO_TABLE} (Skala VARCHAR(10) NOT NULL, Seed FLOAT NOT NULL)")
+            cursor.execute(f"INSERT INTO {INFO_TABLE} VALUES (%s, %s)", (scale, seed))
+            cursor.execute("ANALYZE")
@@ -0,0 +1,303 @@
+# benchmark/generator.py
+
+import hashlib
+import io
+import logging
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+from utils.db_connection import get_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+# Tahap pesanan dan peluang kumulatifnya (per 100). Tahap 1..6 mengikuti alur
+# status merah.views; tahap 7 = dibatalkan saat 'Mencari Pekerja Terdekat'.
+TAHAP_KUMULATIF = ((10, 1), (25, 2), (35, 3), (40, 4), (45, 5), (90, 6), (100, 7))
+
+ALUR_STATUS = (
+    'Menunggu Pembayaran',
+    'Mencari Pekerja Terdekat',
+    'Menunggu Pekerja Terdekat',
+    'Pekerja Tiba di Lokasi',
+    'Pelayanan Jasa Sedang Dilakukan',
+    'Pemesanan Selesai',
+)
+STATUS_DIBATALKAN = 'Pemesanan Dibatalkan'
+
+PASSWORD = 'password'
+COPY_BUFFER_ROWS = 20_000
+
+# Kolom eksplisit agar kolom tambahan (mis. KunciIdempoten) tetap default
+COPY_COLUMNS = {
+    '"USER"': '(Id, Nama, JenisKelamin, NoHP, Pwd, TglLahir, Alamat)',
+    'PELANGGAN': '(Id, Level)',
+    'PEKERJA': '(Id, NamaBank, NomorRekening, NPWP, LinkFoto, Rating, JmlPesananSelesai)',
+    'PEKERJA_KATEGORI_JASA': '(PekerjaId, KategoriJasaId)',
+    'TR_PEMESANAN_JASA': (
+        '(Id, TglPemesanan, TglPekerjaan, WaktuPekerjaan, TotalBiaya, '
+        'IdPelanggan, IdPekerja, IdKategoriJasa, Sesi, IdDiskon, IdMetodeBayar)'
+    ),
+    'TR_PEMESANAN_STATUS': '(IdTrPemesanan, IdStatus, TglWaktu)',
+    'TR_MYPAY': '(Id, UserId, Tgl, Nominal, KategoriId)',
+    'TESTIMONI': '(IdTrPemesanan, Tgl, Teks, Rating)',
+    'TR_PEMBELIAN_VOUCHER': '(Id, TglAwal, TglAkhir, TelahDigunakan, IdPelanggan, IdVoucher, IdMetodeBayar)',
+}
+
+
+def stable_id(prefix, number):
+    """UUID deterministik, sama dengan md5(prefix || number)::uuid di Postgres."""
+    return str(uuid.UUID(hashlib.md5(f'{prefix}{number}'.encode()).hexdigest()))
+
+
+class CopyWriter:
+    """Kumpulkan baris per tabel dalam format teks COPY dan kirim per COPY_BUFFER_ROWS baris."""
+
+    def __init__(self, cursor, tables):
+        self.cursor = cursor
+        # Urutan tabel = urutan flush (tabel induk lebih dulu)
+        self.buffers = {table: io.StringIO() for table in tables}
+        self.pending = {table: 0 for table in tables}
+        self.rows = 0
+
+    def write(self, table, *values):
+        self.buffers[table].write('\t'.join(r'\N' if value is None else str(value) for value in values))
+        self.buffers[table].write('\n')
+        self.pending[table] += 1
+        self.rows += 1
+        if self.pending[table] >= COPY_BUFFER_ROWS:
+            self.flush()
+
+    def flush(self):
+        for table, buffer in self.buffers.items():
+            if not self.pending[table]:
+                continue
+            buffer.seek(0)
+            self.cursor.copy_expert(f"COPY {table} {COPY_COLUMNS[table]} FROM STDIN", buffer)
+            buffer.seek(0)
+            buffer.truncate()
+            self.pending[table] = 0
+
+
+def load_dimensions():
+    """Id kategori, subkategori beserta harga sesinya, dan data referensi yang dibutuhkan generator."""
+    conn = get_dedicated_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT Id::text FROM KATEGORI_JASA ORDER BY Id")
+            kategori = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT sj.Id::text, sj.KategoriJasaId::text, sl.Sesi, sl.Harga
+                FROM SUBKATEGORI_JASA sj
+                JOIN SESI_LAYANAN sl ON sl.SubKategoriId = sj.Id
+                ORDER BY sj.Id, sl.Sesi
+            """)
+            sesi = cursor.fetchall()
+            cursor.execute("SELECT Status, Id::text FROM STATUS_PEMESANAN")
+            status = dict(cursor.fetchall())
+            cursor.execute("SELECT Nama, Id::text FROM METODE_BAYAR")
+            metode = dict(cursor.fetchall())
+            cursor.execute("SELECT Nama, Id::text FROM KATEGORI_TR_MYPAY")
+            kategori_mypay = dict(cursor.fetchall())
+            cursor.execute("SELECT Kode, JmlHariBerlaku, COALESCE(KuotaPenggunaan, 1), Harga FROM VOUCHER ORDER BY Kode")
+            voucher = cursor.fetchall()
+    finally:
+        conn.close()
+
+    subkategori = {}
+    for sub_id, kategori_id, nomor_sesi, harga in sesi:
+        sub = subkategori.setdefault(sub_id, {'id': sub_id, 'kategori': kategori.index(kategori_id), 'harga': {}})
+        sub['harga'][nomor_sesi] = harga
+    return {
+        'kategori': kategori,
+        'subkategori': list(subkategori.values()),
+        'status': status,
+        'metode': metode,
+        # Metode selain MyPay untuk pesanan/pembelian yang tidak memotong saldo
+        'metode_lain': next((metode_id for nama, metode_id in sorted(metode.items()) if nama != 'MyPay'), None),
+        'kategori_mypay': kategori_mypay,
+        'voucher': voucher,
+    }
+
+
+def _session_setup(cursor, defer_triggers):
+    if defer_triggers:
+        # Trigger dan FK tidak dijalankan; efeknya dibangun ulang setelah load
+        cursor.execute("SET session_replication_role = replica")
+
+
+def generate_users(task):
+    """Worker: pelanggan/pekerja nomor [start, end). Mengembalikan jumlah baris."""
+    role, start, end, dims, seed, defer_triggers = task
+    rng = random.Random(f'{seed}:{role}:{start}')
+    jumlah_kategori = len(dims['kategori'])
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            _session_setup(cursor, defer_triggers)
+            if role == 'pelanggan':
+                writer = CopyWriter(cursor, ('"USER"', 'PELANGGAN', 'TR_PEMBELIAN_VOUCHER'))
+            else:
+                writer = CopyWriter(cursor, ('"USER"', 'PEKERJA', 'PEKERJA_KATEGORI_JASA'))
+            today = date.today()
+            for g in range(start, end):
+                user_id = stable_id(role, g)
+                prefix = '081' if role == 'pelanggan' else '082'
+                writer.write(
+                    '"USER"', user_id, f'{role.capitalize()} {g}', 'LP'[g % 2], f'{prefix}{g:09d}', PASSWORD,
+                    date(1970, 1, 1) + timedelta(days=(g * 37) % 12000), f'Jl. {role.capitalize()} No. {g}',
+                )
+                if role == 'pelanggan':
+                    writer.write('PELANGGAN', user_id, ('Basic', 'Silver', 'Gold')[g % 3])
+                    if g % 3 == 0 and dims['voucher']:
+                        kode, hari, kuota, _ = dims['voucher'][g % len(dims['voucher'])]
+                        tgl_awal = today - timedelta(days=g % 60)
+                        writer.write(
+                            'TR_PEMBELIAN_VOUCHER', stable_id('pembelian', g), tgl_awal,
+                            tgl_awal + timedelta(days=hari), rng.randrange(kuota + 1), user_id, kode,
+                            # Pembelian dengan MyPay dicatat di ledger oleh finalize()
+                            dims['metode']['MyPay'] if g % 2 == 0 else dims['metode_lain'],
+                        )
+                else:
+                    writer.write(
+                        'PEKERJA', user_id, ('BCA', 'BNI', 'Mandiri', 'BRI')[g % 4], f'{g:012d}', f'{g:015d}',
+                        f'https://example.com/foto/{g}.jpg', 0, 0,
+                    )
+                    # Pekerja ke-g melayani kategori (g-1) mod K dan (g+2) mod K
+                    for c in sorted({(g - 1) % jumlah_kategori, (g + 2) % jumlah_kategori}):
+                        writer.write('PEKERJA_KATEGORI_JASA', user_id, dims['kategori'][c])
+            writer.flush()
+    return writer.rows
+
+
+def _tahap(rng):
+    nilai = rng.randrange(100)
+    for batas, tahap in TAHAP_KUMULATIF:
+        if nilai < batas:
+            return tahap
+
+
+def generate_orders(task):
+    """
+    Worker: pesanan nomor [start, end) beserta riwayat status, pembayaran MyPay,
+    dan testimoni. Honor dan refund hanya ditulis bila trigger ditunda; bila
+    trigger aktif, refund ditulis trigger dan honor diantrekan untuk
+    settle_payouts. Mengembalikan jumlah baris.
+    """
+    start, end, dims, sizes, seed, defer_triggers = task
+    rng = random.Random(f'{seed}:pesanan:{start}')
+    status = dims['status']
+    metode_mypay, metode_lain = dims['metode']['MyPay'], dims['metode_lain']
+    kategori_mypay = dims['kategori_mypay']
+    jumlah_kategori = len(dims['kategori'])
+    pekerja_per_kategori = max(1, sizes['pekerja'] // jumlah_kategori)
+    today = datetime.combine(date.today(), datetime.min.time())
+
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            _session_setup(cursor, defer_triggers)
+            writer = CopyWriter(cursor, ('TR_PEMESANAN_JASA', 'TR_PEMESANAN_STATUS', 'TR_MYPAY', 'TESTIMONI'))
+            for g in range(start, end):
+                pesanan_id = stable_id('pesanan', g)
+                pelanggan = 1 + int(sizes['pelanggan'] * rng.random() ** 2)
+                pelanggan_id = stable_id('pelanggan', pelanggan)
+                sub = dims['subkategori'][rng.randrange(len(dims['subkategori']))]
+                sesi = rng.choice(list(sub['harga']))
+                total = sub['harga'][sesi]
+                tahap = _tahap(rng)
+                mypay = rng.random() < 0.5
+                tgl = today - timedelta(days=rng.randrange(365))
+                pekerja = 1 + sub['kategori'] + jumlah_kategori * rng.randrange(pekerja_per_kategori)
+                pekerja_id = stable_id('pekerja', pekerja) if 3 <= tahap <= 6 and pekerja <= sizes['pekerja'] else None
+
+                writer.write(
+                    'TR_PEMESANAN_JASA', pesanan_id, tgl.date(), tgl.date() + timedelta(days=1),
+                    tgl + timedelta(days=1, hours=9), total, pelanggan_id, pekerja_id, sub['id'], sesi, None,
+                    metode_mypay if mypay else metode_lain,
+                )
+                alur = ALUR_STATUS[:2] + (STATUS_DIBATALKAN,) if tahap == 7 else ALUR_STATUS[:tahap]
+                for k, nama in enumerate(alur, start=1):
+                    writer.write('TR_PEMESANAN_STATUS', pesanan_id, status[nama], tgl + timedelta(hours=k))
+
+                if mypay and tahap >= 2:
+                    # Pembayaran Jasa dicatat positif (lihat merah.mypay.EFEK_SALDO_SQL)
+                    writer.write('TR_MYPAY', stable_id('bayar', g), pelanggan_id, tgl + timedelta(hours=2),
+                                 total, kategori_mypay['Pembayaran Jasa'])
+                if defer_triggers and tahap == 6 and pekerja_id:
+                    writer.write('TR_MYPAY', stable_id('honor', g), pekerja_id, tgl + timedelta(hours=6),
+                                 total, kategori_mypay['Menerima Honor'])
+                if defer_triggers and tahap == 7 and mypay:
+                    writer.write('TR_MYPAY', stable_id('refund', g), pelanggan_id, tgl + timedelta(hours=3),
+                                 total, kategori_mypay['Refund'])
+                if tahap == 6 and pekerja_id and rng.random() < 0.6:
+                    writer.write('TESTIMONI', pesanan_id, tgl.date() + timedelta(days=1), f'Testimoni pesanan {g}',
+                                 rng.choice((1, 2, 3, 4, 4, 5, 5, 5)))
+            writer.flush()
+    return writer.rows
+
+
+# Dijalankan setelah semua worker selesai, dalam satu transaksi
+FINALIZE_QUERIES = (
+    # Ledger pembelian voucher dengan MyPay
+    """
+    INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+    SELECT md5('tr-voucher' || tpv.Id)::uuid, tpv.IdPelanggan, tpv.TglAwal, -v.Harga, k.Id
+    FROM TR_PEMBELIAN_VOUCHER tpv
+    JOIN VOUCHER v ON v.Kode = tpv.IdVoucher
+    JOIN METODE_BAYAR mb ON mb.Id = tpv.IdMetodeBayar AND mb.Nama = 'MyPay'
+    JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Pembelian Voucher'
+    ON CONFLICT (Id) DO NOTHING
+    """,
+    # Top up awal yang menutup seluruh pengeluaran pelanggan
+    """
+    INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+    SELECT md5('topup' || pl.Id)::uuid, pl.Id, CURRENT_DATE - 400,
+           COALESCE(keluar.total, 0) + 100000, k.Id
+    FROM PELANGGAN pl
+    JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Top Up'
+    LEFT JOIN (
+        SELECT t.UserId, SUM(ABS(t.Nominal)) AS total
+        FROM TR_MYPAY t
+        JOIN KATEGORI_TR_MYPAY kt ON kt.Id = t.KategoriId
+        WHERE kt.Nama IN ('Pembayaran Jasa', 'Pembelian Voucher')
+        GROUP BY t.UserId
+    ) keluar ON keluar.UserId = pl.Id
+    ON CONFLICT (Id) DO NOTHING
+    """,
+    # Saldo dompet = jumlah efek ledger (sub-saldo dilipat ke saldo utama)
+    "DELETE FROM DOMPET_SLOT",
+    """
+    INSERT INTO DOMPET (UserId, Saldo)
+    SELECT u.Id, COALESCE(s.saldo, 0)
+    FROM "USER" u
+    LEFT JOIN (
+        SELECT t.UserId,
+               SUM(CASE WHEN k.Nama = 'Pembayaran Jasa' THEN -ABS(t.Nominal) ELSE t.Nominal END) AS saldo
+        FROM TR_MYPAY t
+        JOIN KATEGORI_TR_MYPAY k ON k.Id = t.KategoriId
+        GROUP BY t.UserId
+    ) s ON s.UserId = u.Id
+    ON CONFLICT (UserId) DO UPDATE SET Saldo = EXCLUDED.Saldo
+    WHERE DOMPET.Saldo IS DISTINCT FROM EXCLUDED.Saldo
+    """,
+    # Jumlah pesanan selesai per pekerja dari riwayat status
+    """
+    UPDATE PEKERJA pk SET JmlPesananSelesai = s.jumlah
+    FROM (
+        SELECT tpj.IdPekerja, COUNT(*) AS jumlah
+        FROM TR_PEMESANAN_STATUS ts
+        JOIN STATUS_PEMESANAN sp ON sp.Id = ts.IdStatus AND sp.Status = 'Pemesanan Selesai'
+        JOIN TR_PEMESANAN_JASA tpj ON tpj.Id = ts.IdTrPemesanan
+        WHERE tpj.IdPekerja IS NOT NULL
+        GROUP BY tpj.IdPekerja
+    ) s
+    WHERE pk.Id = s.IdPekerja AND pk.JmlPesananSelesai IS DISTINCT FROM s.jumlah
+    """,
+)
+
+
+def finalize():
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            for query in FINALIZE_QUERIES:
+                cursor.execute(query)
+            cursor.execute("ANALYZE")
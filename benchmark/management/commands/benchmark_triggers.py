@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark import triggers
+
+
+class Command(BaseCommand):
+    help = (
+        "Ukur overhead trigger per baris TR_PEMESANAN_STATUS yang disisipkan "
+        "(EXPLAIN ANALYZE) untuk status tanpa handler, honor, dan refund. "
+        "Semua insert di-rollback sehingga aman dijalankan pada data benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help="Jumlah baris status per skenario.")
+        parser.add_argument('--scenarios', nargs='+', choices=sorted(triggers.SCENARIOS),
+                            default=list(triggers.SCENARIOS))
+        parser.add_argument('--output', metavar='FILE', help="Simpan hasil sebagai JSON.")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows minimal 1.")
+
+        result = triggers.run(options['scenarios'], options['rows'])
+        for name, stats in result.items():
+            if not stats['rows']:
+                self.stdout.write(self.style.WARNING(f"{name:<14} tidak ada pesanan yang cocok, dilewati."))
+                continue
+            self.stdout.write(
+                f"{name:<14} {stats['rows']:>6} baris  eksekusi {stats['execution_ms']:>9.2f} ms  "
+                f"trigger {stats['trigger_us_per_row']:>8.2f} us/baris"
+            )
+            for trigger_name, trigger in stats['triggers'].items():
+                self.stdout.write(
+                    f"    {trigger_name:<40} {trigger['calls']:>6} panggilan  {trigger['us_per_row']:>8.2f} us/baris"
+                )
+
+        if options['output']:
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(result, indent=2, sort_keys=True))
+            self.stdout.write(self.style.SUCCESS(f"Hasil disimpan di {path}"))
@@ -0,0 +1,80 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from benchmark import database, runner
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark view utama (homepage, subcategory_jasa, view_pesanan, pekerjaan_jasa, "
+        "transaksi_list, transaksi_form) terhadap Postgres lokal yang di-seed. "
+        "Melaporkan p50/p95/p99, jumlah query, dan alokasi memori, lalu menyimpan "
+        "hasil sebagai JSON di benchmark/results/. Skema sijarta pada DATABASE_URL "
+        "akan dibuat ulang, jadi gunakan basis data khusus benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(database.SCALES), default='10k',
+                            help="Jumlah pesanan yang di-seed.")
+        parser.add_argument('--seed', type=float, default=0.42,
+                            help="Seed random Postgres (-1..1) agar data bisa direproduksi.")
+        parser.add_argument('--reseed', action='store_true',
+                            help="Buat ulang skema dan data walaupun skala yang sama sudah di-seed.")
+        parser.add_argument('--views', nargs='+', choices=sorted(runner.VIEWS), default=list(runner.VIEWS),
+                            help="View yang diukur.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--output-dir', default=str(runner.RESULTS_DIR))
+        parser.add_argument('--compare', metavar='FILE',
+                            help="Hasil JSON sebelumnya sebagai pembanding.")
+        parser.add_argument('--max-regression', type=float, default=10.0,
+                            help="Persen kenaikan latensi/alokasi yang dianggap regresi.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--allow-remote', action='store_true',
+                            help="Izinkan DATABASE_URL non-lokal (skema akan dihapus!).")
+
+    def handle(self, *args, **options):
+        if not database.is_local_database() and not options['allow_remote']:
+            raise CommandError("DATABASE_URL bukan basis data lokal; gunakan --allow-remote bila memang disengaja.")
+        if options['iterations'] < 1:
+            raise CommandError("--iterations minimal 1.")
+
+        if options['reseed'] or database.seeded_scale() != (options['scale'], options['seed']):
+            self.stdout.write(f"Membuat skema dan data skala {options['scale']}...")
+            database.create_and_seed(options['scale'], options['seed'], stdout=self.stdout)
+
+        # Tabel session Django (SESSION_ENGINE cached_db)
+        call_command('migrate', interactive=False, verbosity=0)
+
+        # Izinkan host 'testserver' milik django.test.Client
+        setup_test_environment()
+        result = runner.run(options['scale'], options['seed'], options['views'],
+                            options['iterations'], options['warmup'])
+
+        for name, stats in result['views'].items():
+            self.stdout.write(
+                f"{name:<18} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+                f"p99 {stats['p99_ms']:>8.2f} ms  queries {stats['queries']}  "
+                f"alloc {stats['alloc_peak_kb']} KiB  (status {stats['status']})"
+            )
+        path = runner.save(result, options['output_dir'])
+        self.stdout.write(self.style.SUCCESS(f"Hasil disimpan di {path}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            if baseline.get('scale') != result['scale']:
+                self.stdout.write(self.style.WARNING(
+                    f"Skala pembanding ({baseline.get('scale')}) berbeda dengan run ini ({result['scale']})."
+                ))
+            lines, regressions = runner.compare(baseline, result, options['max_regression'])
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                message = "Regresi: " + ", ".join(regressions)
+                if options['fail_on_regression']:
+                    raise CommandError(message)
+                self.stdout.write(self.style.WARNING(message))
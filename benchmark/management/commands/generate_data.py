@@ -0,0 +1,116 @@
+import multiprocessing
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmark import generator
+from benchmark.database import scale_sizes
+from utils.db_connection import get_dedicated_connection
+
+FACT_TABLES = (
+    'TESTIMONI', 'TR_PEMESANAN_STATUS', 'TR_PEMESANAN_JASA', 'TR_PEMBELIAN_VOUCHER', 'TR_MYPAY',
+    'PEKERJA_KATEGORI_JASA', 'PELANGGAN', 'PEKERJA', '"USER"',
+)
+
+
+def _chunks(total, chunk_size):
+    """Rentang [start, end) bernomor mulai 1."""
+    return [(start, min(start + chunk_size, total + 1)) for start in range(1, total + 1, chunk_size)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bangkitkan data sintetis dalam jumlah besar (pengguna, pesanan, riwayat status, "
+        "MyPay, testimoni, pembelian voucher) lewat COPY FROM STDIN di beberapa proses "
+        "paralel. Kategori, sesi layanan, voucher, dan data referensi harus sudah ada "
+        "(mis. dari benchmark_views)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pesanan', type=int, default=1_000_000)
+        parser.add_argument('--pelanggan', type=int, help="Default: pesanan / 10.")
+        parser.add_argument('--pekerja', type=int, help="Default: pesanan / 40.")
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help="Jumlah proses paralel; selalu 1 bila trigger aktif.")
+        parser.add_argument('--chunk-size', type=int, default=50_000,
+                            help="Jumlah pesanan/pengguna per tugas worker (satu transaksi).")
+        parser.add_argument('--seed', default='sijarta')
+        parser.add_argument('--defer-triggers', action='store_true',
+                            help=(
+                                "Matikan trigger dan FK selama COPY (session_replication_role, butuh "
+                                "superuser), lalu bangun ulang proyeksi dan efek trigger sesudahnya."
+                            ))
+        parser.add_argument('--truncate', action='store_true',
+                            help="Kosongkan tabel pengguna dan transaksi terlebih dahulu.")
+
+    def handle(self, *args, **options):
+        sizes = scale_sizes(options['pesanan'])
+        sizes['pelanggan'] = options['pelanggan'] or sizes['pelanggan']
+        sizes['pekerja'] = options['pekerja'] or sizes['pekerja']
+
+        dims = generator.load_dimensions()
+        if not dims['subkategori']:
+            raise CommandError("SUBKATEGORI_JASA/SESI_LAYANAN masih kosong.")
+        missing = [nama for nama in generator.ALUR_STATUS + (generator.STATUS_DIBATALKAN,) if nama not in dims['status']]
+        if missing or 'MyPay' not in dims['metode'] or dims['metode_lain'] is None:
+            raise CommandError(f"Data referensi belum lengkap (status: {missing}, metode bayar: {list(dims['metode'])}).")
+        if sizes['pekerja'] < len(dims['kategori']):
+            raise CommandError("Jumlah pekerja minimal sama dengan jumlah kategori jasa.")
+        workers = options['workers']
+        if not options['defer_triggers']:
+            # Trigger memperbarui baris bersama (RATING_*, PEKERJA, PERINGKAT_PEKERJA,
+            # DOMPET pelanggan) dalam urutan acak dan kuncinya ditahan sampai chunk
+            # commit; beberapa worker sekaligus akan saling deadlock
+            workers = 1
+            self.stdout.write(self.style.WARNING(
+                "Trigger aktif: setiap baris menjalankan trigger dan load berjalan dengan 1 worker, "
+                "gunakan --defer-triggers untuk load besar paralel."
+            ))
+        if workers < 1:
+            raise CommandError("--workers minimal 1.")
+
+        if options['truncate']:
+            with get_dedicated_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"TRUNCATE {', '.join(FACT_TABLES)} CASCADE")
+
+        started = time.perf_counter()
+        # fork: worker mewarisi settings Django yang sudah dimuat
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            rows = 0
+            # Pengguna dulu agar FK pesanan terpenuhi saat trigger aktif
+            user_tasks = [
+                (role, start, end, dims, options['seed'], options['defer_triggers'])
+                for role in ('pelanggan', 'pekerja')
+                for start, end in _chunks(sizes[role], options['chunk_size'])
+            ]
+            rows += sum(pool.imap_unordered(generator.generate_users, user_tasks))
+            self.stdout.write(f"Pengguna selesai: {rows} baris.")
+
+            order_tasks = [
+                (start, end, dims, sizes, options['seed'], options['defer_triggers'])
+                for start, end in _chunks(sizes['pesanan'], options['chunk_size'])
+            ]
+            for done, chunk_rows in enumerate(pool.imap_unordered(generator.generate_orders, order_tasks), start=1):
+                rows += chunk_rows
+                self.stdout.write(f"Pesanan: {done}/{len(order_tasks)} tugas, {rows} baris.")
+
+        load_seconds = time.perf_counter() - started
+        self.stdout.write(f"COPY selesai: {rows} baris dalam {load_seconds:.1f} s ({rows / load_seconds:,.0f} baris/s).")
+
+        if not options['defer_triggers']:
+            # Trigger hanya mengantrekan honor pesanan selesai
+            call_command('settle_payouts', stdout=self.stdout)
+        generator.finalize()
+        if options['defer_triggers']:
+            # Proyeksi yang biasanya dijaga trigger
+            call_command('backfill_status_terkini', stdout=self.stdout)
+            call_command('rebuild_rating', stdout=self.stdout)
+            call_command('rebuild_peringkat_pekerja', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai dalam {time.perf_counter() - started:.1f} s: {sizes['pesanan']} pesanan, "
+            f"{sizes['pelanggan']} pelanggan, {sizes['pekerja']} pekerja."
+        ))
@@ -0,0 +1,223 @@
+# benchmark/runner.py
+
+import json
+import logging
+import platform
+import re
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from hijau.catalog import get_catalog
+from utils.db_connection import get_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+# Password semua pengguna hasil seed.sql
+SEED_PASSWORD = 'password'
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+# nama view -> (role pengguna yang login, fungsi url dari konteks)
+VIEWS = {
+    'homepage': ('pelanggan', lambda context: reverse('homepage')),
+    'subcategory_jasa': ('pelanggan', lambda context: context['subcategory_url']),
+    'view_pesanan': ('pelanggan', lambda context: reverse('view_pesanan')),
+    'pekerjaan_jasa': ('pekerja', lambda context: reverse('pekerjaan_jasa')),
+    'transaksi_list': ('pelanggan', lambda context: reverse('transaksi_list')),
+    'transaksi_form': ('pelanggan', lambda context: reverse('transaksi_form')),
+}
+
+
+def _percentile(sorted_values, percent):
+    """Persentil dengan interpolasi linear atas data yang sudah diurutkan."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def build_context():
+    """
+    Pengguna terberat (pesanan terbanyak) untuk tiap role dan URL subkategori
+    dengan pesanan terbanyak, agar setiap view diukur pada kasus terburuknya.
+    """
+    conn = get_dedicated_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT u.NoHP FROM "USER" u
+                JOIN TR_PEMESANAN_JASA tpj ON tpj.IdPelanggan = u.Id
+                GROUP BY u.Id, u.NoHP
+                ORDER BY COUNT(*) DESC, u.Id
+                LIMIT 1
+            """)
+            pelanggan_phone = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT u.NoHP FROM "USER" u
+                JOIN PEKERJA_KATEGORI_JASA pkj ON pkj.PekerjaId = u.Id
+                GROUP BY u.Id, u.NoHP
+                ORDER BY COUNT(*) DESC, u.Id
+                LIMIT 1
+            """)
+            pekerja_phone = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT IdKategoriJasa::text FROM TR_PEMESANAN_JASA
+                GROUP BY IdKategoriJasa
+                ORDER BY COUNT(*) DESC, IdKategoriJasa
+                LIMIT 1
+            """)
+            subkategori_id = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    subcategory_url = None
+    for category in get_catalog().categories:
+        for sub in category['subcategories']:
+            if str(sub['id']) == subkategori_id:
+                subcategory_url = reverse('subcategory_jasa', args=[category['slug'], sub['slug']])
+    return {
+        'phones': {'pelanggan': pelanggan_phone, 'pekerja': pekerja_phone},
+        'subcategory_url': subcategory_url,
+    }
+
+
+def _login(role, context):
+    client = Client()
+    response = client.post(reverse('login'), {'phone': context['phones'][role], 'password': SEED_PASSWORD})
+    if 'user' not in client.session:
+        raise RuntimeError(f"Login benchmark sebagai {role} gagal (status {response.status_code}).")
+    return client
+
+
+def measure_view(client, url, iterations, warmup):
+    """Latensi (ms), jumlah query, dan waktu DB tiap request, lalu alokasi dalam run terpisah."""
+    for _ in range(warmup):
+        client.get(url)
+
+    latencies, queries, db_times = [], [], []
+    status = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        status = response.status_code
+        match = _SERVER_TIMING_DB.search(response.get('Server-Timing', ''))
+        if match:
+            db_times.append(float(match.group(1)))
+            queries.append(int(match.group(2)))
+
+    # tracemalloc memperlambat request, jadi alokasi diukur terpisah dari latensi
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        client.get(url)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'url': url,
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries': max(queries) if queries else None,
+        'db_ms_median': round(statistics.median(db_times), 3) if db_times else None,
+        'alloc_peak_kb': round((peak - before) / 1024, 1),
+        'alloc_retained_kb': round((after - before) / 1024, 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _server_version():
+    conn = get_dedicated_connection()
+    try:
+        return conn.server_version
+    finally:
+        conn.close()
+
+
+def run(scale, seed, view_names, iterations, warmup):
+    """Ukur ``view_names`` dan kembalikan dict hasil yang siap disimpan sebagai JSON."""
+    context = build_context()
+    clients = {}
+    views = {}
+    for name in view_names:
+        role, url_for = VIEWS[name]
+        url = url_for(context)
+        if url is None:
+            logger.warning(f"URL untuk {name} tidak ditemukan, dilewati.")
+            continue
+        if role not in clients:
+            clients[role] = _login(role, context)
+        views[name] = measure_view(clients[role], url, iterations, warmup)
+
+    return {
+        'commit': _git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'scale': scale,
+        'seed': seed,
+        'python': platform.python_version(),
+        'postgres': _server_version(),
+        'views': views,
+    }
+
+
+def save(result, output_dir=RESULTS_DIR):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stamp = result['created_at'].replace(':', '').replace('-', '')
+    path = output_dir / f"{stamp}-{result['commit']}-{result['scale']}.json"
+    path.write_text(json.dumps(result, indent=2, sort_keys=True))
+    return path
+
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_peak_kb')
+
+
+def compare(baseline, result, max_regression):
+    """
+    Bandingkan dua hasil per view. Mengembalikan (baris laporan, daftar regresi)
+    di mana regresi adalah metrik yang naik lebih dari ``max_regression`` persen
+    (jumlah query: naik sama sekali).
+    """
+    lines, regressions = [], []
+    for name, current in result['views'].items():
+        previous = baseline['views'].get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) * 100 / old if old else 0.0
+            lines.append(f"{name:<18} {metric:<14} {old:>10} -> {new:>10} ({change:+.1f}%)")
+            regressed = new > old if metric == 'queries' else change > max_regression
+            if regressed:
+                regressions.append(f"{name} {metric}")
+    return lines, regressions
@@ -0,0 +1,162 @@
+-- Skema sijarta untuk basis data benchmark lokal.
+-- Disusun dari kolom yang dipakai aplikasi; tabel proyeksi (status terkini,
+-- peringkat, rating) dibuat oleh trigger/*.sql setelah data di-seed.
+
+DROP SCHEMA IF EXISTS sijarta CASCADE;
+CREATE SCHEMA sijarta;
+SET search_path = sijarta;
+
+-- uuid_generate_v4 dipanggil trigger dan view; harus terlihat dari search_path=sijarta
+DROP EXTENSION IF EXISTS "uuid-ossp";
+CREATE EXTENSION "uuid-ossp" WITH SCHEMA sijarta;
+
+CREATE TABLE "USER" (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    Nama VARCHAR(100) NOT NULL,
+    JenisKelamin CHAR(1) NOT NULL CHECK (JenisKelamin IN ('L', 'P')),
+    NoHP VARCHAR(20) NOT NULL,
+    Pwd VARCHAR(100) NOT NULL,
+    TglLahir DATE NOT NULL,
+    Alamat VARCHAR(255) NOT NULL,
+    SaldoMyPay DECIMAL(15, 2) NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_user_nohp ON "USER" (NoHP);
+
+CREATE TABLE PELANGGAN (
+    Id UUID PRIMARY KEY REFERENCES "USER"(Id) ON DELETE CASCADE,
+    Level VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE PEKERJA (
+    Id UUID PRIMARY KEY REFERENCES "USER"(Id) ON DELETE CASCADE,
+    NamaBank VARCHAR(100) NOT NULL,
+    NomorRekening VARCHAR(50) NOT NULL,
+    NPWP VARCHAR(50) NOT NULL,
+    LinkFoto VARCHAR(255) NOT NULL,
+    Rating DECIMAL(4, 2) NOT NULL DEFAULT 0,
+    JmlPesananSelesai INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE KATEGORI_TR_MYPAY (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    Nama VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE TR_MYPAY (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    UserId UUID NOT NULL REFERENCES "USER"(Id) ON DELETE CASCADE,
+    Tgl TIMESTAMP NOT NULL,
+    Nominal DECIMAL(15, 2) NOT NULL,
+    KategoriId UUID NOT NULL REFERENCES KATEGORI_TR_MYPAY(Id)
+);
+
+CREATE TABLE KATEGORI_JASA (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    NamaKategori VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE SUBKATEGORI_JASA (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    NamaSubKategori VARCHAR(100) NOT NULL,
+    Deskripsi TEXT,
+    KategoriJasaId UUID NOT NULL REFERENCES KATEGORI_JASA(Id) ON DELETE CASCADE
+);
+
+CREATE TABLE SESI_LAYANAN (
+    SubKategoriId UUID REFERENCES SUBKATEGORI_JASA(Id) ON DELETE CASCADE,
+    Sesi INT,
+    Harga DECIMAL(15, 2) NOT NULL,
+    PRIMARY KEY (SubKategoriId, Sesi)
+);
+
+CREATE TABLE PEKERJA_KATEGORI_JASA (
+    PekerjaId UUID REFERENCES PEKERJA(Id) ON DELETE CASCADE,
+    KategoriJasaId UUID REFERENCES KATEGORI_JASA(Id) ON DELETE CASCADE,
+    PRIMARY KEY (PekerjaId, KategoriJasaId)
+);
+
+CREATE TABLE DISKON (
+    Kode VARCHAR(50) PRIMARY KEY,
+    Potongan DECIMAL(5, 2) NOT NULL CHECK (Potongan >= 0),
+    MinTrPemesanan INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE VOUCHER (
+    Kode VARCHAR(50) PRIMARY KEY REFERENCES DISKON(Kode) ON DELETE CASCADE,
+    JmlHariBerlaku INT NOT NULL,
+    KuotaPenggunaan INT,
+    Harga DECIMAL(15, 2) NOT NULL
+);
+
+CREATE TABLE PROMO (
+    Kode VARCHAR(50) PRIMARY KEY REFERENCES DISKON(Kode) ON DELETE CASCADE,
+    TglAkhirBerlaku DATE NOT NULL
+);
+
+CREATE TABLE METODE_BAYAR (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    Nama VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE TR_PEMBELIAN_VOUCHER (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    TglAwal DATE NOT NULL,
+    TglAkhir DATE NOT NULL,
+    TelahDigunakan INT NOT NULL DEFAULT 0,
+    IdPelanggan UUID NOT NULL REFERENCES PELANGGAN(Id) ON DELETE CASCADE,
+    IdVoucher VARCHAR(50) NOT NULL REFERENCES VOUCHER(Kode) ON DELETE CASCADE,
+    IdMetodeBayar UUID NOT NULL REFERENCES METODE_BAYAR(Id)
+);
+
+CREATE TABLE STATUS_PEMESANAN (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    Status VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE TR_PEMESANAN_JASA (
+    Id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    TglPemesanan DATE NOT NULL,
+    TglPekerjaan DATE NOT NULL,
+    WaktuPekerjaan TIMESTAMP NOT NULL,
+    TotalBiaya DECIMAL(15, 2) NOT NULL,
+    IdPelanggan UUID NOT NULL REFERENCES PELANGGAN(Id),
+    IdPekerja UUID REFERENCES PEKERJA(Id),
+    IdKategoriJasa UUID NOT NULL REFERENCES SUBKATEGORI_JASA(Id),
+    Sesi INT NOT NULL,
+    IdDiskon VARCHAR(50) REFERENCES DISKON(Kode),
+    IdMetodeBayar UUID NOT NULL REFERENCES METODE_BAYAR(Id)
+);
+CREATE INDEX idx_pemesanan_jasa_pelanggan ON TR_PEMESANAN_JASA (IdPelanggan);
+CREATE INDEX idx_pemesanan_jasa_pekerja ON TR_PEMESANAN_JASA (IdPekerja);
+
+CREATE TABLE TR_PEMESANAN_STATUS (
+    IdTrPemesanan UUID REFERENCES TR_PEMESANAN_JASA(Id) ON DELETE CASCADE,
+    IdStatus UUID REFERENCES STATUS_PEMESANAN(Id),
+    TglWaktu TIMESTAMP NOT NULL,
+    PRIMARY KEY (IdTrPemesanan, IdStatus)
+);
+
+CREATE TABLE TESTIMONI (
+    IdTrPemesanan UUID REFERENCES TR_PEMESANAN_JASA(Id) ON DELETE CASCADE,
+    Tgl DATE NOT NULL,
+    Teks TEXT,
+    Rating INT NOT NULL CHECK (Rating BETWEEN 1 AND 5),
+    PRIMARY KEY (IdTrPemesanan, Tgl)
+);
+
+-- Data referensi dengan nama yang dipakai utils.reference_data dan trigger
+INSERT INTO STATUS_PEMESANAN (Status) VALUES
+    ('Menunggu Pembayaran'),
+    ('Mencari Pekerja Terdekat'),
+    ('Menunggu Pekerja Terdekat'),
+    ('Pekerja Tiba di Lokasi'),
+    ('Pelayanan Jasa Sedang Dilakukan'),
+    ('Pemesanan Selesai'),
+    ('Pemesanan Dibatalkan');
+
+INSERT INTO METODE_BAYAR (Nama) VALUES
+    ('MyPay'), ('GoPay'), ('OVO'), ('Virtual Account BCA'), ('Virtual Account BNI');
+
+INSERT INTO KATEGORI_TR_MYPAY (Nama) VALUES
+    ('Top Up'), ('Pembayaran Jasa'), ('Transfer'), ('Withdraw'),
+    ('Menerima Honor'), ('Refund'), ('Pembelian Voucher');
@@ -0,0 +1,213 @@
+-- Seed data benchmark berbasis set (INSERT ... SELECT generate_series).
+-- Parameter: %(seed)s, %(pesanan)s, %(pelanggan)s, %(pekerja)s.
+-- Id dibentuk dari md5 sehingga data deterministik dan bisa di-join tanpa lookup.
+-- Trigger (dan FK) dimatikan lewat session_replication_role; efek samping
+-- trigger (honor, refund, saldo) ditulis langsung di sini, proyeksi dibangun
+-- ulang oleh backfill di trigger/*.sql.
+
+SET search_path = sijarta;
+SET session_replication_role = replica;
+SELECT setseed(%(seed)s);
+
+-- 8 kategori x 5 subkategori x 3 sesi
+INSERT INTO KATEGORI_JASA (Id, NamaKategori)
+SELECT md5('kategori' || c)::uuid, 'Kategori ' || (c + 1)
+FROM generate_series(0, 7) c;
+
+INSERT INTO SUBKATEGORI_JASA (Id, NamaSubKategori, Deskripsi, KategoriJasaId)
+SELECT md5('subkategori' || c || '-' || s)::uuid,
+       'Subkategori ' || (c + 1) || '.' || (s + 1),
+       'Layanan ' || (s + 1) || ' untuk kategori ' || (c + 1),
+       md5('kategori' || c)::uuid
+FROM generate_series(0, 7) c, generate_series(0, 4) s;
+
+INSERT INTO SESI_LAYANAN (SubKategoriId, Sesi, Harga)
+SELECT md5('subkategori' || c || '-' || s)::uuid, sesi, (40000 + 10000 * s) * sesi
+FROM generate_series(0, 7) c, generate_series(0, 4) s, generate_series(1, 3) sesi;
+
+-- Diskon: 5 promo aktif, 5 promo kedaluwarsa, 10 voucher
+INSERT INTO DISKON (Kode, Potongan, MinTrPemesanan)
+SELECT 'PROMO' || n, 0.05 * (1 + mod(n, 5)), 25000 * mod(n, 3)
+FROM generate_series(1, 10) n
+UNION ALL
+SELECT 'VOUCHER' || n, 0.05 * (1 + mod(n, 4)), 50000 * mod(n, 2)
+FROM generate_series(1, 10) n;
+
+INSERT INTO PROMO (Kode, TglAkhirBerlaku)
+SELECT 'PROMO' || n, CASE WHEN n <= 5 THEN CURRENT_DATE + 30 ELSE CURRENT_DATE - 30 END
+FROM generate_series(1, 10) n;
+
+INSERT INTO VOUCHER (Kode, JmlHariBerlaku, KuotaPenggunaan, Harga)
+SELECT 'VOUCHER' || n, 7 * n, 1 + mod(n, 5), 10000 * n
+FROM generate_series(1, 10) n;
+
+-- Pengguna: pelanggan lalu pekerja, password sama untuk semua
+INSERT INTO "USER" (Id, Nama, JenisKelamin, NoHP, Pwd, TglLahir, Alamat, SaldoMyPay)
+SELECT md5('pelanggan' || g)::uuid, 'Pelanggan ' || g,
+       CASE WHEN mod(g, 2) = 0 THEN 'L' ELSE 'P' END,
+       '081' || lpad(g::text, 9, '0'), 'password',
+       DATE '1970-01-01' + mod(g * 37, 12000), 'Jl. Pelanggan No. ' || g, 0
+FROM generate_series(1, %(pelanggan)s) g
+UNION ALL
+SELECT md5('pekerja' || g)::uuid, 'Pekerja ' || g,
+       CASE WHEN mod(g, 2) = 0 THEN 'P' ELSE 'L' END,
+       '082' || lpad(g::text, 9, '0'), 'password',
+       DATE '1970-01-01' + mod(g * 53, 12000), 'Jl. Pekerja No. ' || g, 0
+FROM generate_series(1, %(pekerja)s) g;
+
+INSERT INTO PELANGGAN (Id, Level)
+SELECT md5('pelanggan' || g)::uuid, (ARRAY['Basic', 'Silver', 'Gold'])[1 + mod(g, 3)]
+FROM generate_series(1, %(pelanggan)s) g;
+
+INSERT INTO PEKERJA (Id, NamaBank, NomorRekening, NPWP, LinkFoto, Rating, JmlPesananSelesai)
+SELECT md5('pekerja' || g)::uuid, (ARRAY['BCA', 'BNI', 'Mandiri', 'BRI'])[1 + mod(g, 4)],
+       lpad(g::text, 12, '0'), lpad(g::text, 15, '0'),
+       'https://example.com/foto/' || g || '.jpg', 0, 0
+FROM generate_series(1, %(pekerja)s) g;
+
+-- Pekerja ke-w melayani kategori (w-1) mod 8 dan (w+2) mod 8
+INSERT INTO PEKERJA_KATEGORI_JASA (PekerjaId, KategoriJasaId)
+SELECT DISTINCT md5('pekerja' || w)::uuid, md5('kategori' || c)::uuid
+FROM generate_series(1, %(pekerja)s) w,
+     LATERAL (VALUES (mod(w - 1, 8)), (mod(w + 2, 8))) k(c);
+
+-- Atribut acak per pesanan. Tahap 1..6 mengikuti alur status merah.views;
+-- tahap 7 berarti dibatalkan saat 'Mencari Pekerja Terdekat' (syarat refund).
+CREATE TEMP TABLE seed_pesanan ON COMMIT DROP AS
+SELECT g,
+       md5('pesanan' || g)::uuid AS id,
+       1 + floor(%(pelanggan)s * power(random(), 2))::int AS pelanggan,
+       floor(random() * 8)::int AS c,
+       floor(random() * 5)::int AS s,
+       1 + floor(random() * 3)::int AS sesi,
+       floor(random() * 100)::int AS tahap_acak,
+       random() < 0.5 AS mypay,
+       random() < 0.1 AS promo,
+       random() AS r_pekerja,
+       CURRENT_DATE - floor(random() * 365)::int AS tgl
+FROM generate_series(1, %(pesanan)s) g;
+
+ALTER TABLE seed_pesanan
+    ADD COLUMN tahap INT,
+    ADD COLUMN pekerja INT,
+    ADD COLUMN total DECIMAL(15, 2);
+
+UPDATE seed_pesanan SET
+    tahap = CASE
+        WHEN tahap_acak < 10 THEN 1
+        WHEN tahap_acak < 25 THEN 2
+        WHEN tahap_acak < 35 THEN 3
+        WHEN tahap_acak < 40 THEN 4
+        WHEN tahap_acak < 45 THEN 5
+        WHEN tahap_acak < 90 THEN 6
+        ELSE 7
+    END,
+    pekerja = 1 + c + 8 * floor(r_pekerja * (%(pekerja)s / 8))::int,
+    total = (40000 + 10000 * s) * sesi * CASE WHEN promo THEN 0.9 ELSE 1 END;
+
+INSERT INTO TR_PEMESANAN_JASA (
+    Id, TglPemesanan, TglPekerjaan, WaktuPekerjaan, TotalBiaya,
+    IdPelanggan, IdPekerja, IdKategoriJasa, Sesi, IdDiskon, IdMetodeBayar
+)
+SELECT p.id, p.tgl, p.tgl + 1, p.tgl + 1 + TIME '09:00', p.total,
+       md5('pelanggan' || p.pelanggan)::uuid,
+       CASE WHEN p.tahap BETWEEN 3 AND 6 THEN md5('pekerja' || p.pekerja)::uuid END,
+       md5('subkategori' || p.c || '-' || p.s)::uuid, p.sesi,
+       CASE WHEN p.promo THEN 'PROMO1' END,
+       CASE WHEN p.mypay THEN mb_mypay.Id ELSE mb_lain.Id END
+FROM seed_pesanan p
+CROSS JOIN (SELECT Id FROM METODE_BAYAR WHERE Nama = 'MyPay') mb_mypay
+CROSS JOIN (SELECT Id FROM METODE_BAYAR WHERE Nama = 'GoPay') mb_lain;
+
+-- Riwayat status: tahap 1..n (jam ke-k setelah pemesanan); dibatalkan = 1, 2, lalu batal
+INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
+SELECT p.id, sp.Id, p.tgl + make_interval(hours => k)
+FROM seed_pesanan p
+CROSS JOIN LATERAL generate_series(1, CASE WHEN p.tahap = 7 THEN 3 ELSE p.tahap END) k
+JOIN STATUS_PEMESANAN sp ON sp.Status = CASE
+    WHEN p.tahap = 7 AND k = 3 THEN 'Pemesanan Dibatalkan'
+    ELSE (ARRAY[
+        'Menunggu Pembayaran', 'Mencari Pekerja Terdekat', 'Menunggu Pekerja Terdekat',
+        'Pekerja Tiba di Lokasi', 'Pelayanan Jasa Sedang Dilakukan', 'Pemesanan Selesai'
+    ])[k]
+END;
+
+-- Ledger MyPay: pembayaran (nominal positif, lihat EFEK_SALDO_SQL), honor pekerja, refund
+INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+SELECT md5('bayar' || p.g)::uuid, md5('pelanggan' || p.pelanggan)::uuid,
+       p.tgl + INTERVAL '2 hours', p.total, k.Id
+FROM seed_pesanan p
+JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Pembayaran Jasa'
+WHERE p.mypay AND p.tahap >= 2
+UNION ALL
+SELECT md5('honor' || p.g)::uuid, md5('pekerja' || p.pekerja)::uuid,
+       p.tgl + INTERVAL '6 hours', p.total, k.Id
+FROM seed_pesanan p
+JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Menerima Honor'
+WHERE p.tahap = 6
+UNION ALL
+SELECT md5('refund' || p.g)::uuid, md5('pelanggan' || p.pelanggan)::uuid,
+       p.tgl + INTERVAL '3 hours', p.total, k.Id
+FROM seed_pesanan p
+JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Refund'
+WHERE p.mypay AND p.tahap = 7;
+
+-- Testimoni untuk sekitar 60 persen pesanan selesai, rating condong ke atas
+INSERT INTO TESTIMONI (IdTrPemesanan, Tgl, Teks, Rating)
+SELECT p.id, p.tgl + 1, 'Testimoni pesanan ' || p.g,
+       (ARRAY[1, 2, 3, 4, 4, 5, 5, 5])[1 + floor(random() * 8)::int]
+FROM seed_pesanan p
+WHERE p.tahap = 6 AND random() < 0.6;
+
+UPDATE PEKERJA pk SET JmlPesananSelesai = s.jumlah
+FROM (
+    SELECT md5('pekerja' || pekerja)::uuid AS id, COUNT(*) AS jumlah
+    FROM seed_pesanan
+    WHERE tahap = 6
+    GROUP BY pekerja
+) s
+WHERE pk.Id = s.id;
+
+-- Pembelian voucher untuk sepertiga pelanggan; separuhnya dibayar dengan MyPay
+INSERT INTO TR_PEMBELIAN_VOUCHER (Id, TglAwal, TglAkhir, TelahDigunakan, IdPelanggan, IdVoucher, IdMetodeBayar)
+SELECT md5('pembelian' || g)::uuid, CURRENT_DATE - mod(g, 60), CURRENT_DATE - mod(g, 60) + v.JmlHariBerlaku,
+       mod(g, 1 + v.KuotaPenggunaan), md5('pelanggan' || g)::uuid, v.Kode,
+       CASE WHEN mod(g, 2) = 0 THEN mb_mypay.Id ELSE mb_lain.Id END
+FROM generate_series(3, %(pelanggan)s, 3) g
+JOIN VOUCHER v ON v.Kode = 'VOUCHER' || (1 + mod(g, 10))
+CROSS JOIN (SELECT Id FROM METODE_BAYAR WHERE Nama = 'MyPay') mb_mypay
+CROSS JOIN (SELECT Id FROM METODE_BAYAR WHERE Nama = 'GoPay') mb_lain;
+
+INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+SELECT md5('tr-voucher' || tpv.Id)::uuid, tpv.IdPelanggan, tpv.TglAwal, -v.Harga, k.Id
+FROM TR_PEMBELIAN_VOUCHER tpv
+JOIN VOUCHER v ON v.Kode = tpv.IdVoucher
+JOIN METODE_BAYAR mb ON mb.Id = tpv.IdMetodeBayar AND mb.Nama = 'MyPay'
+JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Pembelian Voucher';
+
+-- Top up awal tiap pelanggan menutup seluruh pengeluarannya plus sisa saldo acak
+INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+SELECT md5('topup' || g)::uuid, md5('pelanggan' || g)::uuid, CURRENT_DATE - 400,
+       COALESCE(keluar.total, 0) + 100000 * (1 + mod(g, 10)), k.Id
+FROM generate_series(1, %(pelanggan)s) g
+JOIN KATEGORI_TR_MYPAY k ON k.Nama = 'Top Up'
+LEFT JOIN (
+    SELECT t.UserId, SUM(ABS(t.Nominal)) AS total
+    FROM TR_MYPAY t
+    JOIN KATEGORI_TR_MYPAY kt ON kt.Id = t.KategoriId
+    WHERE kt.Nama IN ('Pembayaran Jasa', 'Pembelian Voucher')
+    GROUP BY t.UserId
+) keluar ON keluar.UserId = md5('pelanggan' || g)::uuid;
+
+-- Saldo = jumlah efek ledger (Pembayaran Jasa dicatat positif tetapi mengurangi saldo)
+UPDATE "USER" u SET SaldoMyPay = s.saldo
+FROM (
+    SELECT t.UserId,
+           SUM(CASE WHEN k.Nama = 'Pembayaran Jasa' THEN -ABS(t.Nominal) ELSE t.Nominal END) AS saldo
+    FROM TR_MYPAY t
+    JOIN KATEGORI_TR_MYPAY k ON k.Id = t.KategoriId
+    GROUP BY t.UserId
+) s
+WHERE u.Id = s.UserId;
+
+SET session_replication_role = origin;
@@ -0,0 +1,33 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from benchmark.database import create_and_seed, is_local_database
+from utils.db_connection import get_dedicated_connection
+
+
+@skipUnless(is_local_database(), "Smoke run membuat ulang skema sijarta; hanya untuk Postgres lokal.")
+class GenerateDataSmokeTests(TransactionTestCase):
+    """Load kecil dengan trigger aktif: --workers > 1 tidak boleh berakhir deadlock."""
+
+    def test_load_with_live_triggers(self):
+        create_and_seed('10k')
+        out = StringIO()
+        call_command(
+            'generate_data', pesanan=2000, workers=4, chunk_size=250, truncate=True, seed='smoke', stdout=out,
+        )
+
+        self.assertIn("1 worker", out.getvalue())
+        with get_dedicated_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT (SELECT COUNT(*) FROM TR_PEMESANAN_JASA),
+                           (SELECT COUNT(*) FROM ANTREAN_HONOR WHERE TglDibayar IS NULL),
+                           (SELECT COUNT(*) FROM "USER" u LEFT JOIN DOMPET d ON d.UserId = u.Id WHERE d.UserId IS NULL)
+                """)
+                pesanan, honor_tertunda, tanpa_dompet = cursor.fetchone()
+        self.assertEqual(pesanan, 2000)
+        self.assertEqual(honor_tertunda, 0)
+        self.assertEqual(tanpa_dompet, 0)
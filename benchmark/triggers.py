@@ -0,0 +1,76 @@
+# benchmark/triggers.py
+
+import json
+import logging
+
+from utils.db_connection import get_dedicated_connection
+from utils.reference_data import StatusPesanan
+
+logger = logging.getLogger(__name__)
+
+# nama skenario -> (status terkini pesanan yang dipilih, status yang disisipkan)
+SCENARIOS = {
+    # Status yang tidak ditangani dispatcher: hanya biaya WHEN dan proyeksi
+    'tanpa_handler': (StatusPesanan.MENUNGGU_PEKERJA, StatusPesanan.PEKERJA_TIBA),
+    'honor': (StatusPesanan.SEDANG_DILAKUKAN, StatusPesanan.SELESAI),
+    'refund': (StatusPesanan.MENCARI_PEKERJA, StatusPesanan.DIBATALKAN),
+}
+
+# Sisipkan satu status untuk sampai %(rows)s pesanan berstatus terkini
+# %(dari)s, sedikit setelah status terkininya.
+INSERT_QUERY = """
+    EXPLAIN (ANALYZE, FORMAT JSON)
+    INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
+    SELECT ts.IdTrPemesanan, ke.Id, ts.TglWaktu + INTERVAL '1 second'
+    FROM TR_PEMESANAN_STATUS_TERKINI ts
+    JOIN STATUS_PEMESANAN dari ON dari.Id = ts.IdStatus AND dari.Status = %(dari)s
+    JOIN STATUS_PEMESANAN ke ON ke.Status = %(ke)s
+    LIMIT %(rows)s
+"""
+
+
+def measure_scenario(cursor, name, rows):
+    """
+    Jalankan satu skenario di dalam savepoint yang selalu di-rollback dan
+    kembalikan waktu eksekusi serta waktu tiap trigger per baris status.
+    """
+    dari, ke = SCENARIOS[name]
+    cursor.execute("SAVEPOINT benchmark_trigger")
+    try:
+        cursor.execute(INSERT_QUERY, {'dari': dari, 'ke': ke, 'rows': rows})
+        raw = cursor.fetchone()[0]
+    finally:
+        cursor.execute("ROLLBACK TO SAVEPOINT benchmark_trigger")
+
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+    inserted = plan['Plan'].get('Actual Rows') or 0
+    # Baris INSERT ada di node anak (Plan node ModifyTable melaporkan 0)
+    for child in plan['Plan'].get('Plans', []):
+        inserted = max(inserted, child.get('Actual Rows', 0))
+    triggers = {
+        trigger['Trigger Name']: {
+            'calls': trigger['Calls'],
+            'ms': round(trigger['Time'], 3),
+            'us_per_row': round(trigger['Time'] * 1000 / inserted, 2) if inserted else None,
+        }
+        for trigger in plan.get('Triggers', [])
+    }
+    total_trigger_ms = sum(trigger['Time'] for trigger in plan.get('Triggers', []))
+    return {
+        'rows': inserted,
+        'execution_ms': round(plan['Execution Time'], 3),
+        'trigger_ms': round(total_trigger_ms, 3),
+        'trigger_us_per_row': round(total_trigger_ms * 1000 / inserted, 2) if inserted else None,
+        'triggers': triggers,
+    }
+
+
+def run(scenarios, rows):
+    """Ukur ``scenarios`` tanpa meninggalkan perubahan apa pun di basis data."""
+    conn = get_dedicated_connection()
+    try:
+        with conn.cursor() as cursor:
+            return {name: measure_scenario(cursor, name, rows) for name in scenarios}
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,117 @@
+# hijau/catalog.py
+
+import logging
+
+from django.utils.text import slugify
+
+from utils.db_connection import get_db_connection
+from utils.snapshot_cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ICON = 'fas fa-concierge-bell'
+
+
+class CatalogSnapshot:
+    """
+    Pohon kategori/subkategori jasa yang sudah dimuat, lengkap dengan slug dan
+    nama lowercase yang dihitung sekali saat load. Tidak boleh dimutasi.
+    """
+
+    def __init__(self, version, categories):
+        self.version = version
+        self.categories = categories
+        # (slug kategori, slug subkategori) -> (kategori, subkategori)
+        self.slug_index = {}
+        for category in categories:
+            for sub in category['subcategories']:
+                key = (category['slug'], sub['slug'])
+                if key in self.slug_index:
+                    logger.warning(f"Duplicate catalog slug {key}, keeping the first subcategory.")
+                    continue
+                self.slug_index[key] = (category, sub)
+
+    def resolve_slug(self, category_slug, subcategory_slug):
+        """Cari (kategori, subkategori) dari slug URL dalam O(1); None bila tidak ada."""
+        return self.slug_index.get((category_slug.lower(), subcategory_slug.lower()))
+
+
+def _load_categories(version):
+    """Ambil seluruh kategori beserta subkategorinya dalam satu query."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT kj.Id, kj.NamaKategori, sj.Id, sj.NamaSubKategori, sj.Deskripsi
+                FROM KATEGORI_JASA kj
+                LEFT JOIN SUBKATEGORI_JASA sj ON sj.KategoriJasaId = kj.Id
+                ORDER BY kj.NamaKategori, kj.Id, sj.NamaSubKategori;
+            """)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    categories = {}
+    for category_id, nama_kategori, sub_id, nama_subkategori, deskripsi in rows:
+        category = categories.get(category_id)
+        if category is None:
+            category = categories[category_id] = {
+                'id': category_id,
+                'nama_kategori': nama_kategori,
+                'nama_lower': nama_kategori.lower(),
+                'slug': slugify(nama_kategori),
+                'subcategories': [],
+                'icon': DEFAULT_ICON,
+            }
+        if sub_id is not None:
+            category['subcategories'].append({
+                'id': sub_id,
+                'nama_subkategori': nama_subkategori,
+                'nama_lower': nama_subkategori.lower(),
+                'slug': slugify(nama_subkategori),
+                'deskripsi': deskripsi,
+            })
+
+    return CatalogSnapshot(version, tuple(categories.values()))
+
+
+_cache = SnapshotCache('catalog', _load_categories, 'CATALOG_CACHE_TTL', 'CATALOG_MISS_RELOAD')
+
+
+def get_catalog():
+    """Snapshot katalog, dimuat ulang setelah CATALOG_CACHE_TTL."""
+    return _cache.get()
+
+
+def invalidate_catalog():
+    """
+    Panggil setelah kategori/subkategori ditambah, diganti nama, atau dihapus
+    agar indeks slug dibangun ulang; dari luar aplikasi pakai refresh_snapshots.
+    """
+    _cache.invalidate()
+
+
+def resolve_slug(category_slug, subcategory_slug):
+    """
+    Resolusi slug URL ke (kategori, subkategori) lewat indeks slug di snapshot.
+    Slug yang tidak dikenal memicu reload katalog (paling sering sekali per
+    CATALOG_MISS_RELOAD detik) agar subkategori baru langsung bisa diakses.
+    """
+    return _cache.lookup(lambda catalog: catalog.resolve_slug(category_slug, subcategory_slug))
+
+
+def filter_categories(snapshot, category_slug='', search_query=''):
+    """
+    Terapkan filter ``?category=`` dan ``?q=`` terhadap snapshot tanpa query
+    database. Menghasilkan list dict baru sehingga snapshot tidak ikut berubah.
+    """
+    search_query = search_query.lower()
+    categories = []
+    for category in snapshot.categories:
+        if category_slug and category['slug'] != category_slug:
+            continue
+        subcategories = category['subcategories']
+        if search_query:
+            subcategories = [sub for sub in subcategories if search_query in sub['nama_lower']]
+        categories.append({**category, 'subcategories': subcategories})
+    return categories
@@ -0,0 +1,70 @@
+# hijau/leaderboard.py
+
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+
+from utils.db_connection import get_db_connection
+from utils.pagination import decode_cursor, encode_cursor, parse_uuid_strict
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_top_workers(kategori_id, cursor=None, limit=None):
+    """
+    Ambil K pekerja teratas sebuah kategori jasa dari PERINGKAT_PEKERJA
+    (urut Rating, JmlPesananSelesai, lalu Id, semuanya menurun). Halaman
+    berikutnya diambil dengan keyset cursor sehingga setiap halaman hanya
+    membaca K+1 baris dari indeks, berapa pun jumlah pekerja di kategori.
+    """
+    limit = limit or getattr(settings, 'WORKER_LEADERBOARD_PAGE_SIZE', 12)
+    params = {'kategori': kategori_id, 'limit': limit + 1}
+    keyset_filter = ""
+    if cursor:
+        cursor_rating, cursor_jml, cursor_id = decode_cursor(cursor, Decimal, int, parse_uuid_strict)
+        keyset_filter = """
+            AND (pp.Rating, pp.JmlPesananSelesai, pp.PekerjaId)
+                < (%(cursor_rating)s, %(cursor_jml)s, %(cursor_id)s::uuid)
+        """
+        params.update(cursor_rating=cursor_rating, cursor_jml=cursor_jml, cursor_id=cursor_id)
+
+    query = f"""
+        SELECT pp.PekerjaId, u.Nama, pp.Rating, pp.JmlPesananSelesai, p.LinkFoto
+        FROM (
+            SELECT PekerjaId, Rating, JmlPesananSelesai
+            FROM PERINGKAT_PEKERJA pp
+            WHERE pp.KategoriJasaId = %(kategori)s {keyset_filter}
+            ORDER BY pp.Rating DESC, pp.JmlPesananSelesai DESC, pp.PekerjaId DESC
+            LIMIT %(limit)s
+        ) pp
+        JOIN PEKERJA p ON p.Id = pp.PekerjaId
+        JOIN "USER" u ON u.Id = pp.PekerjaId
+        ORDER BY pp.Rating DESC, pp.JmlPesananSelesai DESC, pp.PekerjaId DESC
+    """
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+    finally:
+        conn.close()
+
+    workers = [
+        {
+            'id': pekerja_id,
+            'name': nama_pekerja,
+            'rating': rating,
+            'jml_pesanan_selesai': jml_pesanan,
+            'profile_picture': link_foto,
+        }
+        for pekerja_id, nama_pekerja, rating, jml_pesanan, link_foto in rows
+    ]
+    has_more = len(workers) > limit
+    workers = workers[:limit]
+    next_cursor = None
+    if has_more:
+        last = workers[-1]
+        next_cursor = encode_cursor(last['rating'], last['jml_pesanan_selesai'], last['id'])
+    return {'workers': workers, 'next_cursor': next_cursor}
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from utils.db_connection import get_db_connection
+
+# Hapus baris untuk pasangan kategori-pekerja yang sudah tidak ada
+PRUNE_QUERY = """
+    DELETE FROM PERINGKAT_PEKERJA pp
+    WHERE NOT EXISTS (
+        SELECT 1 FROM PEKERJA_KATEGORI_JASA pkj
+        WHERE pkj.KategoriJasaId = pp.KategoriJasaId AND pkj.PekerjaId = pp.PekerjaId
+    )
+"""
+
+REBUILD_QUERY = """
+    INSERT INTO PERINGKAT_PEKERJA (KategoriJasaId, PekerjaId, Rating, JmlPesananSelesai)
+    SELECT pkj.KategoriJasaId, p.Id, COALESCE(p.Rating, 0), COALESCE(p.JmlPesananSelesai, 0)
+    FROM PEKERJA_KATEGORI_JASA pkj
+    JOIN PEKERJA p ON p.Id = pkj.PekerjaId
+    ON CONFLICT (KategoriJasaId, PekerjaId) DO UPDATE
+    SET Rating = EXCLUDED.Rating,
+        JmlPesananSelesai = EXCLUDED.JmlPesananSelesai
+    WHERE (PERINGKAT_PEKERJA.Rating, PERINGKAT_PEKERJA.JmlPesananSelesai)
+          IS DISTINCT FROM (EXCLUDED.Rating, EXCLUDED.JmlPesananSelesai)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Sinkronkan ulang PERINGKAT_PEKERJA dari PEKERJA dan PEKERJA_KATEGORI_JASA. "
+        "Aman dijalankan berulang kali dan saat aplikasi sedang berjalan."
+    )
+
+    def handle(self, *args, **options):
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(PRUNE_QUERY)
+                removed = cursor.rowcount
+                cursor.execute(REBUILD_QUERY)
+                updated = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} baris peringkat diperbarui, {removed} baris usang dihapus."
+        ))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+
+from utils.db_connection import get_db_connection
+
+# Testimoni tidak boleh berubah selama rebuild agar delta dari trigger tidak hilang
+LOCK_QUERY = "LOCK TABLE TESTIMONI IN SHARE MODE"
+
+# tabel -> (kolom kunci, sumber kunci, kolom agregat tambahan)
+AGREGASI_SQL = {
+    'RATING_SUBKATEGORI': ('SubKategoriId', 'tpj.IdKategoriJasa', {
+        f'Bintang{bintang}': f'COUNT(*) FILTER (WHERE t.Rating = {bintang})' for bintang in range(1, 6)
+    }),
+    'RATING_PEKERJA': ('PekerjaId', 'tpj.IdPekerja', {}),
+}
+
+RESET_QUERY = """
+    UPDATE {table} SET JumlahRating = 0, TotalRating = 0{reset_extra}
+    WHERE JumlahRating <> 0
+      AND {key} NOT IN (
+          SELECT {source}
+          FROM TESTIMONI t
+          JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
+          WHERE {source} IS NOT NULL
+      )
+"""
+
+UPSERT_QUERY = """
+    INSERT INTO {table} ({key}, JumlahRating, TotalRating{columns})
+    SELECT {source}, COUNT(*), SUM(t.Rating){expressions}
+    FROM TESTIMONI t
+    JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
+    WHERE {source} IS NOT NULL
+    GROUP BY {source}
+    ON CONFLICT ({key}) DO UPDATE
+    SET JumlahRating = EXCLUDED.JumlahRating,
+        TotalRating = EXCLUDED.TotalRating{update_extra}
+    WHERE ({table}.JumlahRating, {table}.TotalRating{current_extra})
+          IS DISTINCT FROM (EXCLUDED.JumlahRating, EXCLUDED.TotalRating{excluded_extra})
+"""
+
+
+def _format(query, table, key, source, extra):
+    return query.format(
+        table=table,
+        key=key,
+        source=source,
+        columns=''.join(f', {column}' for column in extra),
+        expressions=''.join(f', {expression}' for expression in extra.values()),
+        reset_extra=''.join(f', {column} = 0' for column in extra),
+        update_extra=''.join(f',\n        {column} = EXCLUDED.{column}' for column in extra),
+        current_extra=''.join(f', {table}.{column}' for column in extra),
+        excluded_extra=''.join(f', EXCLUDED.{column}' for column in extra),
+    )
+
+
+# Hanya pekerja yang pernah mendapat testimoni; rating awal pekerja lain dibiarkan
+RATING_PEKERJA_QUERY = """
+    UPDATE PEKERJA p
+    SET Rating = s.Rating
+    FROM (
+        SELECT PekerjaId,
+               CASE WHEN JumlahRating > 0
+                    THEN ROUND(TotalRating::NUMERIC / JumlahRating, 2)
+                    ELSE 0 END AS Rating
+        FROM RATING_PEKERJA
+    ) s
+    WHERE p.Id = s.PekerjaId AND p.Rating IS DISTINCT FROM s.Rating
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Hitung ulang RATING_PEKERJA, RATING_SUBKATEGORI, dan PEKERJA.Rating dari "
+        "seluruh TESTIMONI. Dipakai untuk backfill; perubahan sehari-hari sudah "
+        "dijaga trigger trg_agregasi_rating."
+    )
+
+    def handle(self, *args, **options):
+        counts = {}
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(LOCK_QUERY)
+                for table, (key, source, extra) in AGREGASI_SQL.items():
+                    cursor.execute(_format(RESET_QUERY, table, key, source, extra))
+                    reset = cursor.rowcount
+                    cursor.execute(_format(UPSERT_QUERY, table, key, source, extra))
+                    counts[table] = reset + cursor.rowcount
+                cursor.execute(RATING_PEKERJA_QUERY)
+                counts['PEKERJA'] = cursor.rowcount
+
+        for table, updated in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"{table}: {updated} baris diperbarui."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from hijau.catalog import invalidate_catalog
+from hijau.pricing import invalidate_pricing
+from utils.reference_data import invalidate_reference_data
+
+SNAPSHOTS = {
+    'catalog': invalidate_catalog,
+    'pricing': invalidate_pricing,
+    'reference_data': invalidate_reference_data,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Muat ulang cache katalog, harga, dan/atau data referensi di semua worker "
+        "setelah tabelnya diubah langsung lewat SQL (mis. subkategori diganti nama). "
+        "Worker memuat ulang paling lambat SNAPSHOT_SYNC_INTERVAL detik kemudian; "
+        "butuh CACHE_URL, tanpa itu worker menunggu TTL masing-masing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshots', nargs='*', choices=sorted(SNAPSHOTS),
+                            help="Snapshot yang dimuat ulang (default semua).")
+
+    def handle(self, *args, **options):
+        names = options['snapshots'] or sorted(SNAPSHOTS)
+        for name in names:
+            SNAPSHOTS[name]()
+        self.stdout.write(self.style.SUCCESS(f"Snapshot diinvalidasi: {', '.join(names)}."))
@@ -0,0 +1,191 @@
+# hijau/pricing.py
+
+import logging
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+from utils.db_connection import get_db_connection
+from utils.snapshot_cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+
+class PricingError(ValueError):
+    """Harga tidak dapat dihitung; pesan ditujukan untuk ditampilkan ke pengguna."""
+
+
+class PriceSnapshot:
+    """
+    Matriks harga (subkategori, sesi) -> harga dari SESI_LAYANAN dan tabel
+    diskon (kode -> potongan, minimum transaksi, tanggal akhir promo).
+    Tidak boleh dimutasi.
+    """
+
+    def __init__(self, version, prices, discounts):
+        self.version = version
+        self.prices = prices
+        self.discounts = discounts
+        # Indeks promo (bukan voucher) berurut potongan terbesar lebih dulu
+        self.promos = sorted(
+            ((kode, diskon) for kode, diskon in discounts.items() if not diskon['is_voucher']),
+            key=lambda item: (-item[1]['potongan'], item[0]),
+        )
+
+
+def _load_prices(version):
+    """Ambil seluruh harga sesi dan diskon dengan satu koneksi."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT SubKategoriId::text, Sesi, Harga
+                FROM SESI_LAYANAN;
+            """)
+            sesi_rows = cursor.fetchall()
+            cursor.execute("""
+                SELECT d.Kode, d.Potongan, d.MinTrPemesanan, p.TglAkhirBerlaku, v.Kode IS NOT NULL
+                FROM DISKON d
+                LEFT JOIN PROMO p ON p.Kode = d.Kode
+                LEFT JOIN VOUCHER v ON v.Kode = d.Kode;
+            """)
+            diskon_rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    prices = {
+        (subkategori_id, sesi): Decimal(harga)
+        for subkategori_id, sesi, harga in sesi_rows
+    }
+    discounts = {
+        kode: {
+            'potongan': Decimal(potongan or 0),
+            'min_transaksi': Decimal(min_tr or 0),
+            'tgl_akhir': tgl_akhir,
+            'is_voucher': is_voucher,
+        }
+        for kode, potongan, min_tr, tgl_akhir, is_voucher in diskon_rows
+    }
+    return PriceSnapshot(version, prices, discounts)
+
+
+_cache = SnapshotCache('pricing', _load_prices, 'PRICING_CACHE_TTL', 'PRICING_MISS_RELOAD')
+
+
+def get_pricing():
+    """Snapshot harga, dimuat ulang setelah PRICING_CACHE_TTL."""
+    return _cache.get()
+
+
+def invalidate_pricing():
+    """Panggil setelah mengubah SESI_LAYANAN, DISKON, PROMO, atau VOUCHER."""
+    _cache.invalidate()
+
+
+def _lookup(table, key):
+    return _cache.lookup(lambda pricing: getattr(pricing, table).get(key))
+
+
+def _rupiah(value):
+    return value.quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+
+
+def quote(subkategori_id, sesi, discount_code='', today=None):
+    """
+    Hitung harga satu sesi layanan beserta diskonnya. Potongan DISKON adalah
+    pecahan (0.1 = 10%) dan hanya berlaku bila harga memenuhi MinTrPemesanan;
+    promo juga harus belum melewati TglAkhirBerlaku. Kepemilikan voucher tidak
+    dicek di sini karena bergantung pada pelanggan (lihat ``is_voucher``).
+    Mengembalikan dict harga/potongan/total, atau raise PricingError.
+    """
+    try:
+        key = (str(subkategori_id).lower(), int(sesi))
+    except (TypeError, ValueError):
+        raise PricingError('Sesi layanan tidak valid.')
+
+    harga = _lookup('prices', key)
+    if harga is None:
+        raise PricingError('Sesi layanan tidak ditemukan.')
+
+    potongan = Decimal(0)
+    is_voucher = False
+    discount_code = (discount_code or '').strip()
+    if discount_code:
+        diskon = _lookup('discounts', discount_code)
+        if diskon is None:
+            raise PricingError('Kode diskon tidak valid.')
+        if diskon['tgl_akhir'] is not None and (today or date.today()) > diskon['tgl_akhir']:
+            raise PricingError('Kode diskon sudah tidak berlaku.')
+        if harga < diskon['min_transaksi']:
+            raise PricingError(f"Minimum transaksi untuk kode ini adalah Rp {diskon['min_transaksi']:,.0f}.")
+        potongan = _rupiah(harga * min(diskon['potongan'], Decimal(1)))
+        is_voucher = diskon['is_voucher']
+
+    return {
+        'subkategori_id': key[0],
+        'sesi': key[1],
+        'discount_code': discount_code or None,
+        'harga': harga,
+        'potongan': potongan,
+        'total': max(harga - potongan, Decimal(0)),
+        'is_voucher': is_voucher,
+    }
+
+
+def quote_many(items, today=None):
+    """
+    Quote banyak kombinasi sesi/diskon sekaligus. ``items`` berisi dict dengan
+    kunci subkategori_id, sesi, dan discount_code (opsional). Kombinasi yang
+    gagal tidak menggagalkan yang lain; hasilnya berisi kunci ``error``.
+    """
+    today = today or date.today()
+    quotes = []
+    for item in items:
+        try:
+            quotes.append(quote(item.get('subkategori_id'), item.get('sesi'), item.get('discount_code'), today))
+        except PricingError as e:
+            quotes.append({
+                'subkategori_id': item.get('subkategori_id'),
+                'sesi': item.get('sesi'),
+                'discount_code': item.get('discount_code') or None,
+                'error': str(e),
+            })
+    return quotes
+
+
+def _applicable(diskon, harga, today):
+    if diskon['tgl_akhir'] is not None and today > diskon['tgl_akhir']:
+        return False
+    return harga >= diskon['min_transaksi']
+
+
+def best_discount(subkategori_id, sesi, voucher_codes=(), today=None):
+    """
+    Pilih diskon dengan potongan terbesar untuk satu sesi layanan dari promo
+    yang masih berlaku dan ``voucher_codes`` (voucher milik pelanggan yang
+    masih bisa dipakai, lihat Blue.vouchers.fetch_wallet). Bila potongannya
+    sama, promo didahulukan agar kuota voucher tidak terpakai.
+    Mengembalikan dict seperti quote (discount_code None bila tidak ada
+    diskon yang berlaku), atau raise PricingError.
+    """
+    base = quote(subkategori_id, sesi, today=today)
+    harga = base['harga']
+    today = today or date.today()
+    pricing = get_pricing()
+
+    best = None
+    # Promo sudah berurut potongan menurun: promo pertama yang berlaku adalah yang terbaik
+    for kode, diskon in pricing.promos:
+        if _applicable(diskon, harga, today):
+            best = (diskon['potongan'], 1, kode)
+            break
+    for kode in voucher_codes:
+        diskon = pricing.discounts.get(kode)
+        if diskon is None or not diskon['is_voucher'] or not _applicable(diskon, harga, today):
+            continue
+        candidate = (diskon['potongan'], 0, kode)
+        if best is None or candidate[:2] > best[:2]:
+            best = candidate
+
+    if best is None or best[0] <= 0:
+        return base
+    return quote(subkategori_id, sesi, best[2], today)
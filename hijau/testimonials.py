@@ -0,0 +1,117 @@
+# hijau/testimonials.py
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.db_connection import get_db_connection
+from utils.pagination import decode_cursor, encode_cursor, parse_timestamp, parse_uuid_strict
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(subkategori_id):
+    return f"testimoni:halaman-pertama:{subkategori_id}"
+
+
+def fetch_testimonials(subkategori_id, cursor=None, limit=None):
+    """
+    Satu halaman testimoni sebuah subkategori (terbaru lebih dulu, keyset pada
+    (Tgl, IdTrPemesanan)). Tanggal sudah diformat di SQL.
+    """
+    limit = limit or getattr(settings, 'TESTIMONIAL_PAGE_SIZE', 10)
+    params = {'subkategori': subkategori_id, 'limit': limit + 1}
+    keyset_filter = ""
+    if cursor:
+        cursor_tgl, cursor_id = decode_cursor(cursor, parse_timestamp, parse_uuid_strict)
+        keyset_filter = "AND (t.Tgl, t.IdTrPemesanan) < (%(cursor_tgl)s, %(cursor_id)s::uuid)"
+        params.update(cursor_tgl=cursor_tgl, cursor_id=cursor_id)
+
+    query = f"""
+        SELECT t.IdTrPemesanan, t.Tgl, to_char(t.Tgl, 'DD Mon YYYY'), t.Teks, t.Rating,
+               u.Nama, w.Nama
+        FROM TESTIMONI t
+        JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
+        JOIN "USER" u ON tpj.IdPelanggan = u.Id
+        LEFT JOIN "USER" w ON tpj.IdPekerja = w.Id
+        WHERE tpj.IdKategoriJasa = %(subkategori)s {keyset_filter}
+        ORDER BY t.Tgl DESC, t.IdTrPemesanan DESC
+        LIMIT %(limit)s
+    """
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    testimonials = [
+        {
+            'date': tanggal,
+            'text': teks,
+            'rating': rating,
+            'user_name': nama_user,
+            'worker_name': nama_pekerja,
+        }
+        for _, _, tanggal, teks, rating, nama_user, nama_pekerja in rows
+    ]
+    next_cursor = None
+    if has_more:
+        last_id, last_tgl = rows[-1][0], rows[-1][1]
+        next_cursor = encode_cursor(last_tgl, last_id)
+    return {'testimonials': testimonials, 'next_cursor': next_cursor}
+
+
+def fetch_rating_summary(subkategori_id):
+    """Jumlah, rata-rata, dan histogram rating subkategori dari RATING_SUBKATEGORI."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT JumlahRating, TotalRating, Bintang1, Bintang2, Bintang3, Bintang4, Bintang5
+                FROM RATING_SUBKATEGORI
+                WHERE SubKategoriId = %s
+            """, (subkategori_id,))
+            row = cursor.fetchone() or (0, 0, 0, 0, 0, 0, 0)
+    finally:
+        conn.close()
+
+    jumlah, total = row[0], row[1]
+    return {
+        'count': jumlah,
+        'average': round(total / jumlah, 2) if jumlah else None,
+        # Bintang 5 lebih dulu, seperti urutan tampilan
+        'histogram': [
+            {
+                'rating': bintang,
+                'count': row[bintang + 1],
+                'percent': round(row[bintang + 1] * 100 / jumlah) if jumlah else 0,
+            }
+            for bintang in range(5, 0, -1)
+        ],
+    }
+
+
+def get_first_page(subkategori_id):
+    """
+    Halaman pertama testimoni beserta ringkasan rating, dari cache bila ada.
+    Di-cache per subkategori selama TESTIMONIAL_CACHE_TTL dan dibuang oleh
+    invalidate_testimonials saat testimoni baru dibuat.
+    """
+    key = _cache_key(subkategori_id)
+    page = cache.get(key)
+    if page is None:
+        page = fetch_testimonials(subkategori_id)
+        page['summary'] = fetch_rating_summary(subkategori_id)
+        cache.set(key, page, getattr(settings, 'TESTIMONIAL_CACHE_TTL', 300))
+    return page
+
+
+def invalidate_testimonials(subkategori_id):
+    cache.delete(_cache_key(subkategori_id))
+    logger.debug(f"Testimonial cache invalidated for SubKategoriId {subkategori_id}.")
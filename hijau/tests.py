@@ -1,3 +1,174 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils.text import slugify
+
+from hijau.catalog import CatalogSnapshot, resolve_slug
+from hijau.pricing import PriceSnapshot, PricingError, best_discount, quote, quote_many
+from utils.snapshot_cache import SnapshotCache
+
+SUBKATEGORI = '0f1c2d3e-0000-4000-8000-000000000001'
+HARI_INI = date(2024, 6, 1)
+
+
+def _diskon(potongan, min_transaksi=0, tgl_akhir=None, is_voucher=False):
+    return {
+        'potongan': Decimal(potongan),
+        'min_transaksi': Decimal(min_transaksi),
+        'tgl_akhir': tgl_akhir,
+        'is_voucher': is_voucher,
+    }
+
+
+def _snapshot(discounts):
+    prices = {
+        (SUBKATEGORI, 1): Decimal('100000'),
+        (SUBKATEGORI, 2): Decimal('185000'),
+    }
+    return PriceSnapshot(1, prices, discounts)
+
+
+class PricingTestCase(SimpleTestCase):
+    discounts = {}
+
+    def setUp(self):
+        snapshots = SnapshotCache('pricing-test', lambda version: _snapshot(self.discounts),
+                                  'PRICING_CACHE_TTL', 'PRICING_MISS_RELOAD')
+        patcher = mock.patch('hijau.pricing._cache', snapshots)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class QuoteTests(PricingTestCase):
+    discounts = {
+        'HEMAT10': _diskon('0.1'),
+        'AKHIR': _diskon('0.2', tgl_akhir=HARI_INI),
+        'MIN150': _diskon('0.15', min_transaksi=150000),
+        'GRATIS': _diskon('1.5'),
+        'SEPERTIGA': _diskon('0.333'),
+        'VCR': _diskon('0.25', is_voucher=True),
+    }
+
+    def test_without_discount(self):
+        harga = quote(SUBKATEGORI, 1, today=HARI_INI)
+        self.assertEqual((harga['harga'], harga['potongan'], harga['total']), (100000, 0, 100000))
+        self.assertIsNone(harga['discount_code'])
+
+    def test_subkategori_id_is_case_insensitive(self):
+        self.assertEqual(quote(SUBKATEGORI.upper(), '2', today=HARI_INI)['total'], 185000)
+
+    def test_promo_valid_through_last_day(self):
+        self.assertEqual(quote(SUBKATEGORI, 1, 'AKHIR', today=HARI_INI)['total'], 80000)
+
+    def test_expired_promo(self):
+        with self.assertRaisesMessage(PricingError, 'sudah tidak berlaku'):
+            quote(SUBKATEGORI, 1, 'AKHIR', today=date(2024, 6, 2))
+
+    def test_min_transaksi_boundary(self):
+        with self.assertRaisesMessage(PricingError, 'Minimum transaksi'):
+            quote(SUBKATEGORI, 1, 'MIN150', today=HARI_INI)
+        self.assertEqual(quote(SUBKATEGORI, 2, 'MIN150', today=HARI_INI)['potongan'], Decimal('27750'))
+
+    def test_potongan_capped_at_full_price(self):
+        harga = quote(SUBKATEGORI, 1, 'GRATIS', today=HARI_INI)
+        self.assertEqual((harga['potongan'], harga['total']), (100000, 0))
+
+    def test_potongan_rounded_to_rupiah(self):
+        self.assertEqual(quote(SUBKATEGORI, 1, 'SEPERTIGA', today=HARI_INI)['potongan'], Decimal('33300'))
+        self.assertEqual(quote(SUBKATEGORI, 2, 'SEPERTIGA', today=HARI_INI)['potongan'], Decimal('61605'))
+
+    def test_voucher_flag(self):
+        self.assertTrue(quote(SUBKATEGORI, 1, ' VCR ', today=HARI_INI)['is_voucher'])
+
+    def test_invalid_input(self):
+        for args, message in (
+            ((SUBKATEGORI, 'satu'), 'Sesi layanan tidak valid'),
+            ((SUBKATEGORI, 3), 'Sesi layanan tidak ditemukan'),
+            ((SUBKATEGORI, 1, 'TIDAKADA'), 'Kode diskon tidak valid'),
+        ):
+            with self.assertRaisesMessage(PricingError, message):
+                quote(*args, today=HARI_INI)
+
+    def test_quote_many_isolates_errors(self):
+        quotes = quote_many([
+            {'subkategori_id': SUBKATEGORI, 'sesi': 1, 'discount_code': 'HEMAT10'},
+            {'subkategori_id': SUBKATEGORI, 'sesi': 1, 'discount_code': 'AKHIR'},
+            {'subkategori_id': SUBKATEGORI, 'sesi': 9},
+        ], today=date(2024, 6, 2))
+        self.assertEqual(quotes[0]['total'], 90000)
+        self.assertIn('error', quotes[1])
+        self.assertIn('error', quotes[2])
+
+
+class BestDiscountTests(PricingTestCase):
+    discounts = {
+        'PROMO20': _diskon('0.2'),
+        'PROMO25LAMA': _diskon('0.25', tgl_akhir=date(2024, 5, 31)),
+        'PROMO30MIN': _diskon('0.3', min_transaksi=150000),
+        'VCR20': _diskon('0.2', is_voucher=True),
+        'VCR22': _diskon('0.22', is_voucher=True),
+        'VCR22B': _diskon('0.22', is_voucher=True),
+        'VCR50MIN': _diskon('0.5', min_transaksi=500000, is_voucher=True),
+    }
+
+    def test_best_promo_skips_expired_and_below_minimum(self):
+        harga = best_discount(SUBKATEGORI, 1, today=HARI_INI)
+        self.assertEqual((harga['discount_code'], harga['total']), ('PROMO20', 80000))
+
+    def test_minimum_met_on_larger_session(self):
+        self.assertEqual(best_discount(SUBKATEGORI, 2, today=HARI_INI)['discount_code'], 'PROMO30MIN')
+
+    def test_promo_wins_tie_with_voucher(self):
+        self.assertEqual(best_discount(SUBKATEGORI, 1, ['VCR20'], today=HARI_INI)['discount_code'], 'PROMO20')
+
+    def test_larger_voucher_wins(self):
+        harga = best_discount(SUBKATEGORI, 1, ['VCR20', 'VCR22'], today=HARI_INI)
+        self.assertEqual((harga['discount_code'], harga['is_voucher']), ('VCR22', True))
+
+    def test_equal_vouchers_keep_first_given(self):
+        self.assertEqual(best_discount(SUBKATEGORI, 1, ['VCR22B', 'VCR22'], today=HARI_INI)['discount_code'], 'VCR22B')
+
+    def test_ignores_unusable_voucher_codes(self):
+        # Promo bukan voucher, kode tak dikenal, dan voucher di bawah minimum diabaikan
+        harga = best_discount(SUBKATEGORI, 1, ['PROMO30MIN', 'TIDAKADA', 'VCR50MIN'], today=HARI_INI)
+        self.assertEqual(harga['discount_code'], 'PROMO20')
+
+
+class BestDiscountWithoutPromoTests(PricingTestCase):
+    discounts = {
+        'LAMA': _diskon('0.1', tgl_akhir=date(2024, 1, 1)),
+        'NOL': _diskon('0'),
+    }
+
+    def test_returns_base_price_when_nothing_applies(self):
+        harga = best_discount(SUBKATEGORI, 1, today=HARI_INI)
+        self.assertEqual((harga['discount_code'], harga['total']), (None, 100000))
+
+
+def _katalog(nama_subkategori):
+    subkategori = {'id': SUBKATEGORI, 'nama_subkategori': nama_subkategori, 'slug': slugify(nama_subkategori)}
+    return CatalogSnapshot(1, ({'id': 1, 'slug': 'kebersihan', 'subcategories': [subkategori]},))
+
+
+@override_settings(CATALOG_MISS_RELOAD=300)
+class CatalogInvalidationTests(SimpleTestCase):
+    def setUp(self):
+        snapshots = SnapshotCache('catalog-test', mock.Mock(side_effect=[_katalog('Cuci Sofa'), _katalog('Cuci Karpet')]),
+                                  'CATALOG_CACHE_TTL', 'CATALOG_MISS_RELOAD')
+        patcher = mock.patch('hijau.catalog._cache', snapshots)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_renamed_subcategory_resolves_after_refresh(self):
+        self.assertIsNotNone(resolve_slug('kebersihan', 'cuci-sofa'))
+        # Belum lewat CATALOG_MISS_RELOAD: slug baru belum dikenal
+        self.assertIsNone(resolve_slug('kebersihan', 'cuci-karpet'))
+
+        call_command('refresh_snapshots', 'catalog', stdout=StringIO())
+
+        self.assertIsNone(resolve_slug('kebersihan', 'cuci-sofa'))
+        self.assertEqual(resolve_slug('kebersihan', 'cuci-karpet')[1]['id'], SUBKATEGORI)
@@ -6,10 +6,14 @@ from kuning.views import edit_profile
 urlpatterns = [
      path('homepage/', views.homepage, name='homepage'),
      path('kategori/<str:category_slug>/<str:subcategory_slug>/', views.subcategory_jasa, name='subcategory_jasa'),
+     path('api/kategori/<uuid:category_id>/pekerja/', views.worker_leaderboard, name='worker_leaderboard'),
+     path('api/subkategori/<uuid:subcategory_id>/testimoni/', views.testimonial_feed, name='testimonial_feed'),
      path('pesanan/', views.view_pesanan, name='view_pesanan'),
      path('pesanan/buat/', views.create_order, name='create_order'),
      path('api/calculate-total/', views.calculate_total, name='calculate_total'),
-     path('api/join-service/<slug:subcategory_slug>/', views.join_service, name='join_service'),
+     path('api/quote/', views.quote_batch, name='quote_batch'),
+     path('api/diskon-terbaik/', views.best_discount_view, name='best_discount'),
+     path('api/join-service/<slug:category_slug>/<slug:subcategory_slug>/', views.join_service, name='join_service'),
      path('api/buat-testimoni/', views.create_testimonial, name='create_testimonial'),
      path('api/batalkan-pesanan/<uuid:order_id>/', views.cancel_order, name='cancel_order'),
      path('profile/', edit_profile, name='profile'),
@@ -8,11 +8,20 @@ from utils.db_connection import get_db_connection
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
-from django.utils.text import slugify
 import json
 import uuid
 from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
 from utils.decorators import custom_login_required
+from Blue.vouchers import fetch_wallet, has_usable_voucher
+from hijau.catalog import filter_categories, get_catalog, resolve_slug
+from hijau.leaderboard import fetch_top_workers
+from hijau.pricing import PricingError, best_discount, quote, quote_many
+from merah import order_status
+from hijau.testimonials import fetch_testimonials, get_first_page, invalidate_testimonials
+from utils.pagination import InvalidCursor
+from utils.reference_data import StatusPesanan, get_metode_bayar_name, get_status_id, list_metode_bayar
 from django.views.decorators.csrf import csrf_exempt
 
 # Configure logger
@@ -22,73 +31,18 @@ def homepage(request):
     """
     View untuk menampilkan halaman utama dengan daftar kategori dan subkategori jasa.
     Mendukung filter berdasarkan kategori dan pencarian subkategori.
+    Data diambil dari cache katalog (hijau.catalog), filter tidak menyentuh database.
     """
     logger.debug("homepage view called.")
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Ambil semua kategori jasa
-            cursor.execute("""
-                SELECT Id, NamaKategori
-                FROM KATEGORI_JASA
-                ORDER BY NamaKategori;
-            """)
-            categories = cursor.fetchall()
-            logger.debug(f"Fetched categories: {categories}")
-
-            categories_data = []
-            for category in categories:
-                category_id, nama_kategori = category
-                category_slug = slugify(nama_kategori)
-                logger.debug(f"Processing category: {nama_kategori} with slug: {category_slug}")
-
-                # Ambil subkategori untuk setiap kategori
-                cursor.execute("""
-                    SELECT Id, NamaSubKategori
-                    FROM SUBKATEGORI_JASA
-                    WHERE KategoriJasaId = %s
-                    ORDER BY NamaSubKategori;
-                """, (category_id,))
-                subcategories = cursor.fetchall()
-                logger.debug(f"Fetched subcategories for category_id {category_id}: {subcategories}")
-
-                subcategories_data = []
-                for subcategory in subcategories:
-                    sub_id, nama_subkategori = subcategory
-                    sub_slug = slugify(nama_subkategori)
-                    logger.debug(f"Processing subcategory: {nama_subkategori} with slug: {sub_slug}")
-                    subcategories_data.append({
-                        'id': sub_id,
-                        'nama_subkategori': nama_subkategori,
-                        'slug': sub_slug,
-                    })
-
-                categories_data.append({
-                    'id': category_id,
-                    'nama_kategori': nama_kategori,
-                    'slug': category_slug,
-                    'subcategories': subcategories_data,
-                    'icon': 'fas fa-concierge-bell',  # Ikon default atau sesuai kebutuhan
-                })
-
-            # Filter berdasarkan kategori dan pencarian
-            selected_category = request.GET.get('category', '')
-            search_query = request.GET.get('q', '')
-            logger.debug(f"Selected category: {selected_category}, Search query: {search_query}")
+        catalog = get_catalog()
 
-            if selected_category:
-                categories_data = [cat for cat in categories_data if cat['slug'] == selected_category]
-                logger.debug(f"Filtered categories_data by selected_category: {selected_category}")
+        # Filter berdasarkan kategori dan pencarian
+        selected_category = request.GET.get('category', '')
+        search_query = request.GET.get('q', '')
+        logger.debug(f"Selected category: {selected_category}, Search query: {search_query}")
 
-            if search_query:
-                for category in categories_data:
-                    original_count = len(category['subcategories'])
-                    category['subcategories'] = [
-                        sub for sub in category['subcategories']
-                        if search_query.lower() in sub['nama_subkategori'].lower()
-                    ]
-                    filtered_count = len(category['subcategories'])
-                    logger.debug(f"Filtered subcategories for category_id {category['id']} by search_query: {search_query} (from {original_count} to {filtered_count})")
+        categories_data = filter_categories(catalog, selected_category, search_query)
 
         context = {'categories': categories_data}
         logger.debug("Rendering homepage.html dengan context.")
@@ -97,72 +51,33 @@ def homepage(request):
         logger.exception("Error fetching homepage data.")
         messages.error(request, f"Error fetching homepage data: {str(e)}")
         return render(request, 'homepage.html', {'categories': []})
-    finally:
-        conn.close()
-        logger.debug("Database connection closed in homepage view.")
 
 def subcategory_jasa(request, category_slug, subcategory_slug):
     """
     View untuk menampilkan detail subkategori jasa, sesi layanan, pekerja, dan testimoni.
     """
     logger.debug(f"subcategory_jasa view called with category_slug='{category_slug}', subcategory_slug='{subcategory_slug}'")
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Ambil semua kategori jasa
-            cursor.execute("""
-                SELECT Id, NamaKategori
-                FROM KATEGORI_JASA
-            """)
-            categories = cursor.fetchall()
-            logger.debug(f"Fetched categories: {categories}")
-
-            category = None
-            for cat in categories:
-                cat_id, nama_kategori = cat
-                cat_slug = slugify(nama_kategori).lower()
-                logger.debug(f"Checking category: {nama_kategori} with slug: {cat_slug}")
-                if cat_slug == category_slug.lower():
-                    category = cat
-                    logger.debug(f"Matched category: {cat}")
-                    break
-
-            if not category:
-                logger.error(f"Category dengan slug '{category_slug}' tidak ditemukan.")
-                messages.error(request, "Kategori tidak ditemukan.")
-                return redirect('homepage')
-
-            category_id, nama_kategori = category
-            logger.debug(f"Category ID: {category_id}, Nama Kategori: {nama_kategori}")
+        # Resolusi slug lewat indeks slug katalog (O(1), sama dengan join_service)
+        match = resolve_slug(category_slug, subcategory_slug)
+    except Exception as e:
+        logger.exception("Error resolving subcategory slug.")
+        messages.error(request, f"Error fetching subcategory data: {str(e)}")
+        return redirect('homepage')
 
-            # Ambil semua subkategori untuk kategori ini
-            cursor.execute("""
-                SELECT Id, NamaSubKategori, Deskripsi
-                FROM SUBKATEGORI_JASA
-                WHERE KategoriJasaId = %s
-            """, (category_id,))
-            subcategories = cursor.fetchall()
-            logger.debug(f"Fetched subcategories for category_id {category_id}: {subcategories}")
-
-            subcategory = None
-            for sub in subcategories:
-                sub_id, nama_subkategori, deskripsi = sub
-                sub_slug = slugify(nama_subkategori).lower()
-                logger.debug(f"Checking subcategory: {nama_subkategori} with slug: {sub_slug}")
-                if sub_slug == subcategory_slug.lower():
-                    subcategory = sub
-                    subcategory_slug = sub_slug  # Ensure slug consistency
-                    logger.debug(f"Matched subcategory: {sub}")
-                    break
-
-            if not subcategory:
-                logger.error(f"Subkategori dengan slug '{subcategory_slug}' tidak ditemukan.")
-                messages.error(request, "Subkategori tidak ditemukan.")
-                return redirect('homepage')
+    if not match:
+        logger.error(f"Subkategori dengan slug '{category_slug}/{subcategory_slug}' tidak ditemukan.")
+        messages.error(request, "Subkategori tidak ditemukan.")
+        return redirect('homepage')
 
-            sub_id, nama_subkategori, deskripsi = subcategory
-            logger.debug(f"Subcategory ID: {sub_id}, Nama Subkategori: {nama_subkategori}, Deskripsi: {deskripsi}")
+    category, subcategory = match
+    category_id, nama_kategori = category['id'], category['nama_kategori']
+    sub_id, nama_subkategori, deskripsi = subcategory['id'], subcategory['nama_subkategori'], subcategory['deskripsi']
+    logger.debug(f"Category ID: {category_id}, Subcategory ID: {sub_id}, Nama Subkategori: {nama_subkategori}")
 
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
             # Ambil sesi layanan untuk subkategori
             cursor.execute("""
                 SELECT Sesi, Harga
@@ -177,57 +92,21 @@ def subcategory_jasa(request, category_slug, subcategory_slug):
                 for sesi, harga in service_sessions
             ]
 
-            # Ambil pekerja yang terkait dengan subkategori
-            cursor.execute("""
-                SELECT p.Id, u.Nama, p.Rating, p.JmlPesananSelesai, p.linkfoto
-                FROM PEKERJA p
-                JOIN "USER" u ON p.Id = u.Id
-                JOIN PEKERJA_KATEGORI_JASA pkj ON p.Id = pkj.PekerjaId
-                WHERE pkj.KategoriJasaId = %s
-                ORDER BY p.Rating DESC;
-            """, (category_id,))
-            workers = cursor.fetchall()
-            logger.debug(f"Fetched workers for KategoriJasaId {category_id}: {workers}")
-            workers_data = [
-                {
-                    'id': pekerja_id,
-                    'name': nama_pekerja,
-                    'rating': rating,
-                    'jml_pesanan_selesai': jml_pesanan,
-                    'profile_picture': link_foto,
-                }
-                for pekerja_id, nama_pekerja, rating, jml_pesanan, link_foto in workers
-            ]
+            # Ambil pekerja teratas kategori ini (halaman berikutnya lewat worker_leaderboard)
+            leaderboard = fetch_top_workers(category_id)
+            workers_data = leaderboard['workers']
+            logger.debug(f"Fetched {len(workers_data)} top workers for KategoriJasaId {category_id}")
 
-            # Ambil testimoni terkait subkategori
-            cursor.execute("""
-                SELECT t.Tgl, t.Teks, t.Rating, u.Nama
-                FROM TESTIMONI t
-                JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
-                JOIN "USER" u ON tpj.IdPelanggan = u.Id
-                WHERE tpj.IdKategoriJasa = %s
-                ORDER BY t.Tgl DESC;
-            """, (sub_id,))
-            testimonials = cursor.fetchall()
-            logger.debug(f"Fetched testimonials for KategoriJasaId {category_id}: {testimonials}")
-            testimonials_data = [
-                {
-                    'date': tgl.strftime('%d %b %Y'),
-                    'text': teks,
-                    'rating': rating,
-                    'user_name': nama_user,
-                }
-                for tgl, teks, rating, nama_user in testimonials
-            ]
+            # Halaman pertama testimoni dan ringkasan rating (di-cache per subkategori)
+            testimonial_page = get_first_page(sub_id)
+            testimonials_data = testimonial_page['testimonials']
+            rating_summary = testimonial_page['summary']
+            logger.debug(f"Loaded {len(testimonials_data)} testimonials for SubKategoriId {sub_id}")
             
             # Ambil metode pembayaran
-            cursor.execute("""
-                SELECT Id, Nama FROM METODE_BAYAR
-            """)
-            metode_bayar = cursor.fetchall()
             metode_bayar_data = [
                 {'Id': metode_id, 'Nama': nama}
-                for metode_id, nama in metode_bayar
+                for metode_id, nama in list_metode_bayar()
             ]
 
             # Cek apakah pengguna adalah pekerja
@@ -261,24 +140,61 @@ def subcategory_jasa(request, category_slug, subcategory_slug):
             'id': sub_id,
             'name': nama_subkategori,
             'description': deskripsi,
-            'slug': subcategory_slug,  # Added slug here
+            'slug': subcategory['slug'],
         },
         'category': {
             'id': category_id,
             'name': nama_kategori,
-            'slug': slugify(nama_kategori).lower(),
+            'slug': category['slug'],
         },
         'service_sessions': service_sessions_data,
         'workers': workers_data,
+        'workers_next_cursor': leaderboard['next_cursor'],
         'is_worker': is_worker,
         'is_joined': is_joined,
         'testimonials': testimonials_data,
+        'testimonials_next_cursor': testimonial_page['next_cursor'],
+        'rating_summary': rating_summary,
         'metode_bayar': metode_bayar_data,
     }
     logger.debug(f"Context data prepared: {context}")
 
     return render(request, 'subkategori_jasa.html', context)
 
+def worker_leaderboard(request, category_id):
+    """
+    API halaman berikutnya daftar pekerja teratas sebuah kategori jasa
+    (``?cursor=`` dari respons sebelumnya).
+    """
+    try:
+        leaderboard = fetch_top_workers(str(category_id), cursor=request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Error fetching worker leaderboard.")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    workers = [
+        {**worker, 'id': str(worker['id']), 'rating': float(worker['rating'])}
+        for worker in leaderboard['workers']
+    ]
+    return JsonResponse({'success': True, 'workers': workers, 'next_cursor': leaderboard['next_cursor']})
+
+def testimonial_feed(request, subcategory_id):
+    """
+    API halaman berikutnya testimoni sebuah subkategori (``?cursor=`` dari
+    respons sebelumnya).
+    """
+    try:
+        page = fetch_testimonials(str(subcategory_id), cursor=request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Error fetching testimonial feed.")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({'success': True, **page})
+
 @custom_login_required
 def view_pesanan(request):
     """
@@ -329,7 +245,7 @@ def view_pesanan(request):
 
             # Bangun query dasar
             query = """
-                SELECT DISTINCT ON (tpj.Id) 
+                SELECT
                     tpj.Id, 
                     sj.NamaSubKategori, 
                     tpj.TotalBiaya, 
@@ -342,7 +258,7 @@ def view_pesanan(request):
                 FROM TR_PEMESANAN_JASA tpj
                 LEFT JOIN "USER" u ON tpj.IdPekerja = u.Id
                 JOIN SUBKATEGORI_JASA sj ON tpj.IdKategoriJasa = sj.Id
-                LEFT JOIN TR_PEMESANAN_STATUS tps ON tpj.Id = tps.IdTrPemesanan
+                LEFT JOIN TR_PEMESANAN_STATUS_TERKINI tps ON tpj.Id = tps.IdTrPemesanan
                 LEFT JOIN STATUS_PEMESANAN sp ON tps.IdStatus = sp.Id
                 JOIN SESI_LAYANAN sl ON tpj.Sesi = sl.Sesi AND sl.SubKategoriId = tpj.IdKategoriJasa
                 WHERE tpj.IdPelanggan = %s
@@ -368,8 +284,7 @@ def view_pesanan(request):
                 params.append(f"%{search_query}%")
                 logger.debug(f"Applying search filter: {search_query}")
 
-            # Tambahkan ORDER BY untuk DISTINCT ON
-            query += " ORDER BY tpj.Id, tps.TglWaktu DESC;"
+            query += " ORDER BY tpj.Id;"
 
             logger.debug(f"Final SQL Query: {query}")
             logger.debug(f"Query Parameters: {params}")
@@ -422,7 +337,7 @@ def view_pesanan(request):
 def create_order(request):
     """
     View untuk membuat pesanan baru.
-    Memastikan total_payment disimpan dalam satuan ribuan rupiah.
+    Total pembayaran dihitung di server dari hijau.pricing, bukan dari form.
     """
     logger.debug("create_order view called.")
     if request.method != 'POST':
@@ -459,112 +374,72 @@ def create_order(request):
         messages.error(request, "Format tanggal pemesanan tidak valid.")
         return redirect('homepage')
 
+    # Total dihitung ulang di server; nilai total_payment dari form hanya tampilan
     try:
-        total_payment = float(total_payment_str.replace('Rp ', '').replace(',', ''))
-        if total_payment < 1000:
-            total_payment *= 1000
-        logger.debug(f"Parsed total_payment: {total_payment}")
-    except ValueError:
-        logger.error("Invalid total_payment format.")
-        messages.error(request, "Format total pembayaran tidak valid.")
+        harga = quote(subkategori_id, session_id, discount_code)
+    except PricingError as e:
+        logger.error(f"Gagal menghitung harga pesanan: {e}")
+        messages.error(request, str(e))
+        return redirect('homepage')
+    total_payment = harga['total']
+    id_diskon = harga['discount_code']
+
+    # Voucher dicek lebih dulu agar pesanan tidak gagal di trigger
+    # validate_voucher_usage_and_expiry (trigger tetap menjadi penjaga akhir)
+    if harga['is_voucher'] and not has_usable_voucher(user_id, id_diskon):
+        logger.error(f"Voucher {id_diskon} tidak dapat dipakai oleh pelanggan {user_id}.")
+        messages.error(request, "Voucher belum dibeli, sudah kedaluwarsa, atau kuotanya sudah habis.")
+        return redirect('homepage')
+    logger.debug(f"Server-side total: {total_payment} (potongan {harga['potongan']}), client total: {total_payment_str}")
+
+    # Validasi metode pembayaran
+    if not get_metode_bayar_name(payment_method):
+        logger.error("Metode pembayaran tidak valid.")
+        messages.error(request, "Metode pembayaran tidak valid.")
+        return redirect('homepage')
+    metode_bayar_id = payment_method
+    logger.debug(f"Validated MetodeBayarId: {metode_bayar_id}")
+
+    status_id = get_status_id(StatusPesanan.MENUNGGU_PEMBAYARAN)
+    if not status_id:
+        logger.error("Status 'Menunggu Pembayaran' tidak ditemukan.")
+        messages.error(request, "Status pesanan tidak valid.")
         return redirect('homepage')
 
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Mengambil informasi kategori dan subkategori berdasarkan session_id dan subkategori_id
-            cursor.execute("""
-                SELECT 
-                    s.SubKategoriId,
-                    sj.KategoriJasaId,
-                    sj.NamaSubKategori
-                FROM SESI_LAYANAN s
-                JOIN SUBKATEGORI_JASA sj ON s.SubKategoriId = sj.Id
-                WHERE s.Sesi = %s AND s.SubKategoriId = %s
-            """, (session_id, subkategori_id))
-            result = cursor.fetchone()
-            if not result:
-                logger.error("Sesi layanan atau SubKategoriId tidak ditemukan.")
-                messages.error(request, "Sesi layanan atau subkategori tidak ditemukan.")
-                return redirect('homepage')
-
-            subkategori_id_db, kategori_jasa_id, nama_subkategori = result
-            logger.debug(f"Identified SubKategoriId: {subkategori_id_db}, KategoriJasaId: {kategori_jasa_id}, NamaSubKategori: {nama_subkategori}")
-
-            # Validasi metode pembayaran
+            # Insert pesanan baru (IdKategoriJasa berisi SubKategoriId) beserta status awalnya
+            now = datetime.now()
             cursor.execute("""
-                SELECT Nama FROM METODE_BAYAR WHERE Id = %s
-            """, (payment_method,))
-            metode = cursor.fetchone()
-            if not metode:
-                logger.error("Metode pembayaran tidak valid.")
-                messages.error(request, "Metode pembayaran tidak valid.")
-                return redirect('homepage')
-            metode_bayar_id = payment_method
-            logger.debug(f"Validated MetodeBayarId: {metode_bayar_id}")
-
-            # Validasi dan ambil ID diskon
-            id_diskon = None
-            if discount_code:
-                cursor.execute("""
-                    SELECT Potongan FROM DISKON WHERE Kode = %s
-                """, (discount_code,))
-                diskon = cursor.fetchone()
-                if not diskon:
-                    logger.error("Kode diskon tidak valid.")
-                    messages.error(request, "Kode diskon tidak valid.")
-                    return redirect('homepage')
-                potongan = float(diskon[0])
-                total_payment = max(total_payment - potongan, 0)
-                id_diskon = discount_code
-                logger.debug(f"Applied discount: {potongan}, New total_payment: {total_payment}")
-
-            # Insert pesanan baru dengan menggunakan IdKategoriJasa sebagai SubKategoriId
-            cursor.execute("""
-                INSERT INTO TR_PEMESANAN_JASA (
-                    Id, TglPemesanan, TglPekerjaan, WaktuPekerjaan, TotalBiaya,
-                    IdPelanggan, IdPekerja, IdKategoriJasa, Sesi, IdDiskon, IdMetodeBayar
+                WITH pesanan AS (
+                    INSERT INTO TR_PEMESANAN_JASA (
+                        Id, TglPemesanan, TglPekerjaan, WaktuPekerjaan, TotalBiaya,
+                        IdPelanggan, IdPekerja, IdKategoriJasa, Sesi, IdDiskon, IdMetodeBayar
+                    )
+                    VALUES (
+                        uuid_generate_v4(), %(tgl)s, %(tgl)s, %(now)s, %(total)s,
+                        %(pelanggan)s, NULL, %(subkategori)s, %(sesi)s, %(diskon)s, %(metode)s
+                    )
+                    RETURNING Id
+                ), status AS (
+                    INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
+                    SELECT Id, %(status)s, %(now)s FROM pesanan
                 )
-                VALUES (
-                    uuid_generate_v4(), %s, %s, %s, %s,
-                    %s, NULL, %s, %s, %s, %s
-                )
-                RETURNING Id;
-            """, (
-                order_date,
-                order_date,
-                datetime.now(),
-                total_payment,
-                user_id,
-                subkategori_id_db,    # Menggunakan SubKategoriId sebagai IdKategoriJasa
-                session_id,
-                id_diskon,
-                metode_bayar_id,
-            ))
+                SELECT Id FROM pesanan;
+            """, {
+                'tgl': order_date,
+                'now': now,
+                'total': total_payment,
+                'pelanggan': user_id,
+                'subkategori': harga['subkategori_id'],
+                'sesi': harga['sesi'],
+                'diskon': id_diskon,
+                'metode': metode_bayar_id,
+                'status': status_id,
+            })
             order_id = cursor.fetchone()[0]
-            logger.debug(f"Inserted order dengan Id: {order_id}")
-
-            # Set status awal pesanan
-            cursor.execute("""
-                SELECT Id FROM STATUS_PEMESANAN WHERE Status = 'Menunggu Pembayaran'
-            """)
-            status = cursor.fetchone()
-            if not status:
-                logger.error("Status 'Menunggu Pembayaran' tidak ditemukan.")
-                messages.error(request, "Status pesanan tidak valid.")
-                return redirect('homepage')
-            status_id = status[0]
-            logger.debug(f"Status ID untuk 'Menunggu Pembayaran': {status_id}")
-
-            cursor.execute("""
-                INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
-                VALUES (%s, %s, %s)
-            """, (
-                order_id,
-                status_id,
-                datetime.now(),
-            ))
-            logger.debug(f"Inserted TR_PEMESANAN_STATUS untuk Order Id: {order_id}")
+            logger.debug(f"Inserted order dan status awal dengan Id: {order_id}")
 
             conn.commit()
             logger.debug("Order berhasil dibuat.")
@@ -579,56 +454,75 @@ def create_order(request):
         conn.close()
         logger.debug("Database connection closed in create_order view.")
 
+def _quote_json(harga):
+    """Konversi hasil hijau.pricing.quote agar bisa di-serialisasi JsonResponse."""
+    return {key: float(value) if isinstance(value, Decimal) else value for key, value in harga.items()}
+
 @csrf_exempt
 def calculate_total(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            session_sesi = data.get('session_sesi')
-            discount_code = data.get('discount_code', '').strip()
-
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                # Ambil harga dari sesi layanan
-                cursor.execute("""
-                    SELECT harga FROM SESI_LAYANAN WHERE sesi = %s
-                """, (session_sesi,))
-                result = cursor.fetchone()
-                if not result:
-                    return JsonResponse({'success': False, 'error': 'Sesi layanan tidak ditemukan.'})
-
-                harga = float(result[0])
-
-                # Hitung diskon jika ada kode diskon
-                if discount_code:
-                    cursor.execute("""
-                        SELECT persen_diskon FROM DISKON WHERE kode = %s AND aktif = TRUE
-                    """, (discount_code,))
-                    discount = cursor.fetchone()
-                    if discount:
-                        persen_diskon = float(discount[0])
-                        discount_amount = harga * (persen_diskon / 100)
-                        total_payment = harga - discount_amount
-                    else:
-                        return JsonResponse({'success': False, 'error': 'Kode diskon tidak valid.'})
-                else:
-                    total_payment = harga
-
-                return JsonResponse({'success': True, 'total_payment': total_payment})
-
+            harga = quote(data.get('subkategori_id'), data.get('session_sesi'), data.get('discount_code', ''))
+            return JsonResponse({'success': True, 'total_payment': float(harga['total']), 'quote': _quote_json(harga)})
+        except PricingError as e:
+            return JsonResponse({'success': False, 'error': str(e)})
         except Exception as e:
             logger.exception("Error calculating total payment.")
             return JsonResponse({'success': False, 'error': str(e)})
     else:
         return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
+@csrf_exempt
+@require_POST
+def quote_batch(request):
+    """
+    API untuk menghitung harga banyak kombinasi sesi/diskon sekaligus.
+    Body JSON: ``{"items": [{"subkategori_id": ..., "sesi": ..., "discount_code": ...}, ...]}``.
+    """
+    try:
+        items = json.loads(request.body).get('items')
+    except (ValueError, AttributeError):
+        items = None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return JsonResponse({'success': False, 'error': 'Format permintaan tidak valid.'}, status=400)
+    max_items = getattr(settings, 'PRICING_MAX_BATCH', 100)
+    if len(items) > max_items:
+        return JsonResponse({'success': False, 'error': f'Maksimal {max_items} item per permintaan.'}, status=400)
+
+    try:
+        quotes = quote_many(items)
+    except Exception as e:
+        logger.exception("Error calculating batch quote.")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    return JsonResponse({'success': True, 'quotes': [_quote_json(harga) for harga in quotes]})
+
+@custom_login_required
+def best_discount_view(request):
+    """
+    API diskon terbaik untuk pelanggan yang sedang login pada satu sesi layanan
+    (``?subkategori_id=...&sesi=...``), dari promo aktif dan voucher miliknya.
+    """
+    user = request.session['user']
+    try:
+        voucher_codes = []
+        if user.get('role') == 'pelanggan':
+            voucher_codes = {voucher['kode'] for voucher in fetch_wallet(user['Id'])}
+        harga = best_discount(request.GET.get('subkategori_id'), request.GET.get('sesi'), voucher_codes)
+    except PricingError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Error finding best discount.")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    return JsonResponse({'success': True, 'quote': _quote_json(harga)})
+
 @require_POST
 @custom_login_required
-def join_service(request, subcategory_slug):
+def join_service(request, category_slug, subcategory_slug):
     """
     API View for a worker to join a category service.
     """
-    logger.debug(f"join_service API called with subcategory_slug='{subcategory_slug}'")
+    logger.debug(f"join_service API called with category_slug='{category_slug}', subcategory_slug='{subcategory_slug}'")
     user = request.session.get('user')
     if not user:
         return JsonResponse({'success': False, 'error': 'User not authenticated.'})
@@ -639,25 +533,22 @@ def join_service(request, subcategory_slug):
     user_id = user.get('Id')
     logger.debug(f"Worker ID: {user_id} attempting to join service.")
     
-    subcategory_name = subcategory_slug.replace('-', ' ').lower()
+    try:
+        match = resolve_slug(category_slug, subcategory_slug)
+    except Exception:
+        logger.exception("Error resolving subcategory slug.")
+        return JsonResponse({'success': False, 'error': 'An unexpected error occurred.'})
+    if not match:
+        logger.error(f"Subcategory dengan slug '{category_slug}/{subcategory_slug}' tidak ditemukan.")
+        return JsonResponse({'success': False, 'error': 'Subcategory not found.'})
+
+    category, subcategory = match
+    kategori_jasa_id = category['id']
+    logger.debug(f"Matched subcategory: {subcategory['id']}, {subcategory['nama_subkategori']}, {kategori_jasa_id}")
 
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            # Ambil subkategori berdasarkan slug
-            cursor.execute("""
-                SELECT Id, NamaSubKategori, KategoriJasaId
-                FROM SUBKATEGORI_JASA
-                WHERE LOWER(namasubkategori) = %s
-            """, (subcategory_name,))
-            subcategory = cursor.fetchone()
-            if not subcategory:
-                logger.error(f"Subcategory dengan slug '{subcategory_slug}' tidak ditemukan.")
-                return JsonResponse({'success': False, 'error': 'Subcategory not found.'})
-
-            subkategori_id_db, nama_subkategori, kategori_jasa_id = subcategory
-            logger.debug(f"Matched subcategory: {subkategori_id_db}, {nama_subkategori}, {kategori_jasa_id}")
-
             # Insert ke tabel PEKERJA_KATEGORI_JASA
             cursor.execute("""
                 INSERT INTO PEKERJA_KATEGORI_JASA (PekerjaId, KategoriJasaId)
@@ -691,9 +582,11 @@ def worker_profile(request, worker_id):
             # Ambil informasi pekerja
             cursor.execute("""
                 SELECT u.Nama, u.JenisKelamin, u.NoHP, u.TglLahir, u.Alamat,
-                       p.NamaBank, p.NomorRekening, p.NPWP, p.LinkFoto, p.Rating, p.JmlPesananSelesai
+                       p.NamaBank, p.NomorRekening, p.NPWP, p.LinkFoto, p.Rating, p.JmlPesananSelesai,
+                       COALESCE(rp.JumlahRating, 0)
                 FROM PEKERJA p
                 JOIN "USER" u ON p.Id = u.Id
+                LEFT JOIN RATING_PEKERJA rp ON rp.PekerjaId = p.Id
                 WHERE p.Id = %s
             """, (worker_id,))
             worker = cursor.fetchone()
@@ -725,6 +618,7 @@ def worker_profile(request, worker_id):
                 'photo_link': worker[8],
                 'rating': worker[9],
                 'completed_orders': worker[10],
+                'rating_count': worker[11],
                 'job_categories': job_categories,
             },
             'is_own_profile': False,  # Menandakan ini bukan profil sendiri
@@ -774,12 +668,11 @@ def create_testimonial(request):
         with conn.cursor() as cursor:
             # Verifikasi pesanan
             cursor.execute("""
-                SELECT tpj.IdPelanggan FROM TR_PEMESANAN_JASA tpj
-                WHERE tpj.Id = %s AND tpj.IdPelanggan = %s AND (
-                    SELECT sp.Status FROM TR_PEMESANAN_STATUS tps
-                    JOIN STATUS_PEMESANAN sp ON tps.IdStatus = sp.Id
-                    WHERE tps.IdTrPemesanan = tpj.Id ORDER BY tps.TglWaktu DESC LIMIT 1
-                ) = 'Pemesanan Selesai'
+                SELECT tpj.IdKategoriJasa FROM TR_PEMESANAN_JASA tpj
+                JOIN TR_PEMESANAN_STATUS_TERKINI tps ON tps.IdTrPemesanan = tpj.Id
+                JOIN STATUS_PEMESANAN sp ON tps.IdStatus = sp.Id
+                WHERE tpj.Id = %s AND tpj.IdPelanggan = %s
+                  AND sp.Status = 'Pemesanan Selesai'
             """, (order_id, user_id))
             pesanan = cursor.fetchone()
             if not pesanan:
@@ -803,6 +696,7 @@ def create_testimonial(request):
                 VALUES (%s, %s, %s, %s)
             """, (order_id, datetime.now().date(), testimonial_text, rating))
             conn.commit()
+            invalidate_testimonials(pesanan[0])
             logger.debug(f"Testimoni berhasil dibuat untuk Pesanan ID: {order_id}")
             messages.success(request, "Testimoni berhasil dibuat.")
             return redirect('view_pesanan')
@@ -817,6 +711,13 @@ def create_testimonial(request):
             conn.close()
             logger.debug("Database connection closed in create_testimonial.")
 
+# Kode kegagalan merah.order_status -> HTTP status
+CANCEL_ERROR_STATUS = {
+    order_status.TIDAK_DITEMUKAN: 404,
+    order_status.BUKAN_PEMILIK: 404,
+    order_status.KONFLIK: 409,
+}
+
 @require_POST
 @custom_login_required
 def cancel_order(request, order_id):
@@ -832,58 +733,15 @@ def cancel_order(request, order_id):
     user_id = user.get('Id')
     logger.debug(f"User ID: {user_id} attempting to cancel order.")
 
+    # Aturan pembatalan dan kepemilikan dijaga merah.order_status
     try:
-        # order_id sudah berupa objek UUID, tidak perlu diparse ulang
-        order_uuid = order_id
-
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            # Ambil status terbaru dari TR_PEMESANAN_STATUS
-            cursor.execute("""
-                SELECT sp.Status
-                FROM TR_PEMESANAN_STATUS tps
-                JOIN STATUS_PEMESANAN sp ON tps.IdStatus = sp.Id
-                WHERE tps.IdTrPemesanan = %s
-                ORDER BY tps.TglWaktu DESC
-                LIMIT 1;
-            """, (str(order_uuid),))
-            pesanan = cursor.fetchone()
-            if not pesanan:
-                logger.error(f"Pesanan ID: {order_uuid} tidak ditemukan.")
-                return JsonResponse({'success': False, 'error': 'Pesanan tidak ditemukan'}, status=404)
-
-            current_status = pesanan[0]
-            logger.debug(f"Current status of Pesanan ID {order_uuid}: {current_status}")
-            if current_status not in ['Menunggu Pembayaran', 'Mencari Pekerja Terdekat']:
-                logger.error(f"Pesanan ID: {order_uuid} tidak dapat dibatalkan karena statusnya adalah '{current_status}'.")
-                return JsonResponse({'success': False, 'error': 'Pesanan tidak dapat dibatalkan'}, status=400)
-
-            # Ambil Id status 'Pemesanan Dibatalkan'
-            cursor.execute("""
-                SELECT Id FROM STATUS_PEMESANAN WHERE Status = 'Pemesanan Dibatalkan';
-            """)
-            status_id = cursor.fetchone()
-            if not status_id:
-                logger.error("Status 'Pemesanan Dibatalkan' tidak ditemukan dalam STATUS_PEMESANAN.")
-                return JsonResponse({'success': False, 'error': 'Status pembatalan tidak valid'}, status=500)
-            status_id = status_id[0]
-
-            # Insert status baru 'Pemesanan Dibatalkan' ke TR_PEMESANAN_STATUS
-            cursor.execute("""
-                INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
-                VALUES (%s, %s, %s);
-            """, (str(order_uuid), status_id, datetime.now()))
-            logger.debug(f"Inserted TR_PEMESANAN_STATUS untuk Pesanan ID: {order_uuid}.")
-
-            conn.commit()
-            logger.info(f"Pesanan ID: {order_uuid} berhasil dibatalkan.")
-            return JsonResponse({'success': True})
+        order_status.apply_transition(user_id, 'pelanggan', order_id, StatusPesanan.DIBATALKAN)
+    except order_status.TransitionError as e:
+        logger.error(f"Pesanan ID: {order_id} tidak dapat dibatalkan ({e.code}): {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=CANCEL_ERROR_STATUS.get(e.code, 400))
     except Exception as e:
-        if 'conn' in locals():
-            conn.rollback()
         logger.exception("Error cancelling order.")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
-    finally:
-        if 'conn' in locals():
-            conn.close()
-            logger.debug("Database connection closed in cancel_order API.")
+
+    logger.info(f"Pesanan ID: {order_id} berhasil dibatalkan.")
+    return JsonResponse({'success': True})
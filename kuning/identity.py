@@ -0,0 +1,119 @@
+# kuning/identity.py
+
+import logging
+
+from utils.db_connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Satu query untuk pengguna, role, level pelanggan, data pekerja, dan
+# kategori jasa pekerja (array_agg lewat LEFT JOIN LATERAL).
+IDENTITY_QUERY = """
+    SELECT u.Id::text, u.Nama, u.JenisKelamin, u.NoHP, u.Pwd, u.TglLahir, u.Alamat, saldo_dompet(u.Id),
+           pl.Id IS NOT NULL, pl.Level,
+           pk.Id IS NOT NULL, pk.NamaBank, pk.NomorRekening, pk.NPWP, pk.LinkFoto,
+           pk.Rating, pk.JmlPesananSelesai,
+           COALESCE(kategori.nama, ARRAY[]::VARCHAR[])
+    FROM "USER" u
+    LEFT JOIN PELANGGAN pl ON pl.Id = u.Id
+    LEFT JOIN PEKERJA pk ON pk.Id = u.Id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(kj.NamaKategori ORDER BY kj.NamaKategori) AS nama
+        FROM PEKERJA_KATEGORI_JASA pkj
+        JOIN KATEGORI_JASA kj ON pkj.KategoriJasaId = kj.Id
+        WHERE pkj.PekerjaId = pk.Id
+    ) kategori ON TRUE
+    WHERE {condition}
+"""
+
+
+def _fetch(condition, value):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(IDENTITY_QUERY.format(condition=condition), (value,))
+            row = cursor.fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None, None
+
+    (user_id, nama, gender, phone, pwd, tgl_lahir, alamat, saldo,
+     is_pelanggan, level, is_pekerja, bank, account_number, npwp, photo_link,
+     rating, completed_orders, job_categories) = row
+
+    identity = {
+        'Id': user_id,
+        'Nama': nama,
+        'gender': gender,
+        'phone': phone,
+        'TglLahir': tgl_lahir,
+        'alamat': alamat,
+        'saldo': float(saldo) if saldo else 0.0,
+        'role': 'pelanggan' if is_pelanggan else 'pekerja' if is_pekerja else 'unknown',
+        'level': level,
+        'job_categories': list(job_categories),
+    }
+    if is_pekerja and not is_pelanggan:
+        identity.update({
+            'bank_name': bank,
+            'account_number': account_number,
+            'npwp': npwp,
+            'photo_link': photo_link,
+            'rating': float(rating) if rating is not None else None,
+            'completed_orders': completed_orders,
+        })
+    return identity, pwd
+
+
+def authenticate(phone, password):
+    """Identitas pengguna bila nomor HP dan password cocok, selain itu None."""
+    identity, pwd = _fetch("u.NoHP = %s", phone)
+    if identity is None or pwd != password:
+        return None
+    return identity
+
+
+def load_identity(user_id):
+    """Identitas lengkap pengguna berdasarkan Id (untuk profil dan refresh session)."""
+    identity, _ = _fetch("u.Id = %s", user_id)
+    return identity
+
+
+# Berubah tanpa aksi pengguna (mutasi MyPay, testimoni, pesanan selesai); tidak
+# disimpan di session agar membuka profil tidak selalu menulis ulang session.
+# Halaman yang menampilkannya membaca langsung dari load_identity.
+VOLATILE_KEYS = ('saldo', 'rating', 'completed_orders')
+
+
+def session_user(identity):
+    """Payload request.session['user'] dari identitas (tanggal sebagai string, tanpa VOLATILE_KEYS)."""
+    payload = {key: value for key, value in identity.items() if key not in VOLATILE_KEYS}
+    payload['TglLahir'] = identity['TglLahir'].strftime('%Y-%m-%d') if identity['TglLahir'] else ''
+    return payload
+
+
+def profile_context(identity):
+    """Context template profile.html untuk profil milik sendiri."""
+    context = {
+        'name': identity['Nama'],
+        'phone': identity['phone'],
+        'gender': identity['gender'],
+        'birthdate': identity['TglLahir'].strftime('%Y-%m-%d') if identity['TglLahir'] else '',
+        'address': identity['alamat'],
+        'saldo': identity['saldo'],
+        'is_own_profile': True,
+    }
+    if identity['role'] == 'pelanggan':
+        context['level'] = identity['level']
+    elif identity['role'] == 'pekerja':
+        context.update({
+            'bank_name': identity['bank_name'],
+            'account_number': identity['account_number'],
+            'npwp': identity['npwp'],
+            'photo_link': identity['photo_link'],
+            'job_categories': identity['job_categories'],
+            'rating': identity['rating'],
+            'completed_orders': identity['completed_orders'],
+        })
+    return context
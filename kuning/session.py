@@ -0,0 +1,152 @@
+# kuning/session.py
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from kuning.identity import load_identity, session_user
+
+logger = logging.getLogger(__name__)
+
+TOKEN_KEYS = ('Id', 'role', 'v')
+
+# Cache per proses: perubahan session (logout, flush, edit profil) di satu
+# worker tidak terlihat oleh worker lain yang masih menyimpan salinan lama
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def require_shared_cache():
+    """Raise ImproperlyConfigured bila cache session bukan cache bersama (Redis/Memcached)."""
+    alias = getattr(settings, 'SESSION_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        raise ImproperlyConfigured(
+            f"SESSION_ENGINE 'kuning.session' membutuhkan cache bersama, bukan {backend}. "
+            "Set CACHE_URL atau pakai 'django.contrib.sessions.backends.db'."
+        )
+
+
+def _profile_key(user_id, version):
+    return f"sesi-profil:{user_id}:{version}"
+
+
+def _profile_version(profile):
+    """Versi pendek profil: berubah hanya bila isi profil berubah."""
+    raw = json.dumps(profile, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+class SessionUser(dict):
+    """
+    Isi ``request.session['user']``. Yang disimpan di session hanya token
+    (Id, role, versi); kunci lain (Nama, saldo, kategori, ...) dimuat dari
+    read model di cache saat pertama kali dibaca, atau dari basis data
+    lewat kuning.identity bila cache kosong.
+    """
+
+    def __init__(self, token, profile=None):
+        super().__init__((key, token[key]) for key in TOKEN_KEYS if key in token)
+        self._loaded = False
+        if profile is not None:
+            self._fill(profile)
+
+    def token(self):
+        return {key: dict.get(self, key) for key in TOKEN_KEYS}
+
+    def _fill(self, profile):
+        for key, value in profile.items():
+            if key not in TOKEN_KEYS:
+                dict.__setitem__(self, key, value)
+        self._loaded = True
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        key = _profile_key(dict.get(self, 'Id'), dict.get(self, 'v'))
+        profile = cache.get(key)
+        if profile is None:
+            identity = load_identity(dict.get(self, 'Id'))
+            if identity is None:
+                logger.warning(f"Session user {dict.get(self, 'Id')} tidak ditemukan.")
+                return
+            profile = session_user(identity)
+            cache.set(key, profile, getattr(settings, 'SESSION_PROFILE_TTL', 86400))
+        self._fill(profile)
+
+    def __missing__(self, key):
+        self._load()
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        if not dict.__contains__(self, key):
+            self._load()
+        return dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __reduce__(self):
+        # Saat session di-cache (cached_db), hanya token yang ikut dipickle
+        return (SessionUser, (self.token(),))
+
+
+def compact_user(value):
+    """
+    Ubah payload user (dict lengkap dari kuning.identity.session_user atau
+    token hasil decode) menjadi SessionUser. Profil lengkap disimpan ke read
+    model dengan versi sesuai isinya.
+    """
+    if isinstance(value, SessionUser):
+        return value
+    if 'v' in value and set(value) <= set(TOKEN_KEYS):
+        return SessionUser(value)
+
+    profile = {key: item for key, item in value.items() if key != 'v'}
+    version = _profile_version(profile)
+    cache.set(_profile_key(profile['Id'], version), profile, getattr(settings, 'SESSION_PROFILE_TTL', 86400))
+    return SessionUser({'Id': profile['Id'], 'role': profile.get('role'), 'v': version}, profile)
+
+
+class SessionStore(CachedDBStore):
+    """
+    Session cached_db yang hanya menyimpan token identitas untuk
+    ``session['user']`` dan tidak menandai session berubah bila token
+    yang di-set sama dengan yang sudah ada (mis. edit_profile GET).
+    Hanya aman di atas cache bersama, lihat ``require_shared_cache``.
+    """
+
+    def __init__(self, session_key=None):
+        require_shared_cache()
+        super().__init__(session_key)
+
+    def load(self):
+        data = super().load()
+        if isinstance(data.get('user'), dict):
+            data['user'] = compact_user(data['user'])
+        return data
+
+    def encode(self, session_dict):
+        if isinstance(session_dict.get('user'), dict):
+            session_dict = {**session_dict, 'user': compact_user(session_dict['user']).token()}
+        return super().encode(session_dict)
+
+    def __setitem__(self, key, value):
+        if key == 'user' and isinstance(value, dict):
+            value = compact_user(value)
+            current = self._session.get('user')
+            if isinstance(current, SessionUser) and current.token() == value.token():
+                # Token sama: perbarui nilai di memori tanpa menulis session
+                self._session[key] = value
+                return
+        super().__setitem__(key, value)
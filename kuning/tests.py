@@ -1,3 +1,136 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.sessions.backends.signed_cookies import SessionStore as CookieSessionStore
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from kuning import views
+from kuning.identity import session_user
+from kuning.session import SessionStore
+
+USER = {
+    'Id': '7b0d5a8e-0000-4000-8000-000000000001',
+    'Nama': 'Budi',
+    'role': 'pelanggan',
+    'phone': '081234567890',
+    'TglLahir': '1990-01-01',
+    'level': 'Basic',
+    'job_categories': [],
+}
+
+# Cache berbasis file di satu direktori dibagi semua proses, seperti Redis
+CACHE_DIR = tempfile.mkdtemp(prefix='sijarta-session-test-')
+SHARED_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+}
+
+
+def _finish_request(session):
+    # Seperti SessionMiddleware: hanya disimpan bila ada perubahan
+    if session.modified:
+        session.save()
+
+
+@skipUnless(settings.DATABASES['default'].get('NAME'), "Session cached_db butuh basis data; set DATABASE_URL.")
+@override_settings(SESSION_ENGINE='kuning.session', CACHES=SHARED_CACHE)
+class SharedCacheSessionTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        login = SessionStore()
+        login['user'] = dict(USER)
+        login.save()
+        self.key = login.session_key
+
+    def test_session_stores_only_identity_token(self):
+        self.assertEqual(set(SessionStore(self.key).load()['user'].token()), {'Id', 'role', 'v'})
+
+    def test_same_token_does_not_mark_session_modified(self):
+        session = SessionStore(self.key)
+        session['user'] = dict(USER)
+        self.assertFalse(session.modified)
+        session['user'] = {**USER, 'Nama': 'Budi Baru'}
+        self.assertTrue(session.modified)
+
+    def test_logout_takes_effect_in_every_process(self):
+        # Dua worker memuat session yang sama sebelum logout
+        worker_a, worker_b = SessionStore(self.key), SessionStore(self.key)
+        self.assertIn('user', worker_a)
+        self.assertIn('user', worker_b)
+
+        del worker_a['user']
+        _finish_request(worker_a)
+
+        # Request worker B yang sudah berjalan menulis token yang sama (edit_profile GET)
+        worker_b['user'] = dict(USER)
+        _finish_request(worker_b)
+
+        for worker in range(2):
+            self.assertNotIn('user', SessionStore(self.key), f"worker {worker}")
+
+    def test_flush_takes_effect_in_every_process(self):
+        worker_a = SessionStore(self.key)
+        worker_a.flush()
+        self.assertNotIn('user', SessionStore(self.key))
+
+    def test_profile_update_visible_in_other_process(self):
+        worker_a = SessionStore(self.key)
+        worker_a['user'] = {**USER, 'Nama': 'Budi Baru'}
+        _finish_request(worker_a)
+        self.assertEqual(SessionStore(self.key)['user']['Nama'], 'Budi Baru')
+
+
+class SessionEngineConfigTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_rejects_per_process_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            SessionStore()
+
+
+class EditProfileSessionTests(SimpleTestCase):
+    """Membuka profil (GET) tidak boleh menulis session bila profil tidak berubah."""
+
+    def setUp(self):
+        self.identity = {**USER, 'TglLahir': date(1990, 1, 1), 'gender': 'L', 'alamat': 'Depok', 'saldo': 150000.0}
+        patcher = mock.patch('kuning.views.load_identity', side_effect=lambda user_id: dict(self.identity))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_profile(self, session=None):
+        request = RequestFactory().get('/profile/')
+        if session is None:
+            session = CookieSessionStore()
+            session['user'] = session_user(self.identity)
+            session.modified = False
+        request.session = session
+        views.edit_profile(request)
+        return session
+
+    def test_unchanged_profile_does_not_write_session(self):
+        self.assertFalse(self._get_profile().modified)
+
+    def test_saldo_change_does_not_write_session(self):
+        session = self._get_profile()
+        self.identity['saldo'] = 0.0
+        self._get_profile(session)
+        self.assertFalse(session.modified)
+        self.assertNotIn('saldo', session['user'])
+
+    def test_profile_change_writes_session(self):
+        session = self._get_profile()
+        self.identity['Nama'] = 'Budi Baru'
+        self._get_profile(session)
+        self.assertTrue(session.modified)
+        self.assertEqual(session['user']['Nama'], 'Budi Baru')
@@ -0,0 +1,156 @@
+# merah/dispatch.py
+
+import logging
+from datetime import datetime
+
+from utils.db_connection import run_in_transaction
+from utils.reference_data import StatusPesanan, get_status_id
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimError(Exception):
+    """Pesanan tidak bisa diambil; pesan ditujukan untuk ditampilkan ke pengguna."""
+
+
+# Pesanan yang boleh diambil pekerja: belum punya pekerja, status terkini
+# 'Mencari Pekerja Terdekat', dan kategorinya dilayani pekerja tersebut.
+# FOR UPDATE OF t, ts mengunci baris pesanan dan proyeksi statusnya; pada
+# READ COMMITTED, klaim yang menunggu kunci mengevaluasi ulang syarat ini
+# terhadap versi terbaru baris sehingga hanya satu pekerja yang menang
+# (pembatalan juga memperbarui baris ts lewat trigger).
+KANDIDAT_QUERY = """
+    SELECT t.id
+    FROM tr_pemesanan_jasa t
+    JOIN tr_pemesanan_status_terkini ts ON ts.idtrpemesanan = t.id
+    JOIN subkategori_jasa s ON s.id = t.idkategorijasa
+    JOIN pekerja_kategori_jasa pk ON pk.kategorijasaid = s.kategorijasaid
+    WHERE t.idpekerja IS NULL
+      AND ts.idstatus = %(mencari)s
+      AND pk.pekerjaid = %(pekerja)s
+"""
+
+# {kandidat} menghasilkan paling banyak satu baris yang sudah dikunci
+CLAIM_QUERY = """
+    WITH kandidat AS ({kandidat}),
+    klaim AS (
+        UPDATE tr_pemesanan_jasa t
+        SET idpekerja = %(pekerja)s,
+            tglpekerjaan = %(tgl)s,
+            -- 1 sesi = 1 hari sejak tanggal pekerjaan
+            waktupekerjaan = %(tgl)s::timestamp + t.sesi * INTERVAL '1 day'
+        FROM kandidat
+        WHERE t.id = kandidat.id
+        RETURNING t.id, t.idkategorijasa, t.sesi, t.totalbiaya, t.tglpekerjaan, t.waktupekerjaan
+    ), status AS (
+        INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
+        SELECT id, %(menunggu)s, %(waktu)s FROM klaim
+    )
+    SELECT klaim.id, s.namasubkategori, klaim.sesi, klaim.totalbiaya, klaim.tglpekerjaan, klaim.waktupekerjaan
+    FROM klaim
+    JOIN subkategori_jasa s ON s.id = klaim.idkategorijasa
+"""
+
+# Alasan klaim gagal, hanya dijalankan setelah CLAIM_QUERY tidak mengambil apa pun
+ALASAN_QUERY = """
+    SELECT t.idpekerja, ts.idstatus,
+           EXISTS (
+               SELECT 1
+               FROM subkategori_jasa s
+               JOIN pekerja_kategori_jasa pk ON pk.kategorijasaid = s.kategorijasaid
+               WHERE s.id = t.idkategorijasa AND pk.pekerjaid = %(pekerja)s
+           )
+    FROM tr_pemesanan_jasa t
+    LEFT JOIN tr_pemesanan_status_terkini ts ON ts.idtrpemesanan = t.id
+    WHERE t.id = %(pesanan)s
+"""
+
+
+def _params(pekerja_id):
+    mencari = get_status_id(StatusPesanan.MENCARI_PEKERJA)
+    menunggu = get_status_id(StatusPesanan.MENUNGGU_PEKERJA)
+    if not mencari or not menunggu:
+        logger.error("Status pencarian/penugasan pekerja tidak ditemukan di STATUS_PEMESANAN.")
+        raise ClaimError('Status pesanan tidak valid.')
+    now = datetime.now()
+    return {
+        'pekerja': str(pekerja_id),
+        'mencari': mencari,
+        'menunggu': menunggu,
+        'tgl': now.date(),
+        'waktu': now,
+    }
+
+
+def _as_dict(row):
+    return {
+        'id': str(row[0]),
+        'subkategori': row[1],
+        'sesi': row[2],
+        'total_biaya': row[3],
+        'tanggal_pekerjaan': row[4],
+        'waktu_pekerjaan': row[5],
+    }
+
+
+def _alasan_gagal(cursor, params):
+    cursor.execute(ALASAN_QUERY, params)
+    row = cursor.fetchone()
+    if not row:
+        return 'Pesanan tidak ditemukan.'
+    idpekerja, idstatus, kategori_cocok = row
+    if idpekerja is not None:
+        if str(idpekerja) == params['pekerja']:
+            return 'Pesanan ini sudah Anda ambil.'
+        return 'Pesanan sudah diambil pekerja lain.'
+    if not kategori_cocok:
+        return 'Anda tidak memiliki kategori yang sesuai untuk mengambil pesanan ini.'
+    if str(idstatus) != str(params['mencari']):
+        return 'Pesanan tidak sedang mencari pekerja.'
+    # Syarat terpenuhi saat dicek ulang: baris sempat berubah di tengah klaim
+    return 'Pesanan sedang diproses, silakan coba lagi.'
+
+
+def claim_order(pekerja_id, pesanan_id):
+    """
+    Ambil pesanan ``pesanan_id`` untuk pekerja dalam satu statement: set
+    pekerja dan jadwal, lalu catat status 'Menunggu Pekerja Terdekat'.
+    Mengembalikan dict pesanan, atau raise ClaimError dengan alasannya.
+    """
+    params = {**_params(pekerja_id), 'pesanan': str(pesanan_id)}
+    query = CLAIM_QUERY.format(kandidat=KANDIDAT_QUERY + " AND t.id = %(pesanan)s FOR UPDATE OF t, ts")
+
+    def operation(cursor):
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        if not row:
+            raise ClaimError(_alasan_gagal(cursor, params))
+        return _as_dict(row)
+
+    return run_in_transaction(operation)
+
+
+def claim_next_order(pekerja_id, kategori_id=None, subkategori_id=None):
+    """
+    Ambil pesanan terlama yang cocok untuk pekerja. Baris yang sedang dikunci
+    klaim lain dilewati (SKIP LOCKED) sehingga banyak pekerja bisa mengambil
+    pesanan bersamaan tanpa saling menunggu. Mengembalikan dict pesanan atau
+    None bila tidak ada pesanan yang tersedia.
+    """
+    params = _params(pekerja_id)
+    kandidat = KANDIDAT_QUERY
+    if kategori_id:
+        kandidat += " AND s.kategorijasaid = %(kategori)s"
+        params['kategori'] = str(kategori_id)
+    if subkategori_id:
+        kandidat += " AND s.id = %(subkategori)s"
+        params['subkategori'] = str(subkategori_id)
+    kandidat += " ORDER BY t.tglpemesanan, t.id LIMIT 1 FOR UPDATE OF t, ts SKIP LOCKED"
+    query = CLAIM_QUERY.format(kandidat=kandidat)
+
+    def operation(cursor):
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        return _as_dict(row) if row else None
+
+    return run_in_transaction(operation)
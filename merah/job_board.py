@@ -0,0 +1,103 @@
+# merah/job_board.py
+
+import logging
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+
+from utils.db_connection import get_db_connection
+from utils.pagination import decode_cursor, encode_cursor, parse_timestamp, parse_uuid_strict
+from utils.reference_data import StatusPesanan, get_status_id
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_job_board(kategori_id=None, subkategori_id=None, cursor=None, limit=None, with_facets=True):
+    """
+    Ambil satu halaman pesanan berstatus 'Mencari Pekerja Terdekat' (keyset
+    pagination pada (tglpemesanan, id), terbaru lebih dulu) beserta facet
+    kategori/subkategori untuk filter, semuanya dalam satu query.
+    """
+    limit = limit or getattr(settings, 'JOB_BOARD_PAGE_SIZE', 20)
+
+    pesanan_query = """
+        SELECT t.id, s.namasubkategori, u.nama, t.tglpemesanan, t.sesi, t.totalbiaya
+        FROM tr_pemesanan_jasa t
+        JOIN tr_pemesanan_status_terkini ts ON ts.idtrpemesanan = t.id
+        JOIN subkategori_jasa s ON t.idkategorijasa = s.id
+        JOIN "USER" u ON t.idpelanggan = u.id
+        WHERE ts.idstatus = %(status)s
+    """
+    params = {
+        'limit': limit + 1,
+        'status': get_status_id(StatusPesanan.MENCARI_PEKERJA),
+    }
+
+    if kategori_id:
+        pesanan_query += " AND s.kategorijasaid = %(kategori)s"
+        params['kategori'] = kategori_id
+    if subkategori_id:
+        pesanan_query += " AND s.id = %(subkategori)s"
+        params['subkategori'] = subkategori_id
+    if cursor:
+        cursor_tgl, cursor_id = decode_cursor(cursor, parse_timestamp, parse_uuid_strict)
+        pesanan_query += " AND (t.tglpemesanan, t.id) < (%(cursor_tgl)s, %(cursor_id)s::uuid)"
+        params.update(cursor_tgl=cursor_tgl, cursor_id=cursor_id)
+    pesanan_query += " ORDER BY t.tglpemesanan DESC, t.id DESC LIMIT %(limit)s"
+
+    if with_facets:
+        subkategori_filter = "WHERE kategorijasaid = %(kategori)s" if kategori_id else ""
+        facets = f"""
+            (SELECT json_agg(json_build_array(id, namakategori) ORDER BY namakategori)
+             FROM kategori_jasa),
+            (SELECT json_agg(json_build_array(id, namasubkategori, kategorijasaid) ORDER BY namasubkategori)
+             FROM subkategori_jasa {subkategori_filter}),
+        """
+    else:
+        facets = "NULL, NULL,"
+
+    # totalbiaya sebagai teks agar DECIMAL tidak menjadi float lewat JSON
+    query = f"""
+        WITH pesanan AS ({pesanan_query})
+        SELECT {facets}
+            (SELECT json_agg(json_build_array(id, namasubkategori, nama, tglpemesanan, sesi, totalbiaya::text)
+                             ORDER BY tglpemesanan DESC, id DESC)
+             FROM pesanan)
+    """
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            kategori_list, subkategori_list, rows = db_cursor.fetchone()
+    finally:
+        conn.close()
+
+    rows = rows or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    pesanan_list = [
+        {
+            'id': row[0],
+            'subkategori': row[1],
+            'nama_pelanggan': row[2],
+            'tanggal_pemesanan': date.fromisoformat(row[3][:10]),
+            'sesi': row[4],
+            'total_biaya': Decimal(row[5]),
+            'status': StatusPesanan.MENCARI_PEKERJA,
+        }
+        for row in rows
+    ]
+    next_cursor = None
+    if has_more and pesanan_list:
+        last = pesanan_list[-1]
+        next_cursor = encode_cursor(last['tanggal_pemesanan'], last['id'])
+
+    return {
+        'kategori_list': kategori_list or [],
+        'subkategori_list': subkategori_list or [],
+        'pesanan_list': pesanan_list,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from utils.db_connection import get_db_connection
+
+BACKFILL_QUERY = """
+    INSERT INTO TR_PEMESANAN_STATUS_TERKINI (IdTrPemesanan, IdStatus, TglWaktu)
+    SELECT DISTINCT ON (IdTrPemesanan) IdTrPemesanan, IdStatus, TglWaktu
+    FROM TR_PEMESANAN_STATUS
+    ORDER BY IdTrPemesanan, TglWaktu DESC
+    ON CONFLICT (IdTrPemesanan) DO UPDATE
+    SET IdStatus = EXCLUDED.IdStatus,
+        TglWaktu = EXCLUDED.TglWaktu
+    WHERE TR_PEMESANAN_STATUS_TERKINI.TglWaktu <= EXCLUDED.TglWaktu
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Isi ulang TR_PEMESANAN_STATUS_TERKINI dari riwayat TR_PEMESANAN_STATUS. "
+        "Aman dijalankan berulang kali dan saat aplikasi sedang berjalan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--truncate',
+            action='store_true',
+            help="Kosongkan proyeksi terlebih dahulu (misalnya setelah riwayat status diedit manual).",
+        )
+
+    def handle(self, *args, **options):
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                if options['truncate']:
+                    cursor.execute("TRUNCATE TR_PEMESANAN_STATUS_TERKINI")
+                cursor.execute(BACKFILL_QUERY)
+                updated = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f"{updated} baris status terkini diperbarui."))
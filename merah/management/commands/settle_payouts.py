@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from merah import payouts
+
+
+class Command(BaseCommand):
+    help = (
+        "Bayar honor pekerja untuk pesanan selesai yang mengantre di ANTREAN_HONOR: "
+        "ledger tr_mypay dicatat per batch dan saldo ditambah sekali per pekerja. "
+        "Aman dijalankan ulang dan paralel; batch yang gagal diulang dari antrean "
+        "yang belum dibayar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.PAYOUT_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int,
+                            help="Berhenti setelah sejumlah batch walaupun antrean belum kosong.")
+        parser.add_argument('--watch', action='store_true',
+                            help="Jalankan terus dengan jeda PAYOUT_INTERVAL detik antar putaran.")
+        parser.add_argument('--interval', type=int, default=settings.PAYOUT_INTERVAL)
+        parser.add_argument('--purge-days', type=int,
+                            help="Hapus antrean yang sudah dibayar lebih dari N hari lalu.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size minimal 1.")
+
+        while True:
+            try:
+                summary = payouts.settle_all(options['batch_size'], options['max_batches'])
+            except payouts.PayoutError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"{summary['pesanan']} honor dibayar ke {summary['pekerja']} pekerja "
+                f"({summary['batch']} batch, total {summary['total']})."
+            ))
+
+            if options['purge_days'] is not None:
+                purged = payouts.purge_settled(datetime.now() - timedelta(days=options['purge_days']))
+                self.stdout.write(f"{purged} antrean lama dihapus.")
+
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
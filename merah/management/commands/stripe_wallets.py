@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.db_connection import get_db_connection
+from utils.pagination import parse_uuid
+
+# Pengguna dengan kredit MyPay terbanyak dalam N hari terakhir
+TOP_QUERY = """
+    SELECT t.UserId
+    FROM TR_MYPAY t
+    WHERE t.Nominal > 0 AND t.Tgl >= CURRENT_DATE - %(hari)s
+    GROUP BY t.UserId
+    ORDER BY COUNT(*) DESC, t.UserId
+    LIMIT %(top)s
+"""
+
+# Slot lama di luar jumlah baru tetap dihitung dalam saldo_dompet dan
+# dilipat ke saldo utama pada debit berikutnya.
+UPDATE_QUERY = """
+    UPDATE DOMPET d SET JumlahSlot = %(slot)s
+    FROM "USER" u
+    WHERE u.Id = d.UserId
+      AND (u.Id = ANY(%(ids)s::uuid[]) OR u.NoHP = ANY(%(nohp)s))
+      AND d.JumlahSlot <> %(slot)s
+"""
+
+
+def split_users(values):
+    """Pisahkan argumen menjadi (id pengguna kanonis, nomor HP); selain UUID valid dianggap nomor HP."""
+    ids, nohp = [], []
+    for value in values:
+        user_id = parse_uuid(value)
+        if user_id:
+            ids.append(user_id)
+        else:
+            nohp.append(value)
+    return ids, nohp
+
+
+class Command(BaseCommand):
+    help = (
+        "Atur jumlah sub-saldo (DOMPET_SLOT) untuk akun MyPay yang ramai agar kredit "
+        "bersamaan (mis. honor pekerja) tidak antre pada satu baris. --slots 1 "
+        "mengembalikan akun ke satu saldo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', help="Id pengguna atau nomor HP.")
+        parser.add_argument('--top', type=int, default=0,
+                            help="Sertakan N pengguna dengan kredit terbanyak.")
+        parser.add_argument('--days', type=int, default=30,
+                            help="Rentang hari untuk --top.")
+        parser.add_argument('--slots', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if not 1 <= options['slots'] <= 64:
+            raise CommandError("--slots harus antara 1 dan 64.")
+        if not options['users'] and options['top'] <= 0:
+            raise CommandError("Sebutkan pengguna atau gunakan --top.")
+
+        ids, nohp = split_users(options['users'])
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                if options['top'] > 0:
+                    cursor.execute(TOP_QUERY, {'hari': options['days'], 'top': options['top']})
+                    ids += [str(row[0]) for row in cursor.fetchall()]
+                cursor.execute(UPDATE_QUERY, {'slot': options['slots'], 'ids': ids, 'nohp': nohp})
+                updated = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS(f"{updated} dompet diatur ke {options['slots']} slot."))
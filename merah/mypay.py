@@ -0,0 +1,348 @@
+# merah/mypay.py
+
+import logging
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from utils.db_connection import get_dedicated_connection, get_db_connection, run_in_transaction
+from utils.pagination import decode_cursor, encode_cursor, parse_timestamp, parse_uuid_strict
+from utils.reference_data import KategoriMyPay, StatusPesanan, get_kategori_mypay_id, get_status_id
+
+logger = logging.getLogger(__name__)
+
+
+class MyPayError(Exception):
+    """Operasi MyPay ditolak; pesan ditujukan untuk ditampilkan ke pengguna."""
+
+
+def parse_nominal(value):
+    """Ubah input form menjadi Decimal positif, atau raise MyPayError."""
+    try:
+        nominal = Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        raise MyPayError('Nominal tidak valid.')
+    if not nominal.is_finite() or nominal <= 0:
+        raise MyPayError('Nominal tidak valid.')
+    return nominal
+
+
+def _kategori_id(nama):
+    kategori_id = get_kategori_mypay_id(nama)
+    if kategori_id is None:
+        logger.error(f"Kategori tr_mypay '{nama}' tidak ditemukan.")
+        raise MyPayError('Kategori transaksi tidak valid.')
+    return kategori_id
+
+
+def top_up(user_id, nominal):
+    """Tambah saldo (kredit_dompet) dan catat di tr_mypay dalam satu statement. Mengembalikan saldo baru."""
+    nominal = parse_nominal(nominal)
+    kategori_id = _kategori_id(KategoriMyPay.TOP_UP)
+
+    def operation(cursor):
+        cursor.execute("""
+            WITH saldo AS (
+                SELECT id, kredit_dompet(id, %(nominal)s) AS saldomypay
+                FROM "USER"
+                WHERE id = %(user_id)s
+            ), ledger AS (
+                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
+                SELECT %(tr_id)s, saldo.id, %(tgl)s, %(nominal)s, %(kategori)s
+                FROM saldo
+            )
+            SELECT saldomypay FROM saldo
+        """, {
+            'nominal': nominal,
+            'user_id': user_id,
+            'tr_id': str(uuid.uuid4()),
+            'tgl': datetime.now(),
+            'kategori': kategori_id,
+        })
+        row = cursor.fetchone()
+        if not row:
+            raise MyPayError('Pengguna tidak ditemukan.')
+        return row[0]
+
+    return run_in_transaction(operation)
+
+
+def withdraw(user_id, nominal):
+    """Kurangi saldo bila cukup (dicek debit_dompet) dan catat di tr_mypay. Mengembalikan saldo baru."""
+    nominal = parse_nominal(nominal)
+    kategori_id = _kategori_id(KategoriMyPay.WITHDRAW)
+
+    def operation(cursor):
+        cursor.execute("""
+            WITH saldo AS (
+                SELECT %(user_id)s::uuid AS id, debit_dompet(%(user_id)s, %(nominal)s) AS saldomypay
+            ), ledger AS (
+                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
+                SELECT %(tr_id)s, saldo.id, %(tgl)s, -%(nominal)s, %(kategori)s
+                FROM saldo
+                WHERE saldomypay IS NOT NULL
+            )
+            SELECT saldomypay FROM saldo
+        """, {
+            'nominal': nominal,
+            'user_id': user_id,
+            'tr_id': str(uuid.uuid4()),
+            'tgl': datetime.now(),
+            'kategori': kategori_id,
+        })
+        row = cursor.fetchone()
+        if row[0] is None:
+            raise MyPayError('Saldo MyPay Anda tidak cukup untuk melakukan withdrawal ini.')
+        return row[0]
+
+    return run_in_transaction(operation)
+
+
+def transfer(user_id, nohp_tujuan, nominal):
+    """
+    Pindahkan saldo ke pengguna lain berdasarkan nomor HP. Kedua baris DOMPET
+    dikunci dengan urutan id yang sama untuk menghindari deadlock antar
+    transfer yang berlawanan arah. Mengembalikan saldo baru pengirim.
+    """
+    nominal = parse_nominal(nominal)
+    kategori_id = _kategori_id(KategoriMyPay.TRANSFER)
+
+    def operation(cursor):
+        cursor.execute("""
+            SELECT u.id, u.nohp = %(nohp)s AS is_target
+            FROM "USER" u
+            JOIN dompet d ON d.userid = u.id
+            WHERE u.id = %(user_id)s OR u.nohp = %(nohp)s
+            ORDER BY u.id
+            FOR NO KEY UPDATE OF d
+        """, {'user_id': user_id, 'nohp': nohp_tujuan})
+        rows = cursor.fetchall()
+        target = next((row for row in rows if row[1]), None)
+        sender = next((row for row in rows if str(row[0]) == str(user_id)), None)
+        if not target:
+            raise MyPayError('Nomor HP tidak ditemukan')
+        if not sender:
+            raise MyPayError('Pengguna tidak ditemukan.')
+        if str(target[0]) == str(user_id):
+            raise MyPayError('Tidak dapat transfer ke akun sendiri.')
+
+        cursor.execute("""
+            WITH debit AS (
+                SELECT debit_dompet(%(user_id)s, %(nominal)s) AS saldomypay
+            ), credit AS (
+                SELECT kredit_dompet(%(target_id)s, %(nominal)s)
+                FROM debit
+                WHERE saldomypay IS NOT NULL
+            ), ledger AS (
+                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
+                SELECT v.id, v.userid, %(tgl)s, v.nominal, %(kategori)s
+                FROM (VALUES (%(tr_sender)s::uuid, %(user_id)s::uuid, -%(nominal)s),
+                             (%(tr_target)s::uuid, %(target_id)s::uuid, %(nominal)s)) AS v(id, userid, nominal)
+                JOIN debit ON debit.saldomypay IS NOT NULL
+            )
+            SELECT saldomypay, (SELECT COUNT(*) FROM credit) FROM debit
+        """, {
+            'nominal': nominal,
+            'user_id': user_id,
+            'target_id': target[0],
+            'tr_sender': str(uuid.uuid4()),
+            'tr_target': str(uuid.uuid4()),
+            'tgl': datetime.now(),
+            'kategori': kategori_id,
+        })
+        saldo = cursor.fetchone()[0]
+        if saldo is None:
+            raise MyPayError('Saldo MyPay Anda tidak cukup untuk melakukan transfer ini.')
+        return saldo
+
+    return run_in_transaction(operation)
+
+
+def pay_order(user_id, pesanan_id):
+    """
+    Bayar pesanan berstatus 'Menunggu Pembayaran' milik pelanggan: potong saldo,
+    catat di tr_mypay, dan ubah status ke 'Mencari Pekerja Terdekat' dalam satu
+    transaksi. Baris status terkini dikunci sehingga pesanan tidak terbayar dua kali.
+    Mengembalikan saldo baru.
+    """
+    kategori_id = _kategori_id(KategoriMyPay.PEMBAYARAN_JASA)
+    status_menunggu = get_status_id(StatusPesanan.MENUNGGU_PEMBAYARAN)
+    status_mencari = get_status_id(StatusPesanan.MENCARI_PEKERJA)
+    if status_menunggu is None or status_mencari is None:
+        logger.error("Status 'Menunggu Pembayaran'/'Mencari Pekerja Terdekat' tidak ditemukan.")
+        raise MyPayError('Terjadi kesalahan dalam memproses status pesanan.')
+
+    def operation(cursor):
+        cursor.execute("""
+            SELECT pj.totalbiaya, ts.idstatus::text
+            FROM tr_pemesanan_jasa pj
+            JOIN tr_pemesanan_status_terkini ts ON ts.idtrpemesanan = pj.id
+            WHERE pj.id = %s AND pj.idpelanggan = %s
+            FOR UPDATE OF ts
+        """, [pesanan_id, user_id])
+        pesanan = cursor.fetchone()
+        if not pesanan:
+            raise MyPayError('Pesanan tidak ditemukan.')
+        total_biaya, status_id = pesanan
+        if status_id != status_menunggu:
+            logger.error(f"Status pesanan tidak sesuai: {status_id}, ID pesanan: {pesanan_id}")
+            raise MyPayError('Terjadi kesalahan dalam memproses status pesanan.')
+
+        cursor.execute("""
+            WITH saldo AS (
+                SELECT %(user_id)s::uuid AS id, debit_dompet(%(user_id)s, %(total)s) AS saldomypay
+            ), ledger AS (
+                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
+                SELECT %(tr_id)s, saldo.id, %(tgl)s, %(total)s, %(kategori)s
+                FROM saldo
+                WHERE saldomypay IS NOT NULL
+            ), status AS (
+                INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
+                SELECT %(pesanan_id)s, %(status)s, %(tgl)s
+                FROM saldo
+                WHERE saldomypay IS NOT NULL
+            )
+            SELECT saldomypay FROM saldo
+        """, {
+            'total': total_biaya,
+            'user_id': user_id,
+            'pesanan_id': pesanan_id,
+            'tr_id': str(uuid.uuid4()),
+            'tgl': datetime.now(),
+            'kategori': kategori_id,
+            'status': status_mencari,
+        })
+        row = cursor.fetchone()
+        if row[0] is None:
+            raise MyPayError('Saldo MyPay Anda tidak cukup untuk melakukan pembayaran ini.')
+        return row[0]
+
+    return run_in_transaction(operation)
+
+
+# Pengaruh satu baris tr_mypay terhadap saldo. Pembayaran Jasa dicatat dengan
+# nominal positif meskipun mengurangi saldo, kategori lain sudah bertanda.
+EFEK_SALDO_SQL = "CASE WHEN k.nama = 'Pembayaran Jasa' THEN -ABS(t.nominal) ELSE t.nominal END"
+
+
+def fetch_history(user_id, cursor=None, limit=None):
+    """
+    Satu halaman riwayat tr_mypay (terbaru lebih dulu, keyset pada (tgl, id))
+    beserta saldo saat ini dan saldo setelah tiap transaksi, yang dihitung di
+    SQL dengan window function.
+    """
+    limit = limit or getattr(settings, 'MYPAY_HISTORY_PAGE_SIZE', 25)
+    params = {'user_id': user_id, 'limit': limit + 1}
+    keyset_filter = ""
+    newer_sum = "0"
+    if cursor:
+        cursor_tgl, cursor_id = decode_cursor(cursor, parse_timestamp, parse_uuid_strict)
+        params.update(cursor_tgl=cursor_tgl, cursor_id=cursor_id)
+        keyset_filter = "AND (t.tgl, t.id) < (%(cursor_tgl)s, %(cursor_id)s::uuid)"
+        # Total pengaruh transaksi yang lebih baru dari halaman ini
+        newer_sum = f"""(
+            SELECT COALESCE(SUM({EFEK_SALDO_SQL}), 0)
+            FROM tr_mypay t
+            JOIN kategori_tr_mypay k ON t.kategoriid = k.id
+            WHERE t.userid = %(user_id)s
+              AND (t.tgl, t.id) >= (%(cursor_tgl)s, %(cursor_id)s::uuid)
+        )"""
+
+    query = f"""
+        WITH halaman AS (
+            SELECT t.id, t.nominal, t.tgl, k.nama AS kategori, {EFEK_SALDO_SQL} AS efek
+            FROM tr_mypay t
+            JOIN kategori_tr_mypay k ON t.kategoriid = k.id
+            WHERE t.userid = %(user_id)s {keyset_filter}
+            ORDER BY t.tgl DESC, t.id DESC
+            LIMIT %(limit)s
+        )
+        SELECT u.saldomypay, h.id, h.nominal, h.tgl, h.kategori,
+               u.saldomypay - {newer_sum}
+                 - COALESCE(SUM(h.efek) OVER (
+                       ORDER BY h.tgl DESC, h.id DESC
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ), 0) AS saldo_setelah
+        FROM (SELECT saldo_dompet(id) AS saldomypay FROM "USER" WHERE id = %(user_id)s) u
+        LEFT JOIN halaman h ON TRUE
+        ORDER BY h.tgl DESC, h.id DESC
+    """
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+    finally:
+        conn.close()
+
+    saldo = rows[0][0] if rows else 0
+    transactions = [
+        {
+            'id': row[1],
+            'nominal': row[2],
+            'tanggal': row[3],
+            'kategori': row[4],
+            'saldo_setelah': row[5],
+        }
+        for row in rows if row[1] is not None
+    ]
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    next_cursor = None
+    if has_more:
+        last = transactions[-1]
+        next_cursor = encode_cursor(last['tanggal'], last['id'])
+    return {'saldo': saldo, 'transactions': transactions, 'next_cursor': next_cursor}
+
+
+def fetch_category_totals(user_id):
+    """Total nominal dan jumlah transaksi per kategori untuk seluruh riwayat pengguna."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT k.nama, SUM(t.nominal), COUNT(*)
+                FROM tr_mypay t
+                JOIN kategori_tr_mypay k ON t.kategoriid = k.id
+                WHERE t.userid = %s
+                GROUP BY k.nama
+                ORDER BY k.nama
+            """, [user_id])
+            return [
+                {'kategori': kategori, 'total': total, 'jumlah': jumlah}
+                for kategori, total, jumlah in cursor.fetchall()
+            ]
+    finally:
+        conn.close()
+
+
+def iter_history(user_id, batch_size=2000):
+    """
+    Generator seluruh riwayat tr_mypay (terbaru lebih dulu) lewat server-side
+    named cursor, sehingga baris dibaca per batch dan tidak pernah dimuat
+    sekaligus ke memori. Memakai koneksi tersendiri karena dibaca oleh
+    StreamingHttpResponse setelah view selesai.
+    """
+    conn = get_dedicated_connection()
+    try:
+        with conn.cursor(name=f"tr_mypay_export_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(f"""
+                SELECT t.tgl, k.nama, t.nominal,
+                       u.saldomypay
+                         - COALESCE(SUM({EFEK_SALDO_SQL}) OVER (
+                               ORDER BY t.tgl DESC, t.id DESC
+                               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                           ), 0) AS saldo_setelah
+                FROM tr_mypay t
+                JOIN kategori_tr_mypay k ON t.kategoriid = k.id
+                CROSS JOIN (SELECT saldo_dompet(%s) AS saldomypay) u
+                WHERE t.userid = %s
+                ORDER BY t.tgl DESC, t.id DESC
+            """, [user_id, user_id])
+            yield from cursor
+    finally:
+        conn.close()
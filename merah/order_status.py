@@ -0,0 +1,171 @@
+# merah/order_status.py
+
+import logging
+from datetime import datetime
+
+from utils.db_connection import get_db_connection
+from utils.pagination import parse_uuid
+from utils.reference_data import StatusPesanan, get_status_id
+
+logger = logging.getLogger(__name__)
+
+# Transisi status yang boleh dilakukan tiap role: (status sekarang, status baru).
+# Pengambilan pesanan ('Mencari' -> 'Menunggu Pekerja') ada di merah.dispatch
+# karena sekaligus mengisi pekerja pesanan.
+TRANSISI = {
+    'pekerja': (
+        (StatusPesanan.MENUNGGU_PEKERJA, StatusPesanan.PEKERJA_TIBA),
+        (StatusPesanan.PEKERJA_TIBA, StatusPesanan.SEDANG_DILAKUKAN),
+        (StatusPesanan.SEDANG_DILAKUKAN, StatusPesanan.SELESAI),
+    ),
+    'pelanggan': (
+        (StatusPesanan.MENUNGGU_PEMBAYARAN, StatusPesanan.DIBATALKAN),
+        (StatusPesanan.MENCARI_PEKERJA, StatusPesanan.DIBATALKAN),
+    ),
+}
+
+# Kolom pemilik pesanan per role
+PEMILIK = {
+    'pekerja': 'idpekerja',
+    'pelanggan': 'idpelanggan',
+}
+
+MAX_BULK = 100
+
+# Kode kegagalan
+TIDAK_DITEMUKAN = 'tidak_ditemukan'
+BUKAN_PEMILIK = 'bukan_pemilik'
+STATUS_TIDAK_VALID = 'status_tidak_valid'
+KONFLIK = 'konflik'
+
+# Validasi dan penerapan transisi dalam satu statement. Baris proyeksi status
+# terkini dikunci (urut id agar transisi massal tidak saling deadlock); pada
+# READ COMMITTED, transisi yang menunggu kunci mengevaluasi ulang status
+# terhadap versi terbaru sehingga dua transisi dari status yang sama (mis.
+# batal vs. diambil pekerja) tidak bisa sama-sama berhasil. Kolom diagnosis
+# dibaca dari snapshot awal statement untuk menjelaskan pesanan yang gagal.
+TRANSITION_QUERY = """
+    WITH transisi AS (
+        SELECT * FROM unnest(%(dari)s::uuid[], %(ke)s::uuid[]) AS x(dari, ke)
+    ), terkunci AS (
+        SELECT ts.idtrpemesanan, ts.idstatus
+        FROM tr_pemesanan_status_terkini ts
+        JOIN tr_pemesanan_jasa t ON t.id = ts.idtrpemesanan
+        WHERE ts.idtrpemesanan = ANY(%(pesanan)s::uuid[])
+          AND t.{pemilik} = %(aktor)s
+          AND ts.idstatus = ANY(%(dari)s::uuid[])
+        ORDER BY ts.idtrpemesanan
+        FOR UPDATE OF ts
+    ), diterapkan AS (
+        INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
+        SELECT k.idtrpemesanan, x.ke, %(waktu)s
+        FROM terkunci k
+        JOIN transisi x ON x.dari = k.idstatus
+        RETURNING idtrpemesanan, idstatus
+    )
+    SELECT p.id::text, baru.status, t.id IS NOT NULL, t.{pemilik} IS NOT DISTINCT FROM %(aktor)s::uuid, lama.status
+    FROM unnest(%(pesanan)s::uuid[]) AS p(id)
+    LEFT JOIN diterapkan d ON d.idtrpemesanan = p.id
+    LEFT JOIN status_pemesanan baru ON baru.id = d.idstatus
+    LEFT JOIN tr_pemesanan_jasa t ON t.id = p.id
+    LEFT JOIN tr_pemesanan_status_terkini ts ON ts.idtrpemesanan = p.id
+    LEFT JOIN status_pemesanan lama ON lama.id = ts.idstatus
+"""
+
+
+class TransitionError(Exception):
+    """Transisi status ditolak; pesan ditujukan untuk ditampilkan ke pengguna."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+def allowed_transitions(role, status_baru=None):
+    """Pasangan (status sekarang, status baru) milik role, opsional hanya menuju ``status_baru``."""
+    return [
+        (dari, ke) for dari, ke in TRANSISI.get(role, ())
+        if status_baru is None or ke == status_baru
+    ]
+
+
+def _alasan(role, status_baru, ada, milik, status_lama):
+    if not ada:
+        return TIDAK_DITEMUKAN, 'Pesanan tidak ditemukan.'
+    if not milik:
+        return BUKAN_PEMILIK, 'Pesanan tidak ditemukan atau Anda tidak berwenang untuk mengubahnya.'
+    if status_lama not in {dari for dari, _ in allowed_transitions(role, status_baru)}:
+        if status_baru:
+            return STATUS_TIDAK_VALID, f"Pesanan berstatus '{status_lama}' tidak dapat diubah menjadi '{status_baru}'."
+        return STATUS_TIDAK_VALID, f"Pesanan berstatus '{status_lama}' tidak dapat diubah."
+    # Status sempat valid di awal statement tetapi berubah saat menunggu kunci
+    return KONFLIK, 'Status pesanan baru saja berubah, silakan muat ulang halaman.'
+
+
+def apply_transitions(actor_id, role, pesanan_ids, status_baru=None):
+    """
+    Terapkan transisi status untuk banyak pesanan milik ``actor_id`` dalam satu
+    statement. Tanpa ``status_baru`` tiap pesanan maju ke status berikutnya
+    yang diizinkan untuk role. Mengembalikan satu dict per pesanan (urutan
+    input, tanpa duplikat) berisi id, berhasil, status_lama, status_baru,
+    serta kode dan alasan bila gagal. Id dinormalkan ke bentuk kanonis UUID;
+    id yang bukan UUID dilaporkan tidak ditemukan.
+    """
+    pesanan_ids = list(dict.fromkeys(parse_uuid(str(pesanan_id)) or str(pesanan_id) for pesanan_id in pesanan_ids))
+    if not pesanan_ids:
+        return []
+    if len(pesanan_ids) > MAX_BULK:
+        raise TransitionError(f'Maksimal {MAX_BULK} pesanan per permintaan.', STATUS_TIDAK_VALID)
+    if role not in PEMILIK:
+        raise TransitionError('Role tidak dapat mengubah status pesanan.', BUKAN_PEMILIK)
+
+    transisi = allowed_transitions(role, status_baru)
+    if status_baru and not transisi:
+        raise TransitionError(f"Status '{status_baru}' tidak valid.", STATUS_TIDAK_VALID)
+    dari_ids, ke_ids = [], []
+    for dari, ke in transisi:
+        dari_id, ke_id = get_status_id(dari), get_status_id(ke)
+        if not dari_id or not ke_id:
+            logger.error(f"Status '{dari}' atau '{ke}' tidak ditemukan di STATUS_PEMESANAN.")
+            raise TransitionError('Status pesanan tidak valid.', STATUS_TIDAK_VALID)
+        dari_ids.append(str(dari_id))
+        ke_ids.append(str(ke_id))
+
+    rows = {}
+    valid_ids = [pesanan_id for pesanan_id in pesanan_ids if parse_uuid(pesanan_id)]
+    if valid_ids:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(TRANSITION_QUERY.format(pemilik=PEMILIK[role]), {
+                    'dari': dari_ids,
+                    'ke': ke_ids,
+                    'pesanan': valid_ids,
+                    'aktor': str(actor_id),
+                    'waktu': datetime.now(),
+                })
+                rows = {row[0]: row[1:] for row in cursor.fetchall()}
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    results = []
+    for pesanan_id in pesanan_ids:
+        status_hasil, ada, milik, status_lama = rows.get(pesanan_id, (None, False, False, None))
+        result = {'id': pesanan_id, 'berhasil': status_hasil is not None,
+                  'status_lama': status_lama, 'status_baru': status_hasil}
+        if status_hasil is None:
+            result['kode'], result['alasan'] = _alasan(role, status_baru, ada, milik, status_lama)
+        results.append(result)
+    return results
+
+
+def apply_transition(actor_id, role, pesanan_id, status_baru=None):
+    """Varian satu pesanan: mengembalikan status baru atau raise TransitionError."""
+    result = apply_transitions(actor_id, role, [pesanan_id], status_baru)[0]
+    if not result['berhasil']:
+        raise TransitionError(result['alasan'], result['kode'])
+    return result['status_baru']
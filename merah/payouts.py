@@ -0,0 +1,100 @@
+# merah/payouts.py
+
+import logging
+from datetime import datetime
+
+from utils.db_connection import get_dedicated_connection
+from utils.reference_data import KategoriMyPay, get_kategori_mypay_id
+
+logger = logging.getLogger(__name__)
+
+# Satu batch dalam satu statement:
+#   1. ambil antrean yang belum dibayar (urut masuk), lewati yang sedang
+#      dikunci runner lain (SKIP LOCKED);
+#   2. catat 'Menerima Honor' per pesanan dengan satu insert multi-baris. Id
+#      ledger diturunkan dari id pesanan sehingga batch yang diulang setelah
+#      gagal di tengah jalan tidak mencatat dua kali;
+#   3. tambah saldo sekali per pekerja (urut id agar runner paralel tidak
+#      deadlock), hanya untuk baris ledger yang benar-benar baru;
+#   4. tandai antrean dibayar. Karena semuanya satu transaksi, antrean yang
+#      belum ditandai menjadi checkpoint untuk batch berikutnya.
+SETTLE_QUERY = """
+    WITH batch AS (
+        SELECT IdTrPemesanan, PekerjaId, Nominal
+        FROM ANTREAN_HONOR
+        WHERE TglDibayar IS NULL
+        ORDER BY Urutan
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    ), ledger AS (
+        INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+        SELECT md5('honor' || b.IdTrPemesanan::text)::uuid, b.PekerjaId, %(tgl)s, b.Nominal, %(kategori)s
+        FROM batch b
+        ON CONFLICT (Id) DO NOTHING
+        RETURNING UserId, Nominal
+    ), kredit AS (
+        SELECT p.UserId, kredit_dompet(p.UserId, p.total)
+        FROM (
+            SELECT UserId, SUM(Nominal) AS total
+            FROM ledger
+            GROUP BY UserId
+            ORDER BY UserId
+        ) p
+    ), dibayar AS (
+        UPDATE ANTREAN_HONOR a SET TglDibayar = %(tgl)s
+        FROM batch b
+        WHERE a.IdTrPemesanan = b.IdTrPemesanan
+        RETURNING a.IdTrPemesanan
+    )
+    SELECT (SELECT COUNT(*) FROM dibayar),
+           (SELECT COUNT(*) FROM kredit),
+           (SELECT COALESCE(SUM(Nominal), 0) FROM ledger)
+"""
+
+PURGE_QUERY = """
+    DELETE FROM ANTREAN_HONOR
+    WHERE TglDibayar IS NOT NULL AND TglDibayar < %s
+"""
+
+
+class PayoutError(Exception):
+    """Penyelesaian honor tidak bisa dijalankan."""
+
+
+def settle_batch(limit=500):
+    """
+    Selesaikan paling banyak ``limit`` honor yang mengantre. Mengembalikan
+    dict jumlah pesanan, jumlah pekerja, dan total nominal yang dibayar.
+    """
+    kategori_id = get_kategori_mypay_id(KategoriMyPay.MENERIMA_HONOR)
+    if kategori_id is None:
+        raise PayoutError(f"Kategori tr_mypay '{KategoriMyPay.MENERIMA_HONOR}' tidak ditemukan.")
+
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(SETTLE_QUERY, {'limit': limit, 'tgl': datetime.now(), 'kategori': kategori_id})
+            pesanan, pekerja, total = cursor.fetchone()
+    return {'pesanan': pesanan, 'pekerja': pekerja, 'total': total}
+
+
+def settle_all(batch_size=500, max_batches=None):
+    """Jalankan batch sampai antrean kosong (atau ``max_batches``). Mengembalikan total gabungan."""
+    summary = {'batch': 0, 'pesanan': 0, 'pekerja': 0, 'total': 0}
+    while max_batches is None or summary['batch'] < max_batches:
+        result = settle_batch(batch_size)
+        if not result['pesanan']:
+            break
+        summary['batch'] += 1
+        for key in ('pesanan', 'pekerja', 'total'):
+            summary[key] += result[key]
+        logger.info(f"Batch honor {summary['batch']}: {result['pesanan']} pesanan, "
+                    f"{result['pekerja']} pekerja, total {result['total']}")
+    return summary
+
+
+def purge_settled(before):
+    """Hapus antrean yang sudah dibayar sebelum ``before``. Mengembalikan jumlah baris."""
+    with get_dedicated_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(PURGE_QUERY, (before,))
+            return cursor.rowcount
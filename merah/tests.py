@@ -1,3 +1,359 @@
-from django.test import TestCase
+import json
+import threading
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from benchmark.database import create_and_seed, is_local_database
+from merah import dispatch, job_board, mypay, order_status, payouts, views
+from merah.management.commands.stripe_wallets import split_users
+from utils.db_connection import get_dedicated_connection
+from utils.pagination import InvalidCursor, decode_cursor, parse_timestamp, parse_uuid_strict
+from utils.reference_data import StatusPesanan, invalidate_reference_data
+from utils.testing import FakeConnection
+
+
+def _job_rows(count):
+    ids = sorted((str(uuid.uuid4()) for _ in range(count)), reverse=True)
+    return [[pesanan_id, 'Cuci AC', 'Budi', f'2024-05-{20 - i:02d}', 1, '150000.00'] for i, pesanan_id in enumerate(ids)]
+
+
+@mock.patch('merah.job_board.get_status_id', return_value='status-mencari')
+class JobBoardCursorTests(SimpleTestCase):
+    def test_next_cursor_points_at_last_row(self, _status):
+        rows = _job_rows(3)
+        db = FakeConnection([None, None, rows])
+        with mock.patch('merah.job_board.get_db_connection', db):
+            page = job_board.fetch_job_board(limit=2, with_facets=False)
+
+        self.assertEqual([p['id'] for p in page['pesanan_list']], [rows[0][0], rows[1][0]])
+        self.assertEqual(
+            decode_cursor(page['next_cursor'], parse_timestamp, parse_uuid_strict),
+            (date.fromisoformat(rows[1][3]), rows[1][0]),
+        )
+
+    def test_cursor_round_trips_into_keyset_filter(self, _status):
+        rows = _job_rows(3)
+        db = FakeConnection([None, None, rows], [None, None, rows[2:]])
+        with mock.patch('merah.job_board.get_db_connection', db):
+            first = job_board.fetch_job_board(limit=2, with_facets=False)
+            second = job_board.fetch_job_board(cursor=first['next_cursor'], limit=2, with_facets=False)
+
+        query, params = db.executed[1]
+        self.assertIn("(t.tglpemesanan, t.id) < (%(cursor_tgl)s, %(cursor_id)s::uuid)", query)
+        self.assertEqual((params['cursor_tgl'], params['cursor_id']), (date.fromisoformat(rows[1][3]), rows[1][0]))
+        self.assertEqual([p['id'] for p in second['pesanan_list']], [rows[2][0]])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_total_biaya_keeps_decimal_places(self, _status):
+        db = FakeConnection([None, None, _job_rows(1)], [None, None, _job_rows(1)])
+        with mock.patch('merah.job_board.get_db_connection', db):
+            page = job_board.fetch_job_board(limit=2, with_facets=False)
+            response = views.pekerjaan_jasa_data(RequestFactory().get('/pekerjaan-jasa/data/'))
+
+        self.assertEqual(page['pesanan_list'][0]['total_biaya'], Decimal('150000.00'))
+        self.assertEqual(str(page['pesanan_list'][0]['total_biaya']), '150000.00')
+        self.assertIn('::text', db.executed[0][0])
+        self.assertEqual(json.loads(response.content)['pesanan_list'][0]['total_biaya'], '150000.00')
+
+    def test_last_page_has_no_cursor(self, _status):
+        db = FakeConnection([None, None, _job_rows(2)])
+        with mock.patch('merah.job_board.get_db_connection', db):
+            page = job_board.fetch_job_board(limit=2, with_facets=False)
+        self.assertEqual(len(page['pesanan_list']), 2)
+        self.assertIsNone(page['next_cursor'])
+
+
+def _history_rows(count, saldo=Decimal('500000')):
+    rows = []
+    for i in range(count):
+        rows.append((saldo, str(uuid.uuid4()), Decimal('10000'), date(2024, 5, 20 - i), 'TopUp MyPay', saldo - 10000 * i))
+    return rows
+
+
+class MyPayHistoryCursorTests(SimpleTestCase):
+    def test_cursor_round_trips_into_keyset_filter(self):
+        rows = _history_rows(3)
+        db = FakeConnection(rows, rows[2:])
+        with mock.patch('merah.mypay.get_db_connection', db):
+            first = mypay.fetch_history('pengguna', limit=2)
+            second = mypay.fetch_history('pengguna', cursor=first['next_cursor'], limit=2)
+
+        self.assertEqual([t['id'] for t in first['transactions']], [rows[0][1], rows[1][1]])
+        query, params = db.executed[1]
+        self.assertIn("(t.tgl, t.id) < (%(cursor_tgl)s, %(cursor_id)s::uuid)", query)
+        # Saldo halaman berikutnya dikurangi pengaruh transaksi yang lebih baru dari cursor
+        self.assertIn("(t.tgl, t.id) >= (%(cursor_tgl)s, %(cursor_id)s::uuid)", query)
+        self.assertEqual((params['cursor_tgl'], params['cursor_id']), (rows[1][3], rows[1][1]))
+        self.assertEqual([t['id'] for t in second['transactions']], [rows[2][1]])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_empty_history_keeps_balance(self):
+        db = FakeConnection([(Decimal('75000'), None, None, None, None, None)])
+        with mock.patch('merah.mypay.get_db_connection', db):
+            page = mypay.fetch_history('pengguna', limit=2)
+        self.assertEqual(page, {'saldo': Decimal('75000'), 'transactions': [], 'next_cursor': None})
+
+    def test_invalid_cursor_is_rejected_before_querying(self):
+        db = FakeConnection()
+        with mock.patch('merah.mypay.get_db_connection', db):
+            with self.assertRaises(InvalidCursor):
+                mypay.fetch_history('pengguna', cursor='rusak', limit=2)
+        self.assertEqual(db.executed, [])
+
+
+STATUS_IDS = {
+    'Menunggu Pekerja Terdekat': '00000000-0000-4000-8000-000000000003',
+    'Pekerja Tiba di Lokasi': '00000000-0000-4000-8000-000000000004',
+    'Pelayanan Jasa Sedang Dilakukan': '00000000-0000-4000-8000-000000000005',
+    'Pemesanan Selesai': '00000000-0000-4000-8000-000000000006',
+}
+
+
+@mock.patch('merah.order_status.get_status_id', side_effect=STATUS_IDS.get)
+class ApplyTransitionsTests(SimpleTestCase):
+    pekerja = str(uuid.uuid4())
+
+    def test_non_canonical_ids_are_normalised(self, _status):
+        pesanan_id = str(uuid.uuid4())
+        db = FakeConnection([(pesanan_id, 'Pekerja Tiba di Lokasi', True, True, 'Menunggu Pekerja Terdekat')])
+        with mock.patch('merah.order_status.get_db_connection', db):
+            results = order_status.apply_transitions(
+                self.pekerja, 'pekerja', [pesanan_id.upper(), '{%s}' % pesanan_id, pesanan_id.replace('-', '')],
+            )
+
+        self.assertEqual(db.executed[0][1]['pesanan'], [pesanan_id])
+        self.assertEqual(results, [{
+            'id': pesanan_id, 'berhasil': True,
+            'status_lama': 'Menunggu Pekerja Terdekat', 'status_baru': 'Pekerja Tiba di Lokasi',
+        }])
+
+    def test_invalid_ids_are_not_found_without_querying(self, _status):
+        db = FakeConnection()
+        with mock.patch('merah.order_status.get_db_connection', db):
+            results = order_status.apply_transitions(self.pekerja, 'pekerja', ['bukan-uuid', ''])
+
+        self.assertEqual(db.executed, [])
+        self.assertEqual([(r['id'], r['berhasil'], r['kode']) for r in results], [
+            ('bukan-uuid', False, order_status.TIDAK_DITEMUKAN),
+            ('', False, order_status.TIDAK_DITEMUKAN),
+        ])
+
+    def test_mixed_batch_reports_each_id(self, _status):
+        ada, asing, lain, selesai = (str(uuid.uuid4()) for _ in range(4))
+        db = FakeConnection([
+            (ada, 'Pemesanan Selesai', True, True, 'Pelayanan Jasa Sedang Dilakukan'),
+            (asing, None, False, False, None),
+            (lain, None, True, False, 'Pekerja Tiba di Lokasi'),
+            (selesai, None, True, True, 'Pemesanan Selesai'),
+        ])
+        with mock.patch('merah.order_status.get_db_connection', db):
+            results = order_status.apply_transitions(self.pekerja, 'pekerja', [ada, 'rusak', asing, lain, selesai])
+
+        self.assertEqual(db.executed[0][1]['pesanan'], [ada, asing, lain, selesai])
+        self.assertEqual([r.get('kode') for r in results], [
+            None,
+            order_status.TIDAK_DITEMUKAN,
+            order_status.TIDAK_DITEMUKAN,
+            order_status.BUKAN_PEMILIK,
+            order_status.STATUS_TIDAK_VALID,
+        ])
+
+    def test_single_transition_raises_for_invalid_id(self, _status):
+        with mock.patch('merah.order_status.get_db_connection', FakeConnection()):
+            with self.assertRaises(order_status.TransitionError) as error:
+                order_status.apply_transition(self.pekerja, 'pekerja', 'bukan-uuid')
+        self.assertEqual(error.exception.code, order_status.TIDAK_DITEMUKAN)
+
+
+class StripeWalletsArgumentTests(SimpleTestCase):
+    def test_dashed_phone_number_is_not_an_id(self):
+        user_id = str(uuid.uuid4())
+        ids, nohp = split_users([user_id.upper(), '0812-3456-7890', '081234567890'])
+        self.assertEqual(ids, [user_id])
+        self.assertEqual(nohp, ['0812-3456-7890', '081234567890'])
+
+
+@override_settings(CRON_SECRET='rahasia', PAYOUT_BATCH_SIZE=50, PAYOUT_CRON_MAX_BATCHES=3)
+class SettlePayoutsCronTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def call(self, **headers):
+        return views.settle_payouts_cron(self.factory.get('/cron/settle-payouts/', **headers))
+
+    @mock.patch('merah.payouts.settle_all', return_value={'batch': 1, 'pesanan': 2, 'pekerja': 1, 'total': 300000})
+    def test_settles_bounded_batches_with_secret(self, settle_all):
+        response = self.call(HTTP_AUTHORIZATION='Bearer rahasia')
+        self.assertEqual(response.status_code, 200)
+        settle_all.assert_called_once_with(50, 3)
+        self.assertEqual(json.loads(response.content)['pesanan'], 2)
+
+    @mock.patch('merah.payouts.settle_all')
+    def test_rejects_missing_or_wrong_secret(self, settle_all):
+        self.assertEqual(self.call().status_code, 401)
+        self.assertEqual(self.call(HTTP_AUTHORIZATION='Bearer salah').status_code, 401)
+        settle_all.assert_not_called()
+
+    @override_settings(CRON_SECRET='')
+    @mock.patch('merah.payouts.settle_all')
+    def test_disabled_without_secret(self, settle_all):
+        self.assertEqual(self.call(HTTP_AUTHORIZATION='Bearer ').status_code, 503)
+        settle_all.assert_not_called()
+
+
+class SeededDatabaseTestCase(TransactionTestCase):
+    """Skema sijarta dibuat ulang dan di-seed untuk tiap test."""
+
+    def setUp(self):
+        create_and_seed('10k')
+        invalidate_reference_data()
+
+    def query(self, sql, params=None):
+        with get_dedicated_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall() if cursor.description else None
+
+
+@skipUnless(is_local_database(), "Membuat ulang skema sijarta; hanya untuk Postgres lokal.")
+class PayoutIdempotencyTests(SeededDatabaseTestCase):
+    """Honor yang sama tidak pernah dicatat atau dikreditkan dua kali."""
+
+    def saldo_pekerja(self):
+        return dict(self.query("""
+            SELECT a.PekerjaId, saldo_dompet(a.PekerjaId)
+            FROM (SELECT DISTINCT PekerjaId FROM ANTREAN_HONOR) a
+        """))
+
+    def test_replayed_queue_rows_do_not_pay_twice(self):
+        self.query("""
+            INSERT INTO ANTREAN_HONOR (IdTrPemesanan, PekerjaId, Nominal, TglSelesai)
+            SELECT Id, IdPekerja, TotalBiaya, NOW()
+            FROM TR_PEMESANAN_JASA
+            WHERE IdPekerja IS NOT NULL
+            ORDER BY Id
+            LIMIT 25
+        """)
+        sebelum = self.saldo_pekerja()
+
+        pertama = payouts.settle_all(batch_size=10)
+        self.assertEqual(pertama['pesanan'], 25)
+        self.assertEqual(pertama['batch'], 3)
+        self.assertGreater(pertama['total'], 0)
+        sesudah = self.saldo_pekerja()
+        self.assertEqual(sum(sesudah.values()) - sum(sebelum.values()), pertama['total'])
+
+        # Antrean dibuka lagi, mis. runner mati setelah commit lalu dijalankan ulang dari cadangan
+        self.query("UPDATE ANTREAN_HONOR SET TglDibayar = NULL")
+        ulang = payouts.settle_all(batch_size=10)
+        self.assertEqual(ulang['pesanan'], 25)
+        self.assertEqual(ulang['total'], 0)
+        self.assertEqual(self.saldo_pekerja(), sesudah)
+        ledger = self.query("""
+            SELECT COUNT(*) FROM TR_MYPAY t
+            JOIN ANTREAN_HONOR a ON t.Id = md5('honor' || a.IdTrPemesanan::text)::uuid
+        """)[0][0]
+        self.assertEqual(ledger, 25)
+
+        self.assertEqual(payouts.settle_all(batch_size=10)['batch'], 0)
+
+
+@skipUnless(is_local_database(), "Membuat ulang skema sijarta; hanya untuk Postgres lokal.")
+class ClaimConcurrencyTests(SeededDatabaseTestCase):
+    """Klaim bersamaan: satu pesanan hanya diambil satu pekerja, baris terkunci dilewati."""
+
+    def setUp(self):
+        super().setUp()
+        # Dua pesanan baru yang sedang mencari pekerja, lebih tua dari seluruh data seed
+        self.pesanan = [row[1] for row in sorted(self.query("""
+            INSERT INTO TR_PEMESANAN_JASA (TglPemesanan, TglPekerjaan, WaktuPekerjaan, TotalBiaya,
+                                           IdPelanggan, IdKategoriJasa, Sesi, IdMetodeBayar)
+            SELECT DATE '1990-01-01' + n, DATE '1990-01-01' + n, TIMESTAMP '1990-01-01' + n * INTERVAL '1 day',
+                   TotalBiaya, IdPelanggan, IdKategoriJasa, Sesi, IdMetodeBayar
+            FROM TR_PEMESANAN_JASA, generate_series(0, 1) n
+            WHERE Id = (SELECT Id FROM TR_PEMESANAN_JASA ORDER BY Id LIMIT 1)
+            RETURNING TglPemesanan, Id::text
+        """))]
+        self.query("""
+            INSERT INTO TR_PEMESANAN_STATUS (IdTrPemesanan, IdStatus, TglWaktu)
+            SELECT p.id, sp.Id, NOW()
+            FROM unnest(%s::uuid[]) AS p(id), STATUS_PEMESANAN sp
+            WHERE sp.Status = %s
+        """, (self.pesanan, StatusPesanan.MENCARI_PEKERJA))
+        self.pekerja = [row[0] for row in self.query("SELECT Id::text FROM PEKERJA ORDER BY Id LIMIT 2")]
+        self.query("""
+            INSERT INTO PEKERJA_KATEGORI_JASA (PekerjaId, KategoriJasaId)
+            SELECT p.id, s.KategoriJasaId
+            FROM unnest(%s::uuid[]) AS p(id)
+            JOIN SUBKATEGORI_JASA s ON s.Id = (SELECT IdKategoriJasa FROM TR_PEMESANAN_JASA WHERE Id = %s)
+            ON CONFLICT DO NOTHING
+        """, (self.pekerja, self.pesanan[0]))
+
+    def lock(self, pesanan_id):
+        """Kunci baris pesanan dari koneksi lain sampai koneksi yang dikembalikan di-rollback."""
+        conn = get_dedicated_connection()
+        self.addCleanup(conn.close)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM TR_PEMESANAN_JASA WHERE Id = %s FOR UPDATE", (pesanan_id,))
+        return conn
+
+    def wait_for_lock_waiters(self, count):
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            waiting = self.query("""
+                SELECT COUNT(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND wait_event_type = 'Lock'
+            """)[0][0]
+            if waiting >= count:
+                return
+            time.sleep(0.05)
+        self.fail(f"{count} klaim tidak menunggu kunci pesanan.")
+
+    def test_concurrent_claims_have_one_winner(self):
+        results = {}
+
+        def claim(pekerja_id):
+            try:
+                results[pekerja_id] = dispatch.claim_order(pekerja_id, self.pesanan[0])
+            except dispatch.ClaimError as e:
+                results[pekerja_id] = e
+
+        # Kedua klaim menunggu kunci yang sama lalu dievaluasi ulang setelah dilepas
+        holder = self.lock(self.pesanan[0])
+        threads = [threading.Thread(target=claim, args=(pekerja_id,)) for pekerja_id in self.pekerja]
+        for thread in threads:
+            thread.start()
+        self.wait_for_lock_waiters(2)
+        holder.rollback()
+        for thread in threads:
+            thread.join(10)
+
+        menang = [pekerja_id for pekerja_id, result in results.items() if isinstance(result, dict)]
+        self.assertEqual(len(menang), 1)
+        kalah = next(pekerja_id for pekerja_id in self.pekerja if pekerja_id not in menang)
+        self.assertEqual(str(results[kalah]), 'Pesanan sudah diambil pekerja lain.')
+        self.assertEqual(self.query("""
+            SELECT t.IdPekerja::text, COUNT(s.*)
+            FROM TR_PEMESANAN_JASA t
+            JOIN TR_PEMESANAN_STATUS s ON s.IdTrPemesanan = t.Id
+            JOIN STATUS_PEMESANAN sp ON sp.Id = s.IdStatus AND sp.Status = %s
+            WHERE t.Id = %s
+            GROUP BY t.IdPekerja
+        """, (StatusPesanan.MENUNGGU_PEKERJA, self.pesanan[0])), [(menang[0], 1)])
+
+    def test_claim_next_order_skips_locked_order(self):
+        holder = self.lock(self.pesanan[0])
+        results = []
+        thread = threading.Thread(target=lambda: results.append(dispatch.claim_next_order(self.pekerja[0])))
+        thread.start()
+        thread.join(10)
+        self.assertFalse(thread.is_alive(), "claim_next_order menunggu baris yang terkunci.")
+        holder.rollback()
+
+        self.assertEqual(results[0]['id'], self.pesanan[1])
+        self.assertIsNone(self.query("SELECT IdPekerja FROM TR_PEMESANAN_JASA WHERE Id = %s", (self.pesanan[0],))[0][0])
@@ -1,12 +1,17 @@
 from django.urls import path
-from .views import transaksi_form, transaksi_list, pekerjaan_jasa, status_pekerjaan_jasa, kerjakan_pesanan, ubah_status_pesanan
+from .views import transaksi_form, transaksi_list, transaksi_export, pekerjaan_jasa, pekerjaan_jasa_data, ambil_pesanan_berikutnya, status_pekerjaan_jasa, kerjakan_pesanan, ubah_status_pesanan, ubah_status_pesanan_massal, settle_payouts_cron
 
 urlpatterns = [
     path('transaksi-mypay/', transaksi_list, name='transaksi_list'),
+    path('transaksi-mypay/export/', transaksi_export, name='transaksi_export'),
     path('transaksi-form/', transaksi_form, name='transaksi_form'),
     path('pekerjaan-jasa/', pekerjaan_jasa, name='pekerjaan_jasa'),
+    path('pekerjaan-jasa/data/', pekerjaan_jasa_data, name='pekerjaan_jasa_data'),
+    path('pekerjaan-jasa/berikutnya/', ambil_pesanan_berikutnya, name='ambil_pesanan_berikutnya'),
     path('kerjakan_pesanan/<uuid:pesanan_id>/', kerjakan_pesanan, name='kerjakan_pesanan'),
     path('status-pekerjaan-jasa/', status_pekerjaan_jasa, name='status_pekerjaan_jasa'),
+    path('ubah-status-pesanan/massal/', ubah_status_pesanan_massal, name='ubah_status_pesanan_massal'),
     path('ubah-status-pesanan/<uuid:pesanan_id>/<str:status_baru>/', ubah_status_pesanan, name='ubah_status_pesanan'),
+    path('cron/settle-payouts/', settle_payouts_cron, name='settle_payouts_cron'),
 ]
 
@@ -1,13 +1,18 @@
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from utils.db_connection import get_db_connection
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-import uuid
-from datetime import datetime, timedelta
+import csv
+import hmac
+import json
 import logging
 from utils.decorators import custom_login_required
+from merah import dispatch, mypay, order_status, payouts
+from merah.job_board import fetch_job_board
+from utils.pagination import InvalidCursor, parse_uuid
+from utils.reference_data import MetodeBayar, StatusPesanan, get_metode_bayar_id, get_status_id
 
 logger = logging.getLogger(__name__)
 
@@ -22,67 +27,71 @@ def execute_query(sql_query, params=None):
 def transaksi_list(request):
     user_id = request.session['user']['Id']  # Get the currently logged-in user's ID
 
-    # user_id = "f02cceac-7781-4652-9780-cacf74680211"
-    
-    # Query to fetch saldo_mypay (balance)
-    saldo_query = "SELECT saldomypay FROM \"USER\" WHERE id = %s"
-    saldo_result = execute_query(saldo_query, (user_id,))
-    saldo_mypay = saldo_result[0][0] if saldo_result else 0
-
-    # Query to fetch transaction history
-    transactions_query = """
-        SELECT t.nominal, t.tgl, k.nama as kategori
-        FROM tr_mypay t
-        JOIN kategori_tr_mypay k ON t.kategoriid = k.id
-        WHERE t.userid = %s
-        ORDER BY t.tgl DESC
-    """
-    transactions_result = execute_query(transactions_query, (user_id,))
-
-    # Prepare the transaction data
-    transactions_data = [
-        {
-            'nominal': trans[0],
-            'tanggal': trans[1],
-            'kategori': trans[2],
-        }
-        for trans in transactions_result
-    ]
+    cursor = request.GET.get('cursor')
+    try:
+        history = mypay.fetch_history(user_id, cursor=cursor)
+    except InvalidCursor:
+        return redirect('transaksi_list')
+
+    # Ringkasan per kategori hanya ditampilkan di halaman pertama
+    category_totals = mypay.fetch_category_totals(user_id) if not cursor else []
 
     # Prepare the context for the template
     context = {
-        'saldo_mypay': saldo_mypay,
-        'transactions': transactions_data,
+        'saldo_mypay': history['saldo'],
+        'transactions': history['transactions'],
+        'next_cursor': history['next_cursor'],
+        'is_first_page': not cursor,
+        'category_totals': category_totals,
     }
 
     return render(request, 'transaksi_mypay.html', context)
 
+class _Echo:
+    """Objek mirip file untuk csv.writer yang langsung mengembalikan baris."""
+    def write(self, value):
+        return value
+
+@custom_login_required
+def transaksi_export(request):
+    """Ekspor seluruh riwayat MyPay sebagai CSV (default) atau JSON secara streaming."""
+    user_id = request.session['user']['Id']
+    export_format = request.GET.get('format', 'csv')
+    rows = mypay.iter_history(user_id)
+
+    if export_format == 'json':
+        def stream_json():
+            yield '['
+            for index, (tgl, kategori, nominal, saldo_setelah) in enumerate(rows):
+                item = {
+                    'tanggal': tgl.isoformat(),
+                    'kategori': kategori,
+                    'nominal': str(nominal),
+                    'saldo_setelah': str(saldo_setelah),
+                }
+                yield (',' if index else '') + json.dumps(item)
+            yield ']'
+
+        response = StreamingHttpResponse(stream_json(), content_type='application/json')
+        response['Content-Disposition'] = 'attachment; filename="riwayat-mypay.json"'
+        return response
+
+    writer = csv.writer(_Echo())
+
+    def stream_csv():
+        yield writer.writerow(['tanggal', 'kategori', 'nominal', 'saldo_setelah'])
+        for tgl, kategori, nominal, saldo_setelah in rows:
+            yield writer.writerow([tgl.isoformat(), kategori, nominal, saldo_setelah])
+
+    response = StreamingHttpResponse(stream_csv(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="riwayat-mypay.csv"'
+    return response
+
 def check_user_type(user_id):
     pekerja_query = "SELECT id FROM pekerja WHERE id = %s"
     result = execute_query(pekerja_query, [user_id])
     return 'pekerja' if result else 'pelanggan'
 
-# Method helper untuk transaksi (commit query)
-# def execute_transaction(sql_query, params=None):
-#     with get_db_connection() as conn:
-#         with conn.cursor() as cursor:
-#             cursor.execute(sql_query, params or [])
-#             conn.commit()
-
-def execute_transaction(sql_query, params=None):
-    try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                print(f"Executing query: {sql_query}")  # Debug print
-                print(f"With parameters: {params}")     # Debug print
-                cursor.execute(sql_query, params or [])
-                conn.commit()
-                print("Transaction committed successfully") # Debug print
-                return True
-    except Exception as e:
-        print(f"Error in execute_transaction: {str(e)}")  # Debug print
-        return False
-
 def transaksi_form(request):
     # Assuming you get the user ID from the logged-in user
     user_id = request.session['user']['Id']
@@ -93,28 +102,23 @@ def transaksi_form(request):
     jasa_list = []
     if user_type == 'pelanggan':
         jasa_query = """
-                SELECT DISTINCT pj.id, 
+                SELECT pj.id, 
             sj.namasubkategori,
             pj.totalbiaya,
             COALESCE(d.potongan, 0) AS potongan
         FROM tr_pemesanan_jasa pj
-        JOIN tr_pemesanan_status pjs ON pj.id = pjs.idtrpemesanan
-        JOIN status_pemesanan sp ON pjs.idstatus = sp.id
-        JOIN metode_bayar mb ON pj.idmetodebayar = mb.id
+        JOIN tr_pemesanan_status_terkini pjs ON pj.id = pjs.idtrpemesanan
         JOIN subkategori_jasa sj ON pj.idkategorijasa = sj.id
         LEFT JOIN diskon d ON pj.iddiskon = d.kode
         WHERE pj.idpelanggan = %s 
-        AND pjs.idstatus = (
-            SELECT ps2.idstatus 
-            FROM tr_pemesanan_status ps2
-            WHERE ps2.idtrpemesanan = pj.id
-            ORDER BY ps2.tglwaktu DESC 
-            LIMIT 1
-        )
-        AND sp.status = 'Menunggu Pembayaran'
-        AND mb.nama = 'MyPay'
+        AND pjs.idstatus = %s
+        AND pj.idmetodebayar = %s
         """
-        jasa_result = execute_query(jasa_query, [user_id])
+        jasa_result = execute_query(jasa_query, [
+            user_id,
+            get_status_id(StatusPesanan.MENUNGGU_PEMBAYARAN),
+            get_metode_bayar_id(MetodeBayar.MYPAY),
+        ])
 
         # Menghitung harga setelah diskon
         for row in jasa_result:
@@ -135,163 +139,39 @@ def transaksi_form(request):
         kategori = request.POST.get('kategori')
         nominal = request.POST.get('nominal')
 
-        kategori_id = execute_query(
-            "SELECT id FROM kategori_tr_mypay WHERE nama = %s", 
-            [kategori]
-        )[0][0]
-
-        # Mendapatkan waktu transaksi
-        tgl_transaksi = datetime.now()
-
-        if kategori == "Top Up":
-            try:
-                nominal_amount = float(nominal) 
-                print(f"User ID: {user_id}")              # Debug print
-                print(f"Nominal amount: {nominal_amount}") # Debug print
-                execute_transaction(
-                    "UPDATE \"USER\" SET saldomypay = saldomypay + %s WHERE id = %s",
-                    [nominal_amount, user_id]
-                )
-                tr_mypay_id = str(uuid.uuid4())
-                execute_transaction(
-                    """
-                    INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    [tr_mypay_id, user_id, tgl_transaksi, nominal_amount, kategori_id]
-                )
+        # Setiap operasi dijalankan merah.mypay sebagai satu transaksi
+        try:
+            if kategori == "Top Up":
+                mypay.top_up(user_id, nominal)
                 messages.success(request, 'Top Up MyPay berhasil dilakukan.')
-            except ValueError:
-                messages.error(request, 'Nominal tidak valid.')
-
-        elif kategori == "Pembayaran Jasa" and user_type == 'pelanggan':
-            jasa_id = request.POST.get('jasa_id')
-            logger.debug(f"Jasa ID: {jasa_id}")
-
-            # Mendapatkan total biaya dari tr_pemesanan_jasa
-            biaya_query = "SELECT totalbiaya FROM tr_pemesanan_jasa WHERE id = %s"
-            biaya_result = execute_query(biaya_query, [jasa_id])
-            total_biaya = biaya_result[0][0] if biaya_result else 0
-
-            # Memeriksa saldo MyPay
-            saldo_query = "SELECT saldomypay FROM \"USER\" WHERE id = %s"
-            saldo_result = execute_query(saldo_query, (user_id,))
-            saldo_mypay = saldo_result[0][0] if saldo_result else 0
-
-            if saldo_mypay >= total_biaya:
-                # Kurangi saldo
-                execute_transaction(
-                    "UPDATE \"USER\" SET saldomypay = saldomypay - %s WHERE id = %s",
-                    [total_biaya, user_id]
-                )
-
-                tr_mypay_id = str(uuid.uuid4())
-                execute_transaction(
-                    """
-                    INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    [tr_mypay_id, user_id, tgl_transaksi, total_biaya, kategori_id]
-                )
-
-                # Dapatkan status terakhir pesanan ini
-                current_status_query = """
-                    SELECT sp.id, sp.status
-                    FROM tr_pemesanan_status tps
-                    JOIN status_pemesanan sp ON tps.idstatus = sp.id
-                    WHERE tps.idtrpemesanan = %s
-                    ORDER BY tps.tglwaktu DESC
-                    LIMIT 1
-                """
-                current_status = execute_query(current_status_query, [jasa_id])
-                logger.debug(f"Current status: {current_status}")
-                
-                if current_status and current_status[0][1] == 'Menunggu Pembayaran':
-                    # Insert status baru
-                    execute_transaction(
-                        """
-                        INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
-                        VALUES (%s, %s, %s)
-                        """,
-                        [jasa_id, '2075e2c6-fe5f-4f26-8984-9616e9683617', datetime.now()]  # ID untuk 'Mencari Pekerja Terdekat'
-                    )
-                    messages.success(request, 'Pembayaran Jasa berhasil dilakukan.')
-                else:
-                    logger.error(f"Status pesanan tidak sesuai: {current_status}")
-                    logger.error(f"ID pesanan: {jasa_id}")
-                    messages.error(request, 'Terjadi kesalahan dalam memproses status pesanan.')
-            else:
-                # Tambahkan pesan error: saldo tidak cukup
-                context = {
-                    'error': 'Saldo MyPay Anda tidak cukup untuk melakukan pembayaran ini.',
-                    'jasa_list': jasa_list,
-                    'bank_list': bank_list,
-                }
-                return render(request, 'transaksi_form.html', context)
-            
-        elif kategori == "Transfer":
-            nohp = request.POST.get('nohp')
-            nominal_transfer = request.POST.get('nominal-transfer')
-            nominal_transfer = float(nominal_transfer)
-
-            target_user = execute_query(
-                "SELECT id FROM \"USER\" WHERE nohp = %s",
-                [nohp]
-            )
-            if not target_user:
-                return JsonResponse({'error': 'Nomor HP tidak ditemukan'}, status=400)
-            
-            target_user_id = target_user[0][0]
-            
-            execute_transaction(
-                'UPDATE "USER" SET saldomypay = saldomypay - %s WHERE id = %s',
-                [nominal_transfer, user_id]
-            )
-            execute_transaction(
-                'UPDATE "USER" SET saldomypay = saldomypay + %s WHERE id = %s',
-                [nominal_transfer, target_user_id]
-            )
-
-            # Insert ke tr_mypay untuk pengirim
-            tr_mypay_id_sender = str(uuid.uuid4())
-            execute_transaction(
-                """
-                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                [tr_mypay_id_sender, user_id, tgl_transaksi, -nominal_transfer, kategori_id]
-            )
-            # Insert ke tr_mypay untuk penerima
-            tr_mypay_id_receiver = str(uuid.uuid4())
-            execute_transaction(
-                """
-                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                [tr_mypay_id_receiver, target_user_id, tgl_transaksi, nominal_transfer, kategori_id]
-            )
-            # Tambahkan pesan sukses
-            messages.success(request, 'Transfer MyPay berhasil dilakukan.')
-
-        elif kategori == "Withdraw":
-            nominal_withdraw = request.POST.get('nominal-withdraw')
-            nominal_withdraw = float(nominal_withdraw)
-            execute_transaction(
-                'UPDATE "USER" SET saldomypay = saldomypay - %s WHERE id = %s',
-                [nominal_withdraw, user_id]
-            )
-
-            # Insert ke tr_mypay
-            tr_mypay_id = str(uuid.uuid4())
-            execute_transaction(
-                """
-                INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                [tr_mypay_id, user_id, tgl_transaksi, -nominal_withdraw, kategori_id]
-            )
-            # Tambahkan pesan sukses
-            messages.success(request, 'Withdrawal berhasil dilakukan.')
+
+            elif kategori == "Pembayaran Jasa" and user_type == 'pelanggan':
+                jasa_id = request.POST.get('jasa_id')
+                logger.debug(f"Jasa ID: {jasa_id}")
+                try:
+                    mypay.pay_order(user_id, jasa_id)
+                except mypay.MyPayError as e:
+                    context = {
+                        'error': str(e),
+                        'jasa_list': jasa_list,
+                        'bank_list': bank_list,
+                    }
+                    return render(request, 'transaksi_form.html', context)
+                messages.success(request, 'Pembayaran Jasa berhasil dilakukan.')
+
+            elif kategori == "Transfer":
+                nohp = request.POST.get('nohp')
+                nominal_transfer = request.POST.get('nominal-transfer')
+                mypay.transfer(user_id, nohp, nominal_transfer)
+                messages.success(request, 'Transfer MyPay berhasil dilakukan.')
+
+            elif kategori == "Withdraw":
+                nominal_withdraw = request.POST.get('nominal-withdraw')
+                mypay.withdraw(user_id, nominal_withdraw)
+                messages.success(request, 'Withdrawal berhasil dilakukan.')
+
+        except mypay.MyPayError as e:
+            messages.error(request, str(e))
 
 
     # In the transaksi_form view
@@ -311,209 +191,115 @@ def transaksi_form(request):
     return render(request, 'transaksi_form.html', context)
 
 def pekerjaan_jasa(request):
-    try:
-        kategori_list = execute_query("SELECT id, namakategori FROM kategori_jasa")
-    except Exception as e:
-        logging.error(f"Error fetching kategori_jasa: {e}")
-        kategori_list = []
-
     kategori_id = request.GET.get("kategori")
     logging.info(f"Kategori ID: {kategori_id}")
     subkategori_id = request.GET.get("subkategori")
     logging.debug(f"Subkategori ID: {subkategori_id}")
 
-    # Prepare the basic query for fetching pesanan_list
-    base_query = """
-        SELECT 
-            t.id, 
-            s.namasubkategori, 
-            u.nama AS nama_pelanggan, 
-            t.tglpemesanan, 
-            t.sesi, 
-            t.totalbiaya, 
-            sp.status
-        FROM tr_pemesanan_jasa t
-        JOIN subkategori_jasa s ON t.idkategorijasa = s.id
-        JOIN pelanggan p ON t.idpelanggan = p.id
-        JOIN "USER" u ON p.id = u.id
-        JOIN tr_pemesanan_status ts ON ts.idtrpemesanan = t.id
-        JOIN status_pemesanan sp ON ts.idstatus = sp.id
-        WHERE ts.tglwaktu = (
-            SELECT MAX(ts2.tglwaktu)
-            FROM tr_pemesanan_status ts2
-            WHERE ts2.idtrpemesanan = t.id
-        )
-        AND sp.status = 'Mencari Pekerja Terdekat'
-    """
-
-    # Initialize query parameters
-    params = []
-
-    # Check if kategori_id is provided
-    if kategori_id:
-        # Modify the query to filter by kategori_id
-        base_query += " AND s.kategorijasaid = %s"
-        params.append(kategori_id)
-
-        # If subkategori_id is provided, add the subkategori filter
-        if subkategori_id:
-            base_query += " AND s.id = %s"
-            params.append(subkategori_id)
-
-        # Fetch subkategori_list based on kategori_id
-        subkategori_list = execute_query(
-            "SELECT id, namasubkategori, kategorijasaid FROM subkategori_jasa WHERE kategorijasaid = %s",
-            [kategori_id]
-        )
-    else:
-        # Fetch all subkategori_list if kategori_id is not provided
-        subkategori_list = execute_query("SELECT id, namasubkategori, kategorijasaid FROM subkategori_jasa")
-
-        # If subkategori_id is provided, add the subkategori filter
-        if subkategori_id:
-            base_query += " AND s.id = %s"
-            params.append(subkategori_id)
-
-    # Execute the final query to get pesanan_list
-    pesanan_result = execute_query(base_query, params)
-    # print("-----------------------")
-    # print(pesanan_result)
-
-    # Konversi list of tuples menjadi list of dicts
-    pesanan_list = [
-        {
-            'id': pesanan[0],
-            'subkategori': pesanan[1],
-            'nama_pelanggan': pesanan[2],
-            'tanggal_pemesanan': pesanan[3],
-            'sesi': pesanan[4],
-            'total_biaya': pesanan[5],
-            'status': pesanan[6],
-        }
-        for pesanan in pesanan_result
-    ]
+    # Halaman pertama + facet filter diambil dalam satu round-trip,
+    # halaman berikutnya dimuat lewat pekerjaan_jasa_data (infinite scroll)
+    try:
+        board = fetch_job_board(parse_uuid(kategori_id), parse_uuid(subkategori_id))
+    except Exception as e:
+        logging.error(f"Error fetching job board: {e}")
+        board = {'kategori_list': [], 'subkategori_list': [], 'pesanan_list': [], 'next_cursor': None}
 
     context = {
-        "kategori_list": kategori_list,
-        "subkategori_list": subkategori_list,
-        "pesanan_list": pesanan_list,
+        "kategori_list": board['kategori_list'],
+        "subkategori_list": board['subkategori_list'],
+        "pesanan_list": board['pesanan_list'],
+        "next_cursor": board['next_cursor'],
         "selected_kategori": kategori_id,
         "selected_subkategori": subkategori_id,
     }
 
     return render(request, "pekerjaan_jasa.html", context)
 
-def get_status_id(status_name):
-    query = "SELECT id FROM status_pemesanan WHERE status = %s"
-    result = execute_query(query, [status_name])
-    return result[0][0] if result else None
+def pekerjaan_jasa_data(request):
+    """Varian JSON dari pekerjaan_jasa untuk memuat halaman berikutnya."""
+    try:
+        board = fetch_job_board(
+            parse_uuid(request.GET.get("kategori")),
+            parse_uuid(request.GET.get("subkategori")),
+            cursor=request.GET.get("cursor"),
+            with_facets=False,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error fetching job board page: {e}")
+        return JsonResponse({'error': 'Gagal memuat pesanan.'}, status=500)
 
+    pesanan_list = [
+        {**pesanan, 'tanggal_pemesanan': pesanan['tanggal_pemesanan'].isoformat()}
+        for pesanan in board['pesanan_list']
+    ]
+    return JsonResponse({'pesanan_list': pesanan_list, 'next_cursor': board['next_cursor']})
 
 def kerjakan_pesanan(request, pesanan_id):
-    if request.method == "POST":
-        try:
-            logger.debug("Processing 'kerjakan_pesanan' for pesanan_id: %s", pesanan_id)
-            pekerja_id = request.session['user']['Id']
-            logger.debug("Pekerja ID: %s", pekerja_id)
-            tgl_pekerjaan = datetime.now().date()
-
-            # Pastikan ID sebagai string
-            pesanan_id = str(pesanan_id)
-            pekerja_id = str(pekerja_id)
-
-            # Cek apakah pekerja memiliki kategori yang sesuai dengan pesanan
-            kategori_check_query = """
-                SELECT 1
-                FROM tr_pemesanan_jasa tj
-                JOIN subkategori_jasa sj ON tj.idkategorijasa = sj.id
-                JOIN pekerja_kategori_jasa pk ON sj.kategorijasaid = pk.kategorijasaid
-                WHERE tj.id = %s AND pk.pekerjaid = %s
-            """
-            kategori_match = execute_query(kategori_check_query, [pesanan_id, pekerja_id])
-            logger.debug("Kategori match: %s", kategori_match)
-
-            if not kategori_match:
-                messages.error(request, "Anda tidak memiliki kategori yang sesuai untuk mengambil pesanan ini.")
-                logger.warning("Kategori tidak cocok untuk pesanan_id: %s oleh pekerja_id: %s", pesanan_id, pekerja_id)
-                return redirect('pekerjaan_jasa')
-
-            # Ambil sesi untuk pesanan ini
-            sesi_result = execute_query("""
-                SELECT sesi 
-                FROM tr_pemesanan_jasa 
-                WHERE id = %s
-            """, [pesanan_id])
-            logger.debug("Sesi result: %s", sesi_result)
-
-            if not sesi_result:
-                messages.error(request, "Pesanan tidak ditemukan.")
-                logger.warning("Pesanan_id: %s tidak ditemukan.", pesanan_id)
-                return redirect('pekerjaan_jasa')
-
-            sesi = sesi_result[0][0] 
-            logger.debug("Sesi untuk pesanan_id %s: %s", pesanan_id, sesi)
-
-            # Hitung waktu_pekerjaan sebagai tgl_pekerjaan + sesi (1 sesi = 1 hari)
-            waktu_pekerjaan = datetime.combine(tgl_pekerjaan, datetime.min.time()) + timedelta(days=sesi)
-            logger.debug("Waktu pekerjaan: %s", waktu_pekerjaan)
-
-            # Update tr_pemesanan_jasa
-            update_success = execute_transaction("""
-                UPDATE tr_pemesanan_jasa
-                SET tglpekerjaan = %s, 
-                    idpekerja = %s, 
-                    waktupekerjaan = %s
-                WHERE id = %s
-            """, [tgl_pekerjaan, pekerja_id, waktu_pekerjaan, pesanan_id])
-            logger.debug("Update success: %s", update_success)
-
-            if not update_success:
-                messages.error(request, "Gagal mengupdate data pesanan. Pastikan pesanan masih dapat diproses.")
-                logger.error("Update gagal untuk pesanan_id: %s", pesanan_id)
-                return redirect('pekerjaan_jasa')
-
-            # **Change Status to a New Value Here**
-            new_status_name = "Menunggu Pekerja Terdekat"
-            status_id = get_status_id(new_status_name)
-            if not status_id:
-                messages.error(request, f"Status '{new_status_name}' tidak ditemukan.")
-                logger.error(f"Status '{new_status_name}' tidak ditemukan di database.")
-                return redirect('pekerjaan_jasa')
-
-            logger.debug("Using status_id: %s", status_id)
-
-            # Insert status baru
-            status_success = execute_transaction("""
-                INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
-                VALUES (%s, %s, %s)
-            """, [pesanan_id, status_id, datetime.now()])
-            logger.debug("Status insert success: %s", status_success)
-
-            if not status_success:
-                messages.error(request, "Gagal mengupdate status pesanan.")
-                logger.error("Status insert gagal untuk pesanan_id: %s", pesanan_id)
-                return redirect('pekerjaan_jasa')
-
-            messages.success(request, "Pesanan berhasil diambil dan status diperbarui.")
-            logger.info("Pesanan_id: %s berhasil diproses oleh pekerja_id: %s", pesanan_id, pekerja_id)
-            return redirect('pekerjaan_jasa')
-
-        except Exception as e:
-            logger.error(f"Error in kerjakan_pesanan: {str(e)}")
-            messages.error(request, f"Terjadi kesalahan: {str(e)}")
-            return redirect('pekerjaan_jasa')
-    else:
+    if request.method != "POST":
         messages.error(request, "Metode permintaan tidak diizinkan.")
         return redirect('pekerjaan_jasa')
 
+    pekerja_id = request.session['user']['Id']
+    logger.debug("Processing 'kerjakan_pesanan' for pesanan_id: %s by pekerja_id: %s", pesanan_id, pekerja_id)
+
+    # Cek kategori, status, dan pengambilan dilakukan atomik oleh merah.dispatch
+    try:
+        dispatch.claim_order(pekerja_id, pesanan_id)
+    except dispatch.ClaimError as e:
+        logger.warning("Klaim pesanan_id %s oleh pekerja_id %s ditolak: %s", pesanan_id, pekerja_id, e)
+        messages.error(request, str(e))
+        return redirect('pekerjaan_jasa')
+    except Exception as e:
+        logger.error(f"Error in kerjakan_pesanan: {str(e)}")
+        messages.error(request, f"Terjadi kesalahan: {str(e)}")
+        return redirect('pekerjaan_jasa')
+
+    messages.success(request, "Pesanan berhasil diambil dan status diperbarui.")
+    logger.info("Pesanan_id: %s berhasil diproses oleh pekerja_id: %s", pesanan_id, pekerja_id)
+    return redirect('pekerjaan_jasa')
+
+@custom_login_required
+def ambil_pesanan_berikutnya(request):
+    """
+    API untuk pekerja: ambil pesanan terlama yang cocok dengan kategorinya
+    (opsional difilter kategori/subkategori). Mengembalikan pesanan yang
+    berhasil diambil, atau pesanan null bila antrean kosong.
+    """
+    if request.method != "POST":
+        return JsonResponse({'success': False, 'error': 'Metode permintaan tidak diizinkan.'}, status=405)
+    user = request.session['user']
+    if user.get('role') != 'pekerja':
+        return JsonResponse({'success': False, 'error': 'Hanya pekerja yang dapat mengambil pesanan.'}, status=403)
+
+    try:
+        pesanan = dispatch.claim_next_order(
+            user['Id'],
+            kategori_id=parse_uuid(request.POST.get("kategori")),
+            subkategori_id=parse_uuid(request.POST.get("subkategori")),
+        )
+    except dispatch.ClaimError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error claiming next order for pekerja {user['Id']}: {e}")
+        return JsonResponse({'success': False, 'error': 'Gagal mengambil pesanan.'}, status=500)
+
+    if pesanan:
+        pesanan = {
+            **pesanan,
+            'total_biaya': str(pesanan['total_biaya']),
+            'tanggal_pekerjaan': pesanan['tanggal_pekerjaan'].isoformat(),
+            'waktu_pekerjaan': pesanan['waktu_pekerjaan'].isoformat(),
+        }
+    return JsonResponse({'success': True, 'pesanan': pesanan})
+
 def get_latest_status(pesanan_id):
     status_query = """
         SELECT sp.status
-        FROM tr_pemesanan_status tps
+        FROM tr_pemesanan_status_terkini tps
         JOIN status_pemesanan sp ON tps.idstatus = sp.id
         WHERE tps.idtrpemesanan = %s
-        ORDER BY tps.tglwaktu DESC
-        LIMIT 1
     """
     result = execute_query(status_query, [pesanan_id])
     return result[0][0] if result else None
@@ -539,14 +325,9 @@ def status_pekerjaan_jasa(request):
         JOIN subkategori_jasa sj ON pj.idkategorijasa = sj.id
         JOIN pelanggan p ON pj.idpelanggan = p.id
         JOIN "USER" u ON p.id = u.id
-        JOIN tr_pemesanan_status tps ON tps.idtrpemesanan = pj.id
+        JOIN tr_pemesanan_status_terkini tps ON tps.idtrpemesanan = pj.id
         JOIN status_pemesanan sp ON tps.idstatus = sp.id
         WHERE pj.idpekerja = %s
-          AND tps.tglwaktu = (
-              SELECT MAX(ts_inner.tglwaktu)
-              FROM tr_pemesanan_status ts_inner
-              WHERE ts_inner.idtrpemesanan = pj.id
-          )
     """
     
     params = [user_id]
@@ -608,73 +389,73 @@ def ubah_status_pesanan(request, pesanan_id, status_baru):
         messages.error(request, "Anda harus login untuk mengubah status pesanan.")
         return redirect('login')
     
-    pesanan_id_str = str(pesanan_id)
-    
-    # Cek apakah pesanan memang dimiliki oleh pekerja ini
-    cek_pesanan_query = """
-        SELECT pj.id
-        FROM tr_pemesanan_jasa pj
-        WHERE pj.id = %s AND pj.idpekerja = %s
-    """
-    cek_pesanan = execute_query(cek_pesanan_query, [pesanan_id_str, user_id])
-    
-    if not cek_pesanan:
-        logger.warning(f"Pesanan_id {pesanan_id_str} tidak ditemukan atau bukan milik pekerja_id {user_id}.")
-        messages.error(request, "Pesanan tidak ditemukan atau Anda tidak berwenang untuk mengubahnya.")
-        return redirect('status_pekerjaan_jasa')
-    
-    # Ambil status saat ini
-    current_status_query = """
-        SELECT sp.status
-        FROM tr_pemesanan_status tps
-        JOIN status_pemesanan sp ON tps.idstatus = sp.id
-        WHERE tps.idtrpemesanan = %s
-        ORDER BY tps.tglwaktu DESC
-        LIMIT 1
-    """
-    current_status_result = execute_query(current_status_query, [pesanan_id_str])
-    current_status = current_status_result[0][0].strip() if current_status_result else None
-    
-    logger.debug(f"Current status for pesanan_id {pesanan_id_str}: {current_status}")
-    
-    # Update status_transitions to reflect correct transitions
-    status_transitions = {
-        "Menunggu Pekerja Terdekat": "Pekerja Tiba di Lokasi",
-        "Pekerja Tiba di Lokasi": "Pelayanan Jasa Sedang Dilakukan",
-        "Pelayanan Jasa Sedang Dilakukan": "Pemesanan Selesai",
-    }
-    
-    # Verifikasi bahwa status_baru sesuai dengan transisi
-    expected_status = status_transitions.get(current_status)
-    logger.debug(f"Expected status untuk {current_status}: {expected_status}")
-    if expected_status != status_baru:
-        logger.warning(f"Perubahan status tidak valid: {current_status} -> {status_baru}")
-        messages.error(request, "Perubahan status tidak valid.")
-        return redirect('status_pekerjaan_jasa')
-    
-    # Ambil ID status_baru
-    status_id_query = "SELECT id FROM status_pemesanan WHERE status = %s"
-    status_id_result = execute_query(status_id_query, [status_baru])
-    if not status_id_result:
-        logger.error(f"Status baru tidak ditemukan: {status_baru}")
-        messages.error(request, "Status baru tidak ditemukan.")
+    # Kepemilikan, status sekarang, dan insert status baru dalam satu statement
+    try:
+        order_status.apply_transition(user_id, 'pekerja', pesanan_id, status_baru)
+    except order_status.TransitionError as e:
+        logger.warning(f"Perubahan status pesanan_id {pesanan_id} -> '{status_baru}' ditolak ({e.code}): {e}")
+        messages.error(request, str(e))
         return redirect('status_pekerjaan_jasa')
-    status_id_baru = status_id_result[0][0]
-    
-    logger.debug(f"Status ID baru untuk '{status_baru}': {status_id_baru}")
-    
-    # Insert status baru ke tr_pemesanan_status
-    insert_status_query = """
-        INSERT INTO tr_pemesanan_status (idtrpemesanan, idstatus, tglwaktu)
-        VALUES (%s, %s, %s)
-    """
-    status_success = execute_transaction(insert_status_query, [pesanan_id_str, status_id_baru, datetime.now()])
-    
-    if not status_success:
-        logger.error(f"Insert status baru gagal untuk pesanan_id: {pesanan_id_str}")
+    except Exception as e:
+        logger.error(f"Gagal mengubah status pesanan_id {pesanan_id}: {e}")
         messages.error(request, "Gagal mengupdate status pesanan.")
         return redirect('status_pekerjaan_jasa')
     
-    logger.info(f"Status pesanan_id {pesanan_id_str} berhasil diubah menjadi '{status_baru}'.")
+    logger.info(f"Status pesanan_id {pesanan_id} berhasil diubah menjadi '{status_baru}'.")
     messages.success(request, f"Status pesanan berhasil diubah menjadi '{status_baru}'.")
     return redirect('status_pekerjaan_jasa')
+
+@custom_login_required
+def ubah_status_pesanan_massal(request):
+    """
+    API untuk pekerja: majukan status beberapa pesanan sekaligus. POST
+    ``pesanan_id`` (boleh berulang) dan opsional ``status_baru``; tanpa
+    status_baru tiap pesanan maju ke status berikutnya. Mengembalikan hasil
+    per pesanan beserta alasan bila gagal.
+    """
+    if request.method != "POST":
+        return JsonResponse({'success': False, 'error': 'Metode permintaan tidak diizinkan.'}, status=405)
+    user = request.session['user']
+    if user.get('role') != 'pekerja':
+        return JsonResponse({'success': False, 'error': 'Hanya pekerja yang dapat mengubah status pesanan.'}, status=403)
+
+    raw_ids = request.POST.getlist('pesanan_id')
+    pesanan_ids = [parse_uuid(value) for value in raw_ids]
+    if not raw_ids or None in pesanan_ids:
+        return JsonResponse({'success': False, 'error': 'pesanan_id tidak valid.'}, status=400)
+
+    try:
+        results = order_status.apply_transitions(
+            user['Id'], 'pekerja', pesanan_ids, request.POST.get('status_baru') or None,
+        )
+    except order_status.TransitionError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error in ubah_status_pesanan_massal for pekerja {user['Id']}: {e}")
+        return JsonResponse({'success': False, 'error': 'Gagal mengupdate status pesanan.'}, status=500)
+
+    return JsonResponse({
+        'success': all(result['berhasil'] for result in results),
+        'results': results,
+    })
+
+
+def settle_payouts_cron(request):
+    """
+    Entry point terjadwal (Vercel Cron) untuk membayar honor yang mengantre di
+    ANTREAN_HONOR, paling banyak PAYOUT_CRON_MAX_BATCHES batch per panggilan.
+    Hanya menerima header ``Authorization: Bearer <CRON_SECRET>``.
+    """
+    secret = settings.CRON_SECRET
+    if not secret:
+        logger.error("CRON_SECRET belum diatur; honor pekerja tidak dibayar.")
+        return JsonResponse({'success': False, 'error': 'Cron belum dikonfigurasi.'}, status=503)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {secret}'):
+        return JsonResponse({'success': False, 'error': 'Tidak berwenang.'}, status=401)
+
+    try:
+        summary = payouts.settle_all(settings.PAYOUT_BATCH_SIZE, settings.PAYOUT_CRON_MAX_BATCHES)
+    except payouts.PayoutError as e:
+        logger.error(f"Cron settle_payouts gagal: {e}")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+    return JsonResponse({'success': True, **summary})
@@ -51,11 +51,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     # Tambahkan aplikasi Anda di sini
+    'kuning',
+    'hijau',
+    'Blue',
+    'merah',
+    'benchmark',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise middleware
+    'utils.middleware.QueryStatsMiddleware',  # Jumlah/waktu query per request (Server-Timing)
+    'utils.middleware.RequestConnectionMiddleware',  # Satu koneksi pool per request
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -92,10 +99,149 @@ DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv('DATABASE_URL'),
         conn_max_age=600,
-        ssl_require=True
+        # Set DATABASE_SSL_REQUIRE=False untuk Postgres lokal (mis. benchmark)
+        ssl_require=os.getenv('DATABASE_SSL_REQUIRE', 'True').lower() in ['true', '1', 't']
     )
 }
 
+# ===========================
+# Database Connection Pool
+# ===========================
+
+# Dipakai oleh utils.db_connection untuk query raw psycopg2
+DB_POOL = {
+    'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    # Detik sebelum koneksi idle ditutup (selama jumlah koneksi > MIN_SIZE)
+    'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    # Detik menunggu koneksi kosong sebelum menyerah
+    'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    # Koneksi yang idle lebih lama dari ini di-ping dengan SELECT 1 saat checkout
+    'CHECK_INTERVAL': float(os.getenv('DB_POOL_CHECK_INTERVAL', '30')),
+}
+
+# Dipakai oleh utils.middleware.QueryStatsMiddleware dan utils.query_stats
+QUERY_STATS = {
+    'ENABLED': os.getenv('QUERY_STATS_ENABLED', 'True').lower() in ['true', '1', 't'],
+    # Tambahkan header Server-Timing (db dan total) ke setiap respons
+    'SERVER_TIMING': os.getenv('QUERY_STATS_SERVER_TIMING', 'True').lower() in ['true', '1', 't'],
+    # Request yang lebih lama dari ini (ms) ditulis ke log
+    'SLOW_REQUEST_MS': float(os.getenv('QUERY_STATS_SLOW_REQUEST_MS', '500')),
+    # Statement yang lebih lama dari ini (ms) ditulis ke slow-query log
+    'SLOW_QUERY_MS': float(os.getenv('QUERY_STATS_SLOW_QUERY_MS', '200')),
+    # Request dengan query lebih banyak dari ini ditulis ke log
+    'MAX_QUERIES': int(os.getenv('QUERY_STATS_MAX_QUERIES', '20')),
+    # Statement yang sama dieksekusi sebanyak ini dalam satu request dianggap N+1
+    'N_PLUS_ONE_THRESHOLD': int(os.getenv('QUERY_STATS_N_PLUS_ONE_THRESHOLD', '5')),
+}
+
+# ===========================
+# Cache Katalog Jasa
+# ===========================
+
+# Detik sebelum pohon kategori/subkategori di hijau.catalog dimuat ulang
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+# Slug yang tidak dikenal memicu reload katalog, paling sering sekali per sekian detik
+CATALOG_MISS_RELOAD = int(os.getenv('CATALOG_MISS_RELOAD', '30'))
+# Jumlah pekerja teratas per halaman di halaman subkategori
+WORKER_LEADERBOARD_PAGE_SIZE = int(os.getenv('WORKER_LEADERBOARD_PAGE_SIZE', '12'))
+
+# ===========================
+# Harga Layanan
+# ===========================
+
+# Umur (detik) matriks harga sesi dan tabel diskon per proses
+PRICING_CACHE_TTL = int(os.getenv('PRICING_CACHE_TTL', '300'))
+# Sesi/kode diskon yang tidak dikenal memicu reload, paling sering sekali per sekian detik
+PRICING_MISS_RELOAD = int(os.getenv('PRICING_MISS_RELOAD', '30'))
+# Jumlah kombinasi maksimal per permintaan api/quote/
+PRICING_MAX_BATCH = int(os.getenv('PRICING_MAX_BATCH', '100'))
+
+# ===========================
+# Cache
+# ===========================
+
+# Default cache lokal per proses; set CACHE_URL (mis. redis://localhost:6379/0)
+# agar cache dan invalidasinya dibagi antar worker
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sijarta',
+        }
+    }
+
+# Katalog, harga, dan data referensi di-cache per proses (utils.snapshot_cache);
+# invalidasi dicatat di cache di atas dan dicek paling sering sekali per sekian
+# detik, sehingga tanpa CACHE_URL hanya berlaku di proses yang memanggilnya
+SNAPSHOT_SYNC_INTERVAL = int(os.getenv('SNAPSHOT_SYNC_INTERVAL', '5'))
+
+# Jumlah testimoni per halaman di halaman subkategori
+TESTIMONIAL_PAGE_SIZE = int(os.getenv('TESTIMONIAL_PAGE_SIZE', '10'))
+# Umur (detik) cache halaman pertama testimoni per subkategori
+TESTIMONIAL_CACHE_TTL = int(os.getenv('TESTIMONIAL_CACHE_TTL', '300'))
+
+# ===========================
+# Session
+# ===========================
+
+# Dengan CACHE_URL, session hanya menyimpan token identitas (Id, role, versi)
+# dan profil lengkap dibaca dari cache dengan fallback ke basis data. Engine
+# ini berbasis cached_db sehingga butuh cache bersama; tanpa CACHE_URL cache
+# lokal per proses akan menyajikan session lama (mis. setelah logout) di
+# worker lain, jadi dipakai session basis data biasa
+if os.getenv('CACHE_URL'):
+    SESSION_ENGINE = 'kuning.session'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Umur (detik) read model profil di cache, default sama dengan umur cookie session
+SESSION_PROFILE_TTL = int(os.getenv('SESSION_PROFILE_TTL', '1209600'))
+
+# ===========================
+# Papan Pekerjaan
+# ===========================
+
+# Jumlah pesanan per halaman di pekerjaan_jasa (dan tiap muatan infinite scroll)
+JOB_BOARD_PAGE_SIZE = int(os.getenv('JOB_BOARD_PAGE_SIZE', '20'))
+
+# ===========================
+# Riwayat MyPay
+# ===========================
+
+# Jumlah transaksi per halaman di transaksi_mypay
+MYPAY_HISTORY_PAGE_SIZE = int(os.getenv('MYPAY_HISTORY_PAGE_SIZE', '25'))
+
+# ===========================
+# Honor Pekerja
+# ===========================
+
+# Jumlah pesanan selesai yang dibayar per batch oleh settle_payouts
+PAYOUT_BATCH_SIZE = int(os.getenv('PAYOUT_BATCH_SIZE', '500'))
+# Jeda (detik) antar putaran settle_payouts --watch
+PAYOUT_INTERVAL = int(os.getenv('PAYOUT_INTERVAL', '60'))
+# Honor hanya dibayar oleh settle_payouts atau endpoint cron/settle-payouts/
+# (dipanggil Vercel Cron, lihat vercel.json). Endpoint menolak semua request
+# sampai CRON_SECRET diatur; Vercel mengirimnya sebagai "Authorization: Bearer"
+CRON_SECRET = os.getenv('CRON_SECRET', '')
+# Batas batch per panggilan cron agar selesai dalam batas waktu fungsi serverless
+PAYOUT_CRON_MAX_BATCHES = int(os.getenv('PAYOUT_CRON_MAX_BATCHES', '10'))
+
+# ===========================
+# Data Referensi
+# ===========================
+
+# Umur (detik) cache status pesanan, metode bayar, dan kategori MyPay per proses
+REFERENCE_DATA_TTL = int(os.getenv('REFERENCE_DATA_TTL', '600'))
+# Nama/id yang tidak dikenal memicu reload, paling sering sekali per sekian detik
+REFERENCE_DATA_MISS_RELOAD = int(os.getenv('REFERENCE_DATA_MISS_RELOAD', '30'))
+
 # ===========================
 # Password Validation
 # ===========================
@@ -47,3 +47,20 @@ CREATE TRIGGER trg_validate_voucher_usage_and_expiry
 BEFORE INSERT OR UPDATE ON TR_PEMESANAN_JASA
 FOR EACH ROW
 EXECUTE FUNCTION validate_voucher_usage_and_expiry();
+
+-- Pembelian voucher idempoten: kunci dari klien unik per pelanggan, sehingga
+-- request yang diulang tidak membuat pembelian (dan potongan saldo) kedua.
+ALTER TABLE TR_PEMBELIAN_VOUCHER ADD COLUMN IF NOT EXISTS KunciIdempoten VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pembelian_voucher_idempoten
+ON TR_PEMBELIAN_VOUCHER (IdPelanggan, KunciIdempoten);
+
+-- Kategori tr_mypay untuk pembayaran voucher dengan MyPay
+INSERT INTO KATEGORI_TR_MYPAY (Id, Nama)
+SELECT gen_random_uuid(), 'Pembelian Voucher'
+WHERE NOT EXISTS (SELECT 1 FROM KATEGORI_TR_MYPAY WHERE Nama = 'Pembelian Voucher');
+
+-- Dompet voucher pelanggan dan pencarian pembelian yang masih berlaku di
+-- trigger validate_voucher_usage_and_expiry
+CREATE INDEX IF NOT EXISTS idx_pembelian_voucher_dompet
+ON TR_PEMBELIAN_VOUCHER (IdPelanggan, IdVoucher, TglAkhir);
@@ -1,70 +1,281 @@
--- fungsi trigger_pengembalian_saldo
-CREATE OR REPLACE FUNCTION trigger_pengembalian_saldo()
-RETURNS TRIGGER AS $$
+-- Handler refund pembatalan, dipanggil dispatch_status_pesanan
+-- (TRIGGER_MERAH.sql) hanya untuk status 'Pemesanan Dibatalkan'. Id status dan
+-- kategori diambil dispatcher dari KONFIGURASI_STATUS.
+CREATE OR REPLACE FUNCTION refund_pembatalan(
+    p_pesanan UUID,
+    p_tgl TIMESTAMP,
+    p_status_mencari UUID,
+    p_kategori_refund UUID
+)
+RETURNS VOID AS $$
 DECLARE
     v_id_pelanggan UUID;
     v_nominal DECIMAL;
-    v_status_dibatalkan UUID;
-    v_status_mencari UUID;
     v_latest_status UUID;
-    v_kategori_refund UUID;
 BEGIN
-    -- Ambil ID status 'Pemesanan Dibatalkan'
-    SELECT Id INTO v_status_dibatalkan
-    FROM STATUS_PEMESANAN
-    WHERE Status = 'Pemesanan Dibatalkan'
-    LIMIT 1;
-
-    -- Ambil ID status 'Mencari Pekerja Terdekat'
-    SELECT Id INTO v_status_mencari
-    FROM STATUS_PEMESANAN
-    WHERE Status = 'Mencari Pekerja Terdekat'
-    LIMIT 1;
-
-    -- Ambil ID kategori 'Refund'
-    SELECT Id INTO v_kategori_refund
-    FROM KATEGORI_TR_MYPAY
-    WHERE Nama = 'Refund'
-    LIMIT 1;
-
-    -- Periksa apakah NEW.IdStatus adalah 'Pemesanan Dibatalkan'
-    IF NEW.IdStatus = v_status_dibatalkan THEN
-        -- Ambil status terakhir sebelum insert
+    -- Status sebelum insert ini: dispatcher berjalan sebelum trg_status_terkini
+    -- sehingga proyeksi masih memuat status sebelumnya
+    SELECT IdStatus INTO v_latest_status
+    FROM TR_PEMESANAN_STATUS_TERKINI
+    WHERE IdTrPemesanan = p_pesanan
+      AND TglWaktu < p_tgl;
+
+    IF NOT FOUND THEN
+        -- Status disisipkan mundur (lebih lama dari status terkini)
         SELECT IdStatus INTO v_latest_status
         FROM TR_PEMESANAN_STATUS
-        WHERE IdTrPemesanan = NEW.IdTrPemesanan
-        AND TglWaktu < NEW.TglWaktu
+        WHERE IdTrPemesanan = p_pesanan
+        AND TglWaktu < p_tgl
         ORDER BY TglWaktu DESC
         LIMIT 1;
+    END IF;
+
+    -- Jika status terakhir adalah 'Mencari Pekerja Terdekat'
+    IF v_latest_status = p_status_mencari THEN
+        -- Ambil informasi terkait pesanan
+        SELECT IdPelanggan, TotalBiaya
+        INTO v_id_pelanggan, v_nominal
+        FROM TR_PEMESANAN_JASA
+        WHERE Id = p_pesanan;
+
+        -- Kembalikan saldo ke pelanggan (kredit_dompet, lihat TRIGGER_MERAH.sql)
+        PERFORM kredit_dompet(v_id_pelanggan, v_nominal);
+
+        -- Insert transaksi refund ke TR_MYPAY
+        INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
+        VALUES (uuid_generate_v4(), v_id_pelanggan, NOW(), v_nominal, p_kategori_refund);
+    ELSE
+        RAISE EXCEPTION 'Pesanan tidak dapat dibatalkan karena tidak dalam status "Mencari Pekerja Terdekat".';
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Peringkat pekerja per kategori jasa
+-- Salinan (Rating, JmlPesananSelesai) per pasangan kategori-pekerja yang dijaga
+-- trigger, sehingga halaman subkategori cukup membaca K baris teratas lewat
+-- indeks alih-alih mengurutkan seluruh pekerja kategori pada setiap request.
+CREATE TABLE IF NOT EXISTS PERINGKAT_PEKERJA (
+    KategoriJasaId UUID NOT NULL REFERENCES KATEGORI_JASA(Id) ON DELETE CASCADE,
+    PekerjaId UUID NOT NULL REFERENCES PEKERJA(Id) ON DELETE CASCADE,
+    Rating NUMERIC NOT NULL DEFAULT 0,
+    JmlPesananSelesai INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (KategoriJasaId, PekerjaId)
+);
+
+CREATE INDEX IF NOT EXISTS idx_peringkat_pekerja_topk
+ON PERINGKAT_PEKERJA (KategoriJasaId, Rating DESC, JmlPesananSelesai DESC, PekerjaId DESC);
+
+CREATE INDEX IF NOT EXISTS idx_peringkat_pekerja_pekerja
+ON PERINGKAT_PEKERJA (PekerjaId);
+
+-- Pekerja bergabung/keluar dari kategori jasa
+CREATE OR REPLACE FUNCTION sinkron_peringkat_kategori()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        DELETE FROM PERINGKAT_PEKERJA
+        WHERE KategoriJasaId = OLD.KategoriJasaId AND PekerjaId = OLD.PekerjaId;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO PERINGKAT_PEKERJA (KategoriJasaId, PekerjaId, Rating, JmlPesananSelesai)
+        SELECT NEW.KategoriJasaId, p.Id, COALESCE(p.Rating, 0), COALESCE(p.JmlPesananSelesai, 0)
+        FROM PEKERJA p
+        WHERE p.Id = NEW.PekerjaId
+        ON CONFLICT (KategoriJasaId, PekerjaId) DO NOTHING;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_peringkat_kategori ON PEKERJA_KATEGORI_JASA;
+CREATE TRIGGER trg_peringkat_kategori
+AFTER INSERT OR UPDATE OR DELETE ON PEKERJA_KATEGORI_JASA
+FOR EACH ROW
+EXECUTE FUNCTION sinkron_peringkat_kategori();
+
+-- Rating atau jumlah pesanan selesai pekerja berubah
+CREATE OR REPLACE FUNCTION sinkron_peringkat_pekerja()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE PERINGKAT_PEKERJA
+    SET Rating = COALESCE(NEW.Rating, 0),
+        JmlPesananSelesai = COALESCE(NEW.JmlPesananSelesai, 0)
+    WHERE PekerjaId = NEW.Id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_peringkat_pekerja ON PEKERJA;
+CREATE TRIGGER trg_peringkat_pekerja
+AFTER UPDATE OF Rating, JmlPesananSelesai ON PEKERJA
+FOR EACH ROW
+WHEN (OLD.Rating IS DISTINCT FROM NEW.Rating
+      OR OLD.JmlPesananSelesai IS DISTINCT FROM NEW.JmlPesananSelesai)
+EXECUTE FUNCTION sinkron_peringkat_pekerja();
+
+-- Backfill dari data yang sudah ada (aman dijalankan ulang,
+-- sama dengan `python manage.py rebuild_peringkat_pekerja`)
+INSERT INTO PERINGKAT_PEKERJA (KategoriJasaId, PekerjaId, Rating, JmlPesananSelesai)
+SELECT pkj.KategoriJasaId, p.Id, COALESCE(p.Rating, 0), COALESCE(p.JmlPesananSelesai, 0)
+FROM PEKERJA_KATEGORI_JASA pkj
+JOIN PEKERJA p ON p.Id = pkj.PekerjaId
+ON CONFLICT (KategoriJasaId, PekerjaId) DO UPDATE
+SET Rating = EXCLUDED.Rating,
+    JmlPesananSelesai = EXCLUDED.JmlPesananSelesai;
+
+
+-- Agregasi rating dari TESTIMONI
+-- Jumlah dan total rating per pekerja dan per subkategori dijaga secara
+-- inkremental oleh trigger, sehingga rata-rata cukup dibaca dari satu baris
+-- tanpa AVG atas seluruh riwayat testimoni. PEKERJA.Rating ikut diperbarui
+-- (dan lewat trg_peringkat_pekerja, PERINGKAT_PEKERJA juga).
+CREATE TABLE IF NOT EXISTS RATING_PEKERJA (
+    PekerjaId UUID PRIMARY KEY REFERENCES PEKERJA(Id) ON DELETE CASCADE,
+    JumlahRating BIGINT NOT NULL DEFAULT 0,
+    TotalRating BIGINT NOT NULL DEFAULT 0
+);
+
+-- Bintang1..Bintang5: histogram jumlah testimoni per nilai rating
+CREATE TABLE IF NOT EXISTS RATING_SUBKATEGORI (
+    SubKategoriId UUID PRIMARY KEY REFERENCES SUBKATEGORI_JASA(Id) ON DELETE CASCADE,
+    JumlahRating BIGINT NOT NULL DEFAULT 0,
+    TotalRating BIGINT NOT NULL DEFAULT 0,
+    Bintang1 BIGINT NOT NULL DEFAULT 0,
+    Bintang2 BIGINT NOT NULL DEFAULT 0,
+    Bintang3 BIGINT NOT NULL DEFAULT 0,
+    Bintang4 BIGINT NOT NULL DEFAULT 0,
+    Bintang5 BIGINT NOT NULL DEFAULT 0
+);
+
+-- Untuk basis data yang sudah memiliki RATING_SUBKATEGORI tanpa histogram
+ALTER TABLE RATING_SUBKATEGORI
+    ADD COLUMN IF NOT EXISTS Bintang1 BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS Bintang2 BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS Bintang3 BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS Bintang4 BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS Bintang5 BIGINT NOT NULL DEFAULT 0;
+
+-- p_arah: 1 saat testimoni ditambahkan, -1 saat dihapus
+DROP FUNCTION IF EXISTS terapkan_delta_rating(UUID, UUID, INT, INT);
+CREATE OR REPLACE FUNCTION terapkan_delta_rating(
+    p_pekerja UUID, p_subkategori UUID, p_arah INT, p_rating INT
+) RETURNS VOID AS $$
+DECLARE
+    v_jumlah BIGINT;
+    v_total BIGINT;
+BEGIN
+    IF p_subkategori IS NOT NULL THEN
+        INSERT INTO RATING_SUBKATEGORI (
+            SubKategoriId, JumlahRating, TotalRating,
+            Bintang1, Bintang2, Bintang3, Bintang4, Bintang5
+        )
+        VALUES (
+            p_subkategori, p_arah, p_arah * p_rating,
+            CASE WHEN p_rating = 1 THEN p_arah ELSE 0 END,
+            CASE WHEN p_rating = 2 THEN p_arah ELSE 0 END,
+            CASE WHEN p_rating = 3 THEN p_arah ELSE 0 END,
+            CASE WHEN p_rating = 4 THEN p_arah ELSE 0 END,
+            CASE WHEN p_rating = 5 THEN p_arah ELSE 0 END
+        )
+        ON CONFLICT (SubKategoriId) DO UPDATE
+        SET JumlahRating = RATING_SUBKATEGORI.JumlahRating + EXCLUDED.JumlahRating,
+            TotalRating = RATING_SUBKATEGORI.TotalRating + EXCLUDED.TotalRating,
+            Bintang1 = RATING_SUBKATEGORI.Bintang1 + EXCLUDED.Bintang1,
+            Bintang2 = RATING_SUBKATEGORI.Bintang2 + EXCLUDED.Bintang2,
+            Bintang3 = RATING_SUBKATEGORI.Bintang3 + EXCLUDED.Bintang3,
+            Bintang4 = RATING_SUBKATEGORI.Bintang4 + EXCLUDED.Bintang4,
+            Bintang5 = RATING_SUBKATEGORI.Bintang5 + EXCLUDED.Bintang5;
+    END IF;
+
+    IF p_pekerja IS NOT NULL THEN
+        INSERT INTO RATING_PEKERJA (PekerjaId, JumlahRating, TotalRating)
+        VALUES (p_pekerja, p_arah, p_arah * p_rating)
+        ON CONFLICT (PekerjaId) DO UPDATE
+        SET JumlahRating = RATING_PEKERJA.JumlahRating + EXCLUDED.JumlahRating,
+            TotalRating = RATING_PEKERJA.TotalRating + EXCLUDED.TotalRating
+        RETURNING JumlahRating, TotalRating INTO v_jumlah, v_total;
+
+        UPDATE PEKERJA
+        SET Rating = CASE WHEN v_jumlah > 0 THEN ROUND(v_total::NUMERIC / v_jumlah, 2) ELSE 0 END
+        WHERE Id = p_pekerja;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION agregasi_rating_testimoni()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_pekerja UUID;
+    v_subkategori UUID;
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        SELECT IdPekerja, IdKategoriJasa INTO v_pekerja, v_subkategori
+        FROM TR_PEMESANAN_JASA WHERE Id = OLD.IdTrPemesanan;
+        PERFORM terapkan_delta_rating(v_pekerja, v_subkategori, -1, OLD.Rating);
+    END IF;
 
-        -- Jika status terakhir adalah 'Mencari Pekerja Terdekat'
-        IF v_latest_status = v_status_mencari THEN
-            -- Ambil informasi terkait pesanan
-            SELECT IdPelanggan, TotalBiaya
-            INTO v_id_pelanggan, v_nominal
-            FROM TR_PEMESANAN_JASA
-            WHERE Id = NEW.IdTrPemesanan;
-
-            -- Kembalikan saldo ke pelanggan
-            UPDATE "USER"
-            SET SaldoMyPay = SaldoMyPay + v_nominal
-            WHERE Id = v_id_pelanggan;
-
-            -- Insert transaksi refund ke TR_MYPAY
-            INSERT INTO TR_MYPAY (Id, UserId, Tgl, Nominal, KategoriId)
-            VALUES (uuid_generate_v4(), v_id_pelanggan, NOW(), v_nominal, v_kategori_refund);
-        ELSE
-            RAISE EXCEPTION 'Pesanan tidak dapat dibatalkan karena tidak dalam status "Mencari Pekerja Terdekat".';
-        END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT IdPekerja, IdKategoriJasa INTO v_pekerja, v_subkategori
+        FROM TR_PEMESANAN_JASA WHERE Id = NEW.IdTrPemesanan;
+        PERFORM terapkan_delta_rating(v_pekerja, v_subkategori, 1, NEW.Rating);
     END IF;
 
-    RETURN NEW;
+    RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 
--- Membuat ulang trigger tanpa kondisi WHEN
-DROP TRIGGER IF EXISTS after_status_dibatalkan ON TR_PEMESANAN_STATUS;
-CREATE TRIGGER after_status_dibatalkan
-AFTER INSERT ON TR_PEMESANAN_STATUS
+DROP TRIGGER IF EXISTS trg_agregasi_rating ON TESTIMONI;
+CREATE TRIGGER trg_agregasi_rating
+AFTER INSERT OR DELETE OR UPDATE OF Rating, IdTrPemesanan ON TESTIMONI
 FOR EACH ROW
-EXECUTE FUNCTION trigger_pengembalian_saldo();
\ No newline at end of file
+EXECUTE FUNCTION agregasi_rating_testimoni();
+
+-- Backfill dari testimoni yang sudah ada (aman dijalankan ulang,
+-- sama dengan `python manage.py rebuild_rating`)
+INSERT INTO RATING_SUBKATEGORI (
+    SubKategoriId, JumlahRating, TotalRating,
+    Bintang1, Bintang2, Bintang3, Bintang4, Bintang5
+)
+SELECT tpj.IdKategoriJasa, COUNT(*), SUM(t.Rating),
+       COUNT(*) FILTER (WHERE t.Rating = 1),
+       COUNT(*) FILTER (WHERE t.Rating = 2),
+       COUNT(*) FILTER (WHERE t.Rating = 3),
+       COUNT(*) FILTER (WHERE t.Rating = 4),
+       COUNT(*) FILTER (WHERE t.Rating = 5)
+FROM TESTIMONI t
+JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
+GROUP BY tpj.IdKategoriJasa
+ON CONFLICT (SubKategoriId) DO UPDATE
+SET JumlahRating = EXCLUDED.JumlahRating,
+    TotalRating = EXCLUDED.TotalRating,
+    Bintang1 = EXCLUDED.Bintang1,
+    Bintang2 = EXCLUDED.Bintang2,
+    Bintang3 = EXCLUDED.Bintang3,
+    Bintang4 = EXCLUDED.Bintang4,
+    Bintang5 = EXCLUDED.Bintang5;
+
+INSERT INTO RATING_PEKERJA (PekerjaId, JumlahRating, TotalRating)
+SELECT tpj.IdPekerja, COUNT(*), SUM(t.Rating)
+FROM TESTIMONI t
+JOIN TR_PEMESANAN_JASA tpj ON t.IdTrPemesanan = tpj.Id
+WHERE tpj.IdPekerja IS NOT NULL
+GROUP BY tpj.IdPekerja
+ON CONFLICT (PekerjaId) DO UPDATE
+SET JumlahRating = EXCLUDED.JumlahRating,
+    TotalRating = EXCLUDED.TotalRating;
+
+UPDATE PEKERJA p
+SET Rating = ROUND(rp.TotalRating::NUMERIC / rp.JumlahRating, 2)
+FROM RATING_PEKERJA rp
+WHERE p.Id = rp.PekerjaId AND rp.JumlahRating > 0;
+
+
+-- Feed testimoni per subkategori (keyset pada (Tgl, IdTrPemesanan), terbaru lebih dulu)
+CREATE INDEX IF NOT EXISTS idx_testimoni_tgl
+ON TESTIMONI (Tgl DESC, IdTrPemesanan DESC);
+
+CREATE INDEX IF NOT EXISTS idx_pemesanan_jasa_subkategori
+ON TR_PEMESANAN_JASA (IdKategoriJasa, Id);
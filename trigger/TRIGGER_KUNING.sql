@@ -16,8 +16,10 @@ $$
 LANGUAGE plpgsql;
 
 -- Membuat trigger untuk memanggil function sebelum insert data ke tabel USER
+-- (update hanya bila NoHP ikut diubah)
+DROP TRIGGER IF EXISTS check_user_phone ON "USER";
 CREATE TRIGGER check_user_phone
-BEFORE INSERT OR UPDATE ON "USER"
+BEFORE INSERT OR UPDATE OF NoHP ON "USER"
 FOR EACH ROW
 EXECUTE FUNCTION check_user_phone();
 
@@ -41,8 +43,10 @@ $$
 LANGUAGE plpgsql;
 
 -- trigger untuk check_worker_bank
+-- Hanya saat kolom bank berubah, agar update Rating/JmlPesananSelesai tidak ikut dicek
+DROP TRIGGER IF EXISTS check_worker_bank ON PEKERJA;
 CREATE TRIGGER check_worker_bank
-BEFORE INSERT OR UPDATE ON PEKERJA
+BEFORE INSERT OR UPDATE OF NamaBank, NomorRekening ON PEKERJA
 FOR EACH ROW
 EXECUTE FUNCTION check_worker_bank();
 
@@ -63,7 +67,8 @@ END;
 $$
 LANGUAGE plpgsql;
 
+DROP TRIGGER IF EXISTS check_worker_npwp ON PEKERJA;
 CREATE TRIGGER check_worker_npwp
-BEFORE INSERT OR UPDATE ON PEKERJA
+BEFORE INSERT OR UPDATE OF NPWP ON PEKERJA
 FOR EACH ROW
 EXECUTE FUNCTION check_worker_npwp();
\ No newline at end of file
@@ -1,56 +1,364 @@
 -- Trigger Nomor 4 (Merah)
--- Membuat Stored Procedure yang akan dijalankan ketika ada trigger
-CREATE OR REPLACE FUNCTION proses_pembayaran_pekerja() 
+
+-- Baris data referensi yang dibutuhkan dispatcher status (bagian akhir file
+-- ini), atau NULL bila semuanya ada
+CREATE OR REPLACE FUNCTION referensi_dispatch_hilang()
+RETURNS TEXT AS $$
+    SELECT string_agg(format('%s ''%s''', r.tabel, r.nama), ', ')
+    FROM (VALUES
+        ('STATUS_PEMESANAN', 'Mencari Pekerja Terdekat'),
+        ('STATUS_PEMESANAN', 'Pemesanan Selesai'),
+        ('STATUS_PEMESANAN', 'Pemesanan Dibatalkan'),
+        ('KATEGORI_TR_MYPAY', 'Refund')
+    ) AS r(tabel, nama)
+    WHERE NOT EXISTS (SELECT 1 FROM STATUS_PEMESANAN WHERE r.tabel = 'STATUS_PEMESANAN' AND Status = r.nama)
+      AND NOT EXISTS (SELECT 1 FROM KATEGORI_TR_MYPAY WHERE r.tabel = 'KATEGORI_TR_MYPAY' AND Nama = r.nama);
+$$ LANGUAGE sql STABLE;
+
+-- Dicek sebelum apa pun diubah agar skrip tidak berhenti di tengah jalan
+DO $$
+DECLARE
+    v_hilang TEXT := referensi_dispatch_hilang();
+BEGIN
+    IF v_hilang IS NOT NULL THEN
+        RAISE EXCEPTION 'TRIGGER_MERAH.sql dibatalkan: data referensi tidak ditemukan: %.', v_hilang
+            USING HINT = 'Isi STATUS_PEMESANAN dan KATEGORI_TR_MYPAY terlebih dahulu.';
+    END IF;
+END $$;
+
+-- Honor pekerja diselesaikan secara batch. Di dalam request perubahan status
+-- trigger hanya mengantrekan pesanan yang selesai; `python manage.py
+-- settle_payouts` (merah.payouts) mencatat tr_mypay dengan satu insert
+-- multi-baris dan menambah saldo sekali per pekerja per batch.
+CREATE TABLE IF NOT EXISTS ANTREAN_HONOR (
+    IdTrPemesanan UUID PRIMARY KEY REFERENCES TR_PEMESANAN_JASA(Id) ON DELETE CASCADE,
+    Urutan BIGSERIAL NOT NULL,
+    PekerjaId UUID NOT NULL REFERENCES PEKERJA(Id),
+    Nominal DECIMAL NOT NULL,
+    TglSelesai TIMESTAMP NOT NULL,
+    -- NULL = belum dibayar; diisi pada transaksi yang sama dengan ledger
+    TglDibayar TIMESTAMP
+);
+
+-- Checkpoint batch: antrean yang belum dibayar, urut masuk
+CREATE INDEX IF NOT EXISTS idx_antrean_honor_belum_dibayar
+ON ANTREAN_HONOR (Urutan)
+WHERE TglDibayar IS NULL;
+
+-- Handler honor, dipanggil dispatch_status_pesanan hanya untuk status
+-- 'Pemesanan Selesai': antrekan sekali per pesanan, tanpa pekerja dilewati
+CREATE OR REPLACE FUNCTION antrekan_honor(p_pesanan UUID, p_tgl TIMESTAMP)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO ANTREAN_HONOR (IdTrPemesanan, PekerjaId, Nominal, TglSelesai)
+    SELECT tj.id, tj.idpekerja, tj.totalbiaya, p_tgl
+    FROM tr_pemesanan_jasa tj
+    WHERE tj.id = p_pesanan AND tj.idpekerja IS NOT NULL
+    ON CONFLICT (IdTrPemesanan) DO NOTHING;
+END;
+$$ LANGUAGE plpgsql;
+
+
+
+-- Proyeksi status terkini (current_status) per pesanan
+-- Menyimpan satu baris per pesanan berisi status dan waktu status terakhir,
+-- sehingga view cukup JOIN dengan indeks alih-alih subquery MAX(TglWaktu)
+-- atau ORDER BY TglWaktu DESC LIMIT 1 atas seluruh riwayat status.
+CREATE TABLE IF NOT EXISTS TR_PEMESANAN_STATUS_TERKINI (
+    IdTrPemesanan UUID PRIMARY KEY REFERENCES TR_PEMESANAN_JASA(Id) ON DELETE CASCADE,
+    IdStatus UUID NOT NULL REFERENCES STATUS_PEMESANAN(Id),
+    TglWaktu TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_status_terkini_status
+ON TR_PEMESANAN_STATUS_TERKINI (IdStatus, IdTrPemesanan);
+
+-- Mempercepat backfill dan pencarian status sebelumnya di riwayat
+CREATE INDEX IF NOT EXISTS idx_pemesanan_status_riwayat
+ON TR_PEMESANAN_STATUS (IdTrPemesanan, TglWaktu DESC);
+
+CREATE OR REPLACE FUNCTION perbarui_status_terkini()
 RETURNS TRIGGER AS $$
+BEGIN
+    -- Hanya menimpa bila status baru tidak lebih lama dari yang tersimpan
+    INSERT INTO TR_PEMESANAN_STATUS_TERKINI (IdTrPemesanan, IdStatus, TglWaktu)
+    VALUES (NEW.IdTrPemesanan, NEW.IdStatus, NEW.TglWaktu)
+    ON CONFLICT (IdTrPemesanan) DO UPDATE
+    SET IdStatus = EXCLUDED.IdStatus,
+        TglWaktu = EXCLUDED.TglWaktu
+    WHERE TR_PEMESANAN_STATUS_TERKINI.TglWaktu <= EXCLUDED.TglWaktu;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_status_terkini ON TR_PEMESANAN_STATUS;
+CREATE TRIGGER trg_status_terkini
+AFTER INSERT ON TR_PEMESANAN_STATUS
+FOR EACH ROW
+EXECUTE FUNCTION perbarui_status_terkini();
+
+-- Backfill dari riwayat yang sudah ada (aman dijalankan ulang,
+-- sama dengan `python manage.py backfill_status_terkini`)
+INSERT INTO TR_PEMESANAN_STATUS_TERKINI (IdTrPemesanan, IdStatus, TglWaktu)
+SELECT DISTINCT ON (IdTrPemesanan) IdTrPemesanan, IdStatus, TglWaktu
+FROM TR_PEMESANAN_STATUS
+ORDER BY IdTrPemesanan, TglWaktu DESC
+ON CONFLICT (IdTrPemesanan) DO UPDATE
+SET IdStatus = EXCLUDED.IdStatus,
+    TglWaktu = EXCLUDED.TglWaktu
+WHERE TR_PEMESANAN_STATUS_TERKINI.TglWaktu <= EXCLUDED.TglWaktu;
+
+-- Keyset pagination papan pekerjaan (pekerjaan_jasa) pada (TglPemesanan, Id)
+CREATE INDEX IF NOT EXISTS idx_pemesanan_jasa_tgl_id
+ON TR_PEMESANAN_JASA (TglPemesanan DESC, Id DESC);
+
+-- Riwayat MyPay per pengguna (keyset pagination dan saldo berjalan) pada (UserId, Tgl, Id)
+CREATE INDEX IF NOT EXISTS idx_tr_mypay_user_tgl
+ON TR_MYPAY (UserId, Tgl DESC, Id DESC);
+
+-- Dompet MyPay
+-- Saldo disimpan terpisah dari baris "USER" sehingga perubahan saldo tidak
+-- menulis ulang baris profil, tidak antre dengan edit profil/login, dan tidak
+-- memicu check_user_phone. Akun yang sangat ramai (mis. pekerja yang menerima
+-- banyak honor sekaligus) dapat diberi beberapa sub-saldo (DOMPET_SLOT):
+-- kredit masuk ke slot acak, debit mengunci saldo utama lalu melipat seluruh
+-- slot ke dalamnya. Saldo = DOMPET.Saldo + SUM(DOMPET_SLOT.Saldo).
+CREATE TABLE IF NOT EXISTS DOMPET (
+    UserId UUID PRIMARY KEY REFERENCES "USER"(Id) ON DELETE CASCADE,
+    Saldo DECIMAL NOT NULL DEFAULT 0,
+    JumlahSlot SMALLINT NOT NULL DEFAULT 1 CHECK (JumlahSlot BETWEEN 1 AND 64)
+);
+
+CREATE TABLE IF NOT EXISTS DOMPET_SLOT (
+    UserId UUID NOT NULL REFERENCES DOMPET(UserId) ON DELETE CASCADE,
+    Slot SMALLINT NOT NULL,
+    Saldo DECIMAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (UserId, Slot)
+);
+
+-- Pindahkan saldo lama dari "USER".SaldoMyPay (hanya sekali)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'USER' AND column_name = 'saldomypay'
+    ) THEN
+        INSERT INTO DOMPET (UserId, Saldo)
+        SELECT Id, COALESCE(SaldoMyPay, 0) FROM "USER"
+        ON CONFLICT (UserId) DO NOTHING;
+        ALTER TABLE "USER" DROP COLUMN SaldoMyPay;
+    END IF;
+END $$;
+
+INSERT INTO DOMPET (UserId)
+SELECT Id FROM "USER"
+ON CONFLICT (UserId) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION buat_dompet()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO DOMPET (UserId) VALUES (NEW.Id)
+    ON CONFLICT (UserId) DO NOTHING;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_buat_dompet ON "USER";
+CREATE TRIGGER trg_buat_dompet
+AFTER INSERT ON "USER"
+FOR EACH ROW
+EXECUTE FUNCTION buat_dompet();
+
+CREATE OR REPLACE FUNCTION saldo_dompet(p_user UUID)
+RETURNS DECIMAL AS $$
+    SELECT COALESCE((SELECT Saldo FROM DOMPET WHERE UserId = p_user), 0)
+         + COALESCE((SELECT SUM(Saldo) FROM DOMPET_SLOT WHERE UserId = p_user), 0)
+$$ LANGUAGE sql STABLE;
+
+-- Tambah saldo; mengembalikan saldo baru
+CREATE OR REPLACE FUNCTION kredit_dompet(p_user UUID, p_nominal DECIMAL)
+RETURNS DECIMAL AS $$
 DECLARE
-    v_total_biaya DECIMAL;
-    v_id_pekerja UUID;
-    v_kategori_tr UUID;
-    status_name VARCHAR;
+    v_jumlah_slot SMALLINT;
 BEGIN
-    -- Ambil nama status dari tabel status_pemesanan berdasarkan idstatus baru
-    SELECT status INTO status_name 
-    FROM status_pemesanan 
-    WHERE id = NEW.idstatus;
+    SELECT JumlahSlot INTO v_jumlah_slot FROM DOMPET WHERE UserId = p_user;
 
-    RAISE NOTICE 'Status name: %', status_name;
+    IF v_jumlah_slot IS NULL THEN
+        -- Pengguna yang dibuat saat trigger dinonaktifkan
+        INSERT INTO DOMPET (UserId, Saldo) VALUES (p_user, p_nominal)
+        ON CONFLICT (UserId) DO UPDATE SET Saldo = DOMPET.Saldo + EXCLUDED.Saldo;
+    ELSIF v_jumlah_slot = 1 THEN
+        UPDATE DOMPET SET Saldo = Saldo + p_nominal WHERE UserId = p_user;
+    ELSE
+        -- Slot acak agar kredit bersamaan tidak antre pada satu baris
+        INSERT INTO DOMPET_SLOT (UserId, Slot, Saldo)
+        VALUES (p_user, floor(random() * v_jumlah_slot)::SMALLINT, p_nominal)
+        ON CONFLICT (UserId, Slot) DO UPDATE SET Saldo = DOMPET_SLOT.Saldo + EXCLUDED.Saldo;
+    END IF;
 
-    -- Jika status adalah 'Pemesanan Selesai', lanjutkan proses pembayaran
-    IF status_name = 'Pemesanan Selesai' THEN
-        -- Ambil total biaya dan id pekerja dari tr_pemesanan_jasa berdasarkan idtrpemesanan
-        SELECT tj.totalbiaya, tj.idpekerja INTO v_total_biaya, v_id_pekerja
-        FROM tr_pemesanan_jasa tj
-        WHERE tj.id = NEW.idtrpemesanan;
+    RETURN saldo_dompet(p_user);
+END;
+$$ LANGUAGE plpgsql;
 
-        RAISE NOTICE 'Total Biaya: %, ID Pekerja: %', v_total_biaya, v_id_pekerja;
+-- Kurangi saldo bila cukup; mengembalikan saldo baru, atau NULL bila tidak cukup
+CREATE OR REPLACE FUNCTION debit_dompet(p_user UUID, p_nominal DECIMAL)
+RETURNS DECIMAL AS $$
+DECLARE
+    v_saldo DECIMAL;
+    v_lipat DECIMAL;
+BEGIN
+    -- NO KEY UPDATE: kredit ke slot (cek FK memakai KEY SHARE) tidak ikut menunggu
+    SELECT Saldo INTO v_saldo FROM DOMPET WHERE UserId = p_user FOR NO KEY UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
 
-        -- Ambil id kategori transaksi dari kategori_tr_mypay
-        SELECT id INTO v_kategori_tr
-        FROM kategori_tr_mypay
-        WHERE nama = 'Menerima Honor';
+    WITH lipat AS (
+        DELETE FROM DOMPET_SLOT WHERE UserId = p_user RETURNING Saldo
+    )
+    SELECT COALESCE(SUM(Saldo), 0) INTO v_lipat FROM lipat;
+    v_saldo := v_saldo + v_lipat;
 
-        RAISE NOTICE 'Kategori Transaksi ID: %', v_kategori_tr;
+    IF v_saldo < p_nominal THEN
+        IF v_lipat <> 0 THEN
+            UPDATE DOMPET SET Saldo = v_saldo WHERE UserId = p_user;
+        END IF;
+        RETURN NULL;
+    END IF;
 
-        -- Masukkan transaksi ke tr_mypay
-        INSERT INTO tr_mypay (id, userid, tgl, nominal, kategoriid)
-        VALUES (gen_random_uuid(), v_id_pekerja, CURRENT_DATE, v_total_biaya, v_kategori_tr);
+    UPDATE DOMPET SET Saldo = v_saldo - p_nominal WHERE UserId = p_user;
+    RETURN v_saldo - p_nominal;
+END;
+$$ LANGUAGE plpgsql;
 
-        RAISE NOTICE 'Inserted transaksi ke tr_mypay';
+-- Dispatcher status pesanan
+-- Satu trigger menggantikan after_status_dibatalkan dan trg_status_update.
+-- WHEN memakai id status yang di-inline saat trigger dibuat, sehingga status
+-- lain (mayoritas insert) tidak memanggil fungsi sama sekali. Id status dan
+-- kategori yang dibutuhkan handler dibaca dari satu baris KONFIGURASI_STATUS
+-- alih-alih dicari berdasarkan nama setiap kali trigger berjalan. Keduanya
+-- dibangun ulang oleh muat_konfigurasi_status setiap kali STATUS_PEMESANAN
+-- atau KATEGORI_TR_MYPAY berubah.
+CREATE TABLE IF NOT EXISTS KONFIGURASI_STATUS (
+    Id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (Id),
+    IdStatusMencari UUID NOT NULL REFERENCES STATUS_PEMESANAN(Id),
+    IdStatusSelesai UUID NOT NULL REFERENCES STATUS_PEMESANAN(Id),
+    IdStatusDibatalkan UUID NOT NULL REFERENCES STATUS_PEMESANAN(Id),
+    IdKategoriRefund UUID NOT NULL REFERENCES KATEGORI_TR_MYPAY(Id)
+);
 
-        -- Update saldo MyPay pekerja
-        UPDATE "USER"
-        SET saldomypay = saldomypay + v_total_biaya
-        WHERE id = v_id_pekerja;
+CREATE OR REPLACE FUNCTION dispatch_status_pesanan()
+RETURNS TRIGGER AS $$
+DECLARE
+    k KONFIGURASI_STATUS%ROWTYPE;
+BEGIN
+    SELECT * INTO k FROM KONFIGURASI_STATUS;
+    IF NOT FOUND THEN
+        -- Data referensi tidak lengkap: trigger berjalan tanpa WHEN dan
+        -- menolak perubahan status daripada melewatkan honor/refund
+        RAISE EXCEPTION 'Status pesanan tidak dapat diproses: data referensi tidak ditemukan: %.',
+            COALESCE(referensi_dispatch_hilang(), 'KONFIGURASI_STATUS')
+            USING HINT = 'Lengkapi STATUS_PEMESANAN dan KATEGORI_TR_MYPAY lalu jalankan SELECT muat_konfigurasi_status();';
+    END IF;
 
-        RAISE NOTICE 'Updated SaldoMyPay untuk pekerja_id: %', v_id_pekerja;
+    IF NEW.IdStatus = k.IdStatusSelesai THEN
+        PERFORM antrekan_honor(NEW.IdTrPemesanan, NEW.TglWaktu);
+    ELSIF NEW.IdStatus = k.IdStatusDibatalkan THEN
+        PERFORM refund_pembatalan(NEW.IdTrPemesanan, NEW.TglWaktu, k.IdStatusMencari, k.IdKategoriRefund);
     END IF;
 
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+-- Isi ulang KONFIGURASI_STATUS dari data referensi dan buat ulang
+-- trg_status_dispatch dengan id terbaru di WHEN (tidak melakukan apa pun bila
+-- tidak ada yang berubah). Bila ada baris yang hilang, p_wajib = TRUE raise;
+-- selain itu konfigurasi dikosongkan dan trigger dibuat tanpa WHEN sehingga
+-- dispatch_status_pesanan menolak perubahan status sampai data lengkap lagi.
+-- Nama trigger sengaja berurutan sebelum trg_status_terkini (trigger untuk
+-- event yang sama dijalankan urut nama) agar handler masih melihat status
+-- sebelumnya di TR_PEMESANAN_STATUS_TERKINI.
+CREATE OR REPLACE FUNCTION muat_konfigurasi_status(p_wajib BOOLEAN DEFAULT TRUE)
+RETURNS VOID AS $$
+DECLARE
+    v_hilang TEXT := referensi_dispatch_hilang();
+    v_lama KONFIGURASI_STATUS%ROWTYPE;
+    v_baru KONFIGURASI_STATUS%ROWTYPE;
+    v_when TEXT := '';
+BEGIN
+    IF v_hilang IS NOT NULL THEN
+        IF p_wajib THEN
+            RAISE EXCEPTION 'Konfigurasi dispatcher status tidak dapat dibuat: data referensi tidak ditemukan: %.', v_hilang
+                USING HINT = 'Isi STATUS_PEMESANAN dan KATEGORI_TR_MYPAY lalu jalankan SELECT muat_konfigurasi_status();';
+        END IF;
+        RAISE WARNING 'Data referensi tidak ditemukan: %; perubahan status pesanan ditolak sampai lengkap.', v_hilang;
+        DELETE FROM KONFIGURASI_STATUS;
+    ELSE
+        SELECT TRUE,
+               (SELECT Id FROM STATUS_PEMESANAN WHERE Status = 'Mencari Pekerja Terdekat' ORDER BY Id LIMIT 1),
+               (SELECT Id FROM STATUS_PEMESANAN WHERE Status = 'Pemesanan Selesai' ORDER BY Id LIMIT 1),
+               (SELECT Id FROM STATUS_PEMESANAN WHERE Status = 'Pemesanan Dibatalkan' ORDER BY Id LIMIT 1),
+               (SELECT Id FROM KATEGORI_TR_MYPAY WHERE Nama = 'Refund' ORDER BY Id LIMIT 1)
+        INTO v_baru;
 
-CREATE TRIGGER trg_status_update
-AFTER INSERT ON tr_pemesanan_status
-FOR EACH ROW
-EXECUTE FUNCTION proses_pembayaran_pekerja();
+        SELECT * INTO v_lama FROM KONFIGURASI_STATUS;
+        IF FOUND AND v_lama IS NOT DISTINCT FROM v_baru AND EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = 'tr_pemesanan_status'::regclass AND tgname = 'trg_status_dispatch'
+        ) THEN
+            RETURN;
+        END IF;
+
+        INSERT INTO KONFIGURASI_STATUS (Id, IdStatusMencari, IdStatusSelesai, IdStatusDibatalkan, IdKategoriRefund)
+        VALUES (TRUE, v_baru.IdStatusMencari, v_baru.IdStatusSelesai, v_baru.IdStatusDibatalkan, v_baru.IdKategoriRefund)
+        ON CONFLICT (Id) DO UPDATE
+        SET IdStatusMencari = EXCLUDED.IdStatusMencari,
+            IdStatusSelesai = EXCLUDED.IdStatusSelesai,
+            IdStatusDibatalkan = EXCLUDED.IdStatusDibatalkan,
+            IdKategoriRefund = EXCLUDED.IdKategoriRefund;
+        v_when := format('WHEN (NEW.IdStatus IN (%L::uuid, %L::uuid))', v_baru.IdStatusSelesai, v_baru.IdStatusDibatalkan);
+    END IF;
+
+    DROP TRIGGER IF EXISTS trg_status_dispatch ON TR_PEMESANAN_STATUS;
+    EXECUTE format(
+        'CREATE TRIGGER trg_status_dispatch
+         AFTER INSERT ON TR_PEMESANAN_STATUS
+         FOR EACH ROW
+         %s
+         EXECUTE FUNCTION dispatch_status_pesanan()',
+        v_when
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sinkron_konfigurasi_status()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM muat_konfigurasi_status(FALSE);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Id di WHEN dan KONFIGURASI_STATUS mengikuti perubahan data referensi
+DROP TRIGGER IF EXISTS trg_sinkron_konfigurasi_status ON STATUS_PEMESANAN;
+CREATE TRIGGER trg_sinkron_konfigurasi_status
+AFTER INSERT OR UPDATE OR DELETE ON STATUS_PEMESANAN
+FOR EACH STATEMENT
+EXECUTE FUNCTION sinkron_konfigurasi_status();
+
+DROP TRIGGER IF EXISTS trg_sinkron_konfigurasi_status ON KATEGORI_TR_MYPAY;
+CREATE TRIGGER trg_sinkron_konfigurasi_status
+AFTER INSERT OR UPDATE OR DELETE ON KATEGORI_TR_MYPAY
+FOR EACH STATEMENT
+EXECUTE FUNCTION sinkron_konfigurasi_status();
+
+-- Trigger lama yang digantikan dispatcher; dihapus di sini agar tetap
+-- terpasang bila skrip gagal sebelum dispatcher dibuat
+DROP TRIGGER IF EXISTS after_status_dibatalkan ON TR_PEMESANAN_STATUS;
+DROP FUNCTION IF EXISTS trigger_pengembalian_saldo();
+DROP TRIGGER IF EXISTS trg_status_update ON tr_pemesanan_status;
+DROP FUNCTION IF EXISTS proses_pembayaran_pekerja();
+
+SELECT muat_konfigurasi_status();
@@ -1,7 +1,23 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
 import psycopg2
+import psycopg2.extensions
 from django.conf import settings
 
-def get_db_connection():
+from utils.query_stats import InstrumentedCursor, record_checkout
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no pooled connection became available within the timeout."""
+
+
+def _connect():
     try:
         connection = psycopg2.connect(
             dbname=settings.DATABASES['default']['NAME'],
@@ -9,9 +25,382 @@ def get_db_connection():
             password=settings.DATABASES['default']['PASSWORD'],
             host=settings.DATABASES['default']['HOST'],
             port=settings.DATABASES['default']['PORT'],
-            options="-c search_path=sijarta"
+            options="-c search_path=sijarta",
+            cursor_factory=InstrumentedCursor,
         )
+        record_checkout(connected=True)
         return connection
     except psycopg2.Error as e:
-        print(f"Database connection failed: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Database connection failed: {e}")
+        raise
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections.
+
+    Idle connections are handed out LIFO so the warmest one is reused first,
+    checked for liveness on checkout (a ``SELECT 1`` is only sent when the
+    connection has been idle longer than ``check_interval``), and closed once
+    they have been idle longer than ``max_idle`` while more than ``min_size``
+    connections are open.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, max_idle=300.0,
+                 timeout=30.0, check_interval=30.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("DB pool requires 1 <= max_size and min_size <= max_size.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._idle = []  # list of (connection, released_at)
+        self._size = 0  # open connections, idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn, released_at = self._reserve(deadline)
+            if conn is None:
+                # A slot was reserved for a brand-new connection.
+                try:
+                    return self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+            if self._is_healthy(conn, released_at):
+                return conn
+            logger.warning("Discarding broken pooled database connection.")
+            self._discard(conn)
+
+    def putconn(self, conn):
+        if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                logger.warning("Rollback failed while returning connection to pool.")
+        with self._cond:
+            if conn.closed or self._closed:
+                self._size -= 1
+                self._cond.notify()
+                if not conn.closed:
+                    conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def _reserve(self, deadline):
+        """Pop an idle connection, or reserve a slot for a new one, waiting up to the deadline."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed.")
+                self._evict_idle()
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s "
+                        f"(max_size={self.max_size})."
+                    )
+                self._cond.wait(remaining)
+
+    def _evict_idle(self):
+        # Caller holds self._cond. Oldest idle connections sit at the front.
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            conn.close()
+
+    def _is_healthy(self, conn, released_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        if not conn.closed:
+            conn.close()
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+class PooledConnection:
+    """
+    Handle to a pooled connection that behaves like a psycopg2 connection.
+
+    ``close()`` returns the connection to the pool instead of closing it, and
+    leaving a ``with`` block commits (or rolls back on error) and then releases
+    it, so ``with get_db_connection() as conn:`` never leaks a connection.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self._conn is not None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+
+class ScopedConnection(PooledConnection):
+    """
+    Handle to the connection shared by every query of one request.
+
+    Only the handle that opened the current transaction (the outermost one)
+    commits or rolls it back. A handle that starts querying while another
+    handle's transaction is still open runs inside a ``SAVEPOINT``: its
+    ``commit()`` releases the savepoint, and ``rollback()``, ``close()`` or
+    an error in its ``with`` block only discard its own work, so a helper can
+    never commit or drop the caller's uncommitted writes. Closing a handle
+    keeps the underlying connection checked out for the rest of the request.
+    """
+
+    def __init__(self, scope):
+        super().__init__(scope.pool, scope.connection())
+        self._scope = scope
+        self._savepoint = None
+
+    def cursor(self, *args, **kwargs):
+        conn = self._live()
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # This handle's first statement opens the transaction.
+            self._scope.owner = self
+        elif self._scope.owner is not self and self._savepoint is None:
+            self._savepoint = self._scope.next_savepoint()
+            self._execute(f"SAVEPOINT {self._savepoint}")
+        return conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        conn = self._live()
+        if self._savepoint is not None:
+            savepoint, self._savepoint = self._savepoint, None
+            self._execute(f"RELEASE SAVEPOINT {savepoint}")
+        elif self._owns_transaction(conn):
+            conn.commit()
+
+    def rollback(self):
+        conn = self._live()
+        if self._savepoint is not None:
+            savepoint, self._savepoint = self._savepoint, None
+            self._execute(f"ROLLBACK TO SAVEPOINT {savepoint}; RELEASE SAVEPOINT {savepoint}")
+        elif self._owns_transaction(conn):
+            conn.rollback()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._conn is not None:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+            self._detach()
+        return False
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            if not self._conn.closed and (
+                self._savepoint is not None
+                or self._conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            ):
+                self.rollback()
+        except psycopg2.Error:
+            logger.warning("Rollback failed while closing request-scoped connection.")
+        finally:
+            self._detach()
+
+    def _live(self):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return self._conn
+
+    def _owns_transaction(self, conn):
+        # Nothing uncommitted, or the open transaction was started by this handle.
+        return (
+            conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            or self._scope.owner is self
+        )
+
+    def _execute(self, sql):
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _detach(self):
+        self._conn = None
+        self._savepoint = None
+        if self._scope.owner is self:
+            self._scope.owner = None
+
+
+class RequestScope:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+        # Handle whose first statement opened the current transaction
+        self.owner = None
+        self._savepoints = 0
+
+    def connection(self):
+        if self.conn is None or self.conn.closed:
+            if self.conn is not None:
+                self.pool.putconn(self.conn)
+            self.conn = self.pool.getconn()
+            self.owner = None
+            record_checkout()
+        return self.conn
+
+    def next_savepoint(self):
+        self._savepoints += 1
+        return f"scoped_{self._savepoints}"
+
+    def release(self):
+        self.owner = None
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            self.pool.putconn(conn)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_request_scope = ContextVar('db_request_scope', default=None)
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use (and again after a fork)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                options = getattr(settings, 'DB_POOL', {})
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=options.get('MIN_SIZE', 1),
+                    max_size=options.get('MAX_SIZE', 10),
+                    max_idle=options.get('MAX_IDLE', 300.0),
+                    timeout=options.get('TIMEOUT', 30.0),
+                    check_interval=options.get('CHECK_INTERVAL', 30.0),
+                )
+                _pool_pid = pid
+    return _pool
+
+
+def begin_request_scope():
+    return _request_scope.set(RequestScope(get_pool()))
+
+
+def end_request_scope(token):
+    scope = _request_scope.get()
+    try:
+        if scope is not None:
+            scope.release()
+    finally:
+        _request_scope.reset(token)
+
+
+def get_db_connection():
+    """
+    Return a connection handle.
+
+    Inside a request (see ``utils.middleware.RequestConnectionMiddleware``)
+    every call shares one pooled connection; elsewhere each call checks out
+    its own pooled connection until ``close()`` is called.
+    """
+    scope = _request_scope.get()
+    if scope is not None:
+        return ScopedConnection(scope)
+    pool = get_pool()
+    conn = pool.getconn()
+    record_checkout()
+    return PooledConnection(pool, conn)
+
+
+def run_in_transaction(operation):
+    """
+    Run ``operation(cursor)`` as one transaction on one connection and return
+    its result. Commits on success; rolls back and re-raises if ``operation``
+    raises (including the caller's own validation errors).
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            result = operation(cursor)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def get_dedicated_connection():
+    """
+    Return a pooled connection that is never the request-scoped one, e.g. for
+    a server-side cursor read by a StreamingHttpResponse after the view returns.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    record_checkout()
+    return PooledConnection(pool, conn)
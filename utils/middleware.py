@@ -0,0 +1,102 @@
+# utils/middleware.py
+
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from utils import db_connection, query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class RequestConnectionMiddleware:
+    """
+    Share a single pooled database connection across every query of a request.
+
+    The connection is checked out lazily on the first ``get_db_connection()``
+    call and returned to the pool (rolled back if a transaction was left open)
+    once the response has been produced.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_connection.begin_request_scope()
+        try:
+            return self.get_response(request)
+        finally:
+            db_connection.end_request_scope(token)
+
+
+def _django_query_wrapper(execute, sql, params, many, context):
+    # Query ORM Django (mis. tabel session) ikut dihitung bersama query raw psycopg2
+    stats = query_stats.current_stats()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.record_query(sql, time.perf_counter() - started)
+
+
+class QueryStatsMiddleware:
+    """
+    Count queries, database time, and connection checkouts for each request.
+
+    The totals are added to the response as a ``Server-Timing`` header, and a
+    structured log line is written when the request is slow, runs too many
+    queries, or repeats the same statement (a likely N+1). Thresholds come
+    from ``settings.QUERY_STATS``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, 'QUERY_STATS', {})
+        self.enabled = options.get('ENABLED', True)
+        self.server_timing = options.get('SERVER_TIMING', True)
+        self.slow_request_ms = options.get('SLOW_REQUEST_MS', 500)
+        self.max_queries = options.get('MAX_QUERIES', 20)
+        self.n_plus_one_threshold = options.get('N_PLUS_ONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        token = query_stats.begin_request_stats()
+        try:
+            with connections['default'].execute_wrapper(_django_query_wrapper):
+                response = self.get_response(request)
+        finally:
+            stats = query_stats.end_request_stats(token)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f'total;dur={stats.elapsed() * 1000:.1f}'
+            )
+        self._log(request, response, stats)
+        return response
+
+    def _log(self, request, response, stats):
+        reasons = []
+        if stats.elapsed() * 1000 >= self.slow_request_ms:
+            reasons.append('slow')
+        if stats.queries > self.max_queries:
+            reasons.append('too_many_queries')
+        if stats.repeated(self.n_plus_one_threshold):
+            reasons.append('n_plus_one')
+        if not reasons:
+            return
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'reasons': reasons,
+            **stats.summary(self.n_plus_one_threshold),
+        }
+        logger.warning("Request query stats: %s", json.dumps(record), extra={'query_stats': record})
@@ -0,0 +1,52 @@
+# utils/pagination.py
+
+import base64
+import uuid
+from datetime import date, datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    """Bungkus nilai kunci keyset (tanggal, uuid, angka) menjadi string aman-URL."""
+    raw = '|'.join(value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *parsers):
+    """
+    Kebalikan encode_cursor. Setiap bagian diubah dengan parser pada posisi
+    yang sama (mis. ``parse_timestamp, parse_uuid_strict``); raise InvalidCursor
+    bila cursor rusak.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if len(parts) != len(parsers):
+            raise ValueError("jumlah bagian cursor tidak sesuai")
+        return tuple(parse(part) for parse, part in zip(parsers, parts))
+    except (ValueError, TypeError, ArithmeticError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Cursor tidak valid: {cursor}") from e
+
+
+def parse_timestamp(value):
+    """Tanggal 'YYYY-MM-DD' menjadi date, selebihnya datetime."""
+    if len(value) == 10:
+        return date.fromisoformat(value)
+    return datetime.fromisoformat(value)
+
+
+def parse_uuid_strict(value):
+    return str(uuid.UUID(value))
+
+
+def parse_uuid(value):
+    """UUID dari query string, atau None bila kosong/tidak valid."""
+    if not value:
+        return None
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
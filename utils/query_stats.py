@@ -0,0 +1,133 @@
+# utils/query_stats.py
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+import psycopg2.extensions
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_request_stats = ContextVar('db_request_stats', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _options():
+    return getattr(settings, 'QUERY_STATS', {})
+
+
+def fingerprint(query):
+    """Teks SQL dengan spasi dirapikan; parameter tidak termasuk sehingga query yang sama berulang bisa dihitung."""
+    if isinstance(query, bytes):
+        query = query.decode(errors='replace')
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed dan sejenisnya
+        query = repr(query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class RequestStats:
+    """Jumlah query, total waktu DB, koneksi, dan fingerprint statement selama satu request."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.checkouts = 0
+        self.connects = 0
+        self.fingerprints = Counter()
+        self.fingerprint_time = Counter()
+
+    def record_query(self, query, duration):
+        key = fingerprint(query)
+        self.queries += 1
+        self.db_time += duration
+        self.fingerprints[key] += 1
+        self.fingerprint_time[key] += duration
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def repeated(self, threshold):
+        """Fingerprint yang dieksekusi setidaknya ``threshold`` kali (kandidat N+1)."""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+    def summary(self, n_plus_one_threshold):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round(self.elapsed() * 1000, 2),
+            'checkouts': self.checkouts,
+            'connects': self.connects,
+            'repeated': [
+                {
+                    'sql': key[:300],
+                    'count': count,
+                    'db_ms': round(self.fingerprint_time[key] * 1000, 2),
+                }
+                for key, count in self.repeated(n_plus_one_threshold)
+            ],
+        }
+
+
+def begin_request_stats():
+    return _request_stats.set(RequestStats())
+
+
+def end_request_stats(token):
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    return stats
+
+
+def current_stats():
+    return _request_stats.get()
+
+
+def record_checkout(connected=False):
+    """Dipanggil utils.db_connection saat koneksi diambil dari pool (atau dibuat baru)."""
+    stats = _request_stats.get()
+    if stats is not None:
+        if connected:
+            stats.connects += 1
+        else:
+            stats.checkouts += 1
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Cursor psycopg2 yang mencatat durasi setiap execute ke RequestStats request
+    yang sedang berjalan, dan menulis slow-query log bila melewati
+    QUERY_STATS['SLOW_QUERY_MS']. Di luar request hanya slow-query log yang aktif.
+    """
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def _record(self, query, duration):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record_query(query, duration)
+        slow_ms = _options().get('SLOW_QUERY_MS')
+        if slow_ms is not None and duration * 1000 >= slow_ms:
+            logger.warning(
+                "Slow query (%.1f ms): %s",
+                duration * 1000,
+                fingerprint(query)[:1000],
+                extra={'db_ms': round(duration * 1000, 2), 'sql': fingerprint(query)},
+            )
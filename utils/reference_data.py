@@ -0,0 +1,116 @@
+# utils/reference_data.py
+
+import logging
+
+from utils.db_connection import get_db_connection
+from utils.snapshot_cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+
+class StatusPesanan:
+    """Nama baris STATUS_PEMESANAN yang dipakai aplikasi."""
+    MENUNGGU_PEMBAYARAN = 'Menunggu Pembayaran'
+    MENCARI_PEKERJA = 'Mencari Pekerja Terdekat'
+    MENUNGGU_PEKERJA = 'Menunggu Pekerja Terdekat'
+    PEKERJA_TIBA = 'Pekerja Tiba di Lokasi'
+    SEDANG_DILAKUKAN = 'Pelayanan Jasa Sedang Dilakukan'
+    SELESAI = 'Pemesanan Selesai'
+    DIBATALKAN = 'Pemesanan Dibatalkan'
+
+
+class KategoriMyPay:
+    """Nama baris KATEGORI_TR_MYPAY yang dipakai aplikasi."""
+    TOP_UP = 'Top Up'
+    PEMBAYARAN_JASA = 'Pembayaran Jasa'
+    TRANSFER = 'Transfer'
+    WITHDRAW = 'Withdraw'
+    MENERIMA_HONOR = 'Menerima Honor'
+    PEMBELIAN_VOUCHER = 'Pembelian Voucher'
+
+
+class MetodeBayar:
+    """Nama baris METODE_BAYAR yang diperlakukan khusus."""
+    MYPAY = 'MyPay'
+
+
+class ReferenceData:
+    """
+    Snapshot tabel enumerasi kecil (STATUS_PEMESANAN, METODE_BAYAR,
+    KATEGORI_TR_MYPAY) sebagai map nama -> id. Id disimpan sebagai string.
+    Tidak boleh dimutasi.
+    """
+
+    def __init__(self, version, status, metode_bayar, kategori_mypay):
+        self.version = version
+        self.status = status
+        self.metode_bayar = metode_bayar
+        self.kategori_mypay = kategori_mypay
+        self.metode_bayar_by_id = {metode_id: nama for nama, metode_id in metode_bayar.items()}
+
+
+def _load_reference_data(version):
+    """Ambil ketiga tabel referensi dalam satu query."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT 'status', Id::text, Status FROM STATUS_PEMESANAN
+                UNION ALL
+                SELECT 'metode_bayar', Id::text, Nama FROM METODE_BAYAR
+                UNION ALL
+                SELECT 'kategori_mypay', Id::text, Nama FROM KATEGORI_TR_MYPAY;
+            """)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    tables = {'status': {}, 'metode_bayar': {}, 'kategori_mypay': {}}
+    for table, row_id, nama in rows:
+        tables[table][nama.strip()] = row_id
+    return ReferenceData(version, **tables)
+
+
+_cache = SnapshotCache('reference_data', _load_reference_data, 'REFERENCE_DATA_TTL', 'REFERENCE_DATA_MISS_RELOAD',
+                       ttl_default=600)
+
+
+def get_reference_data():
+    """Snapshot data referensi, dimuat ulang setelah REFERENCE_DATA_TTL."""
+    return _cache.get()
+
+
+def invalidate_reference_data():
+    """Panggil setelah mengubah STATUS_PEMESANAN, METODE_BAYAR, atau KATEGORI_TR_MYPAY."""
+    _cache.invalidate()
+
+
+def _lookup(table, key):
+    return _cache.lookup(lambda data: getattr(data, table).get(key))
+
+
+def get_status_id(status_name):
+    """Id STATUS_PEMESANAN untuk nama status, atau None bila tidak dikenal."""
+    return _lookup('status', status_name)
+
+
+def get_kategori_mypay_id(nama):
+    """Id KATEGORI_TR_MYPAY untuk nama kategori, atau None bila tidak dikenal."""
+    return _lookup('kategori_mypay', nama)
+
+
+def get_metode_bayar_id(nama):
+    """Id METODE_BAYAR untuk nama metode, atau None bila tidak dikenal."""
+    return _lookup('metode_bayar', nama)
+
+
+def get_metode_bayar_name(metode_id):
+    """Nama METODE_BAYAR untuk id (string dari form), atau None bila tidak dikenal."""
+    if not metode_id:
+        return None
+    return _lookup('metode_bayar_by_id', str(metode_id).lower())
+
+
+def list_metode_bayar():
+    """Seluruh metode pembayaran sebagai list (id, nama)."""
+    return [(metode_id, nama) for nama, metode_id in get_reference_data().metode_bayar.items()]
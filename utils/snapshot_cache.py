@@ -0,0 +1,123 @@
+# utils/snapshot_cache.py
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """
+    Snapshot per proses dari tabel kecil yang jarang berubah (katalog, harga,
+    data referensi). ``loader(version)`` memuat snapshot baru dari basis data;
+    snapshot sendiri tidak boleh dimutasi.
+
+    Snapshot dimuat ulang bila umurnya melewati setting ``ttl_setting``, bila
+    ``invalidate()`` dipanggil, atau saat lookup meleset dan umurnya melewati
+    ``miss_reload_setting``. Invalidasi juga menaikkan nomor generasi di cache
+    Django sehingga proses lain ikut memuat ulang paling lambat
+    SNAPSHOT_SYNC_INTERVAL detik kemudian (butuh CACHE_URL). Reload yang gagal
+    tidak membuang snapshot lama: snapshot lama tetap dipakai dan reload dicoba
+    lagi pada pemanggilan berikutnya.
+    """
+
+    def __init__(self, name, loader, ttl_setting, miss_reload_setting, ttl_default=300, miss_reload_default=30):
+        self.name = name
+        self._loader = loader
+        self._ttl_setting = (ttl_setting, ttl_default)
+        self._miss_reload_setting = (miss_reload_setting, miss_reload_default)
+        self._generation_key = f'snapshot:{name}:generation'
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+        self._generation = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._stale = False
+
+    def _age(self):
+        return time.monotonic() - self._loaded_at
+
+    def _shared_generation(self):
+        try:
+            return cache.get(self._generation_key, 0)
+        except Exception:
+            # Cache bersama tidak tersedia: andalkan TTL saja
+            logger.warning(f"Gagal membaca generasi snapshot {self.name} dari cache.", exc_info=True)
+            return self._generation
+
+    def _is_fresh(self):
+        if self._snapshot is None or self._stale or self._age() >= getattr(settings, *self._ttl_setting):
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < getattr(settings, 'SNAPSHOT_SYNC_INTERVAL', 5):
+            return True
+        self._checked_at = now
+        return self._shared_generation() == self._generation
+
+    def _load(self):
+        # Dibaca sebelum load agar invalidasi selama load memicu reload berikutnya
+        generation = self._shared_generation()
+        try:
+            snapshot = self._loader(self._version + 1)
+        except Exception:
+            if self._snapshot is None:
+                raise
+            logger.exception(f"Gagal memuat ulang {self.name}, memakai snapshot versi {self._version}.")
+            return self._snapshot
+        self._version += 1
+        self._snapshot = snapshot
+        self._generation = generation
+        self._loaded_at = self._checked_at = time.monotonic()
+        self._stale = False
+        logger.debug(f"Snapshot {self.name} loaded (version {self._version}).")
+        return snapshot
+
+    def get(self):
+        """Snapshot saat ini, dimuat ulang lebih dulu bila sudah kedaluwarsa."""
+        if self._is_fresh():
+            return self._snapshot
+        with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+            return self._load()
+
+    def reload(self, seen=None):
+        """
+        Paksa reload. Bila ``seen`` diberikan dan snapshot sudah diganti thread
+        lain sejak ``seen`` dibaca, snapshot terbaru langsung dikembalikan.
+        """
+        with self._lock:
+            if seen is not None and self._snapshot is not None and self._snapshot is not seen:
+                return self._snapshot
+            return self._load()
+
+    def lookup(self, find):
+        """
+        ``find(snapshot)``; bila hasilnya None dan snapshot sudah berumur lebih
+        dari miss_reload_setting detik, muat ulang sekali lalu cari lagi agar
+        baris yang baru ditambahkan langsung dikenali.
+        """
+        snapshot = self.get()
+        value = find(snapshot)
+        if value is None and self._age() >= getattr(settings, *self._miss_reload_setting):
+            value = find(self.reload(seen=snapshot))
+        return value
+
+    def invalidate(self):
+        """
+        Tandai snapshot kedaluwarsa di proses ini dan naikkan generasinya di
+        cache bersama. Snapshot lama tetap disajikan sampai reload berhasil.
+        """
+        with self._lock:
+            self._stale = True
+        try:
+            cache.add(self._generation_key, 0, None)
+            cache.incr(self._generation_key)
+        except Exception:
+            logger.warning(f"Gagal menaikkan generasi snapshot {self.name}; proses lain menunggu TTL.", exc_info=True)
+        logger.debug(f"Snapshot {self.name} invalidated.")
@@ -0,0 +1,62 @@
+# utils/testing.py
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+
+class FakeInfo:
+    transaction_status = TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    """
+    Koneksi psycopg2 tiruan untuk test tanpa basis data. Instance bisa dipakai
+    sebagai pengganti get_db_connection (memanggilnya mengembalikan dirinya
+    sendiri), sebagai koneksi, maupun sebagai cursor.
+
+    Setiap execute dicatat di ``executed`` beserta parameternya, dan
+    fetchone/fetchall mengembalikan hasil berikutnya dari ``results``.
+    ``log`` mencatat statement, COMMIT, dan ROLLBACK secara berurutan, dan
+    ``info.transaction_status`` mengikuti status transaksi seperti psycopg2.
+    Subclass meng-override ``execute`` untuk meniru efek query tertentu.
+    """
+
+    closed = False
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+        self.log = []
+        self.info = FakeInfo()
+
+    def __call__(self):
+        return self
+
+    def cursor(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        self.log.append(query)
+        self.info.transaction_status = TRANSACTION_STATUS_INTRANS
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    fetchall = fetchone
+
+    def commit(self):
+        self.log.append('COMMIT')
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.log.append('ROLLBACK')
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        pass
@@ -0,0 +1,200 @@
+import uuid
+from datetime import date, datetime
+
+from django.test import SimpleTestCase, override_settings
+
+from utils.db_connection import RequestScope, ScopedConnection
+from utils.pagination import InvalidCursor, decode_cursor, encode_cursor, parse_timestamp, parse_uuid_strict
+from utils.snapshot_cache import SnapshotCache
+from utils.testing import FakeConnection
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+        self.returned = []
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+class ScopedConnectionTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        self.scope = RequestScope(self.pool)
+        self.log = self.pool.conn.log
+
+    def handle(self):
+        return ScopedConnection(self.scope)
+
+    def test_handles_share_one_connection(self):
+        outer, inner = self.handle(), self.handle()
+        self.assertIs(outer._conn, inner._conn)
+        outer.close()
+        inner.close()
+        self.assertEqual(self.pool.returned, [])
+        self.scope.release()
+        self.assertEqual(self.pool.returned, [self.pool.conn])
+
+    def test_nested_close_keeps_outer_writes(self):
+        outer = self.handle()
+        with outer.cursor() as cursor:
+            cursor.execute("INSERT outer")
+        inner = self.handle()
+        with inner.cursor() as cursor:
+            cursor.execute("SELECT inner")
+        inner.close()
+        outer.commit()
+        self.assertEqual(self.log, [
+            "INSERT outer",
+            "SAVEPOINT scoped_1",
+            "SELECT inner",
+            "ROLLBACK TO SAVEPOINT scoped_1; RELEASE SAVEPOINT scoped_1",
+            "COMMIT",
+        ])
+
+    def test_nested_with_block_does_not_commit_outer(self):
+        outer = self.handle()
+        with outer.cursor() as cursor:
+            cursor.execute("INSERT outer")
+        with self.handle() as inner:
+            with inner.cursor() as cursor:
+                cursor.execute("INSERT inner")
+        self.assertNotIn('COMMIT', self.log)
+        self.assertEqual(self.log[-1], "RELEASE SAVEPOINT scoped_1")
+        outer.close()
+        self.assertEqual(self.log[-1], 'ROLLBACK')
+
+    def test_nested_error_only_discards_its_own_work(self):
+        outer = self.handle()
+        with outer.cursor() as cursor:
+            cursor.execute("INSERT outer")
+        with self.assertRaises(ValueError):
+            with self.handle() as inner:
+                with inner.cursor() as cursor:
+                    cursor.execute("INSERT inner")
+                raise ValueError
+        self.assertEqual(self.log[-1], "ROLLBACK TO SAVEPOINT scoped_1; RELEASE SAVEPOINT scoped_1")
+        outer.commit()
+        self.assertEqual(self.log[-1], 'COMMIT')
+
+    def test_unused_nested_handle_is_a_no_op(self):
+        outer = self.handle()
+        with outer.cursor() as cursor:
+            cursor.execute("INSERT outer")
+        inner = self.handle()
+        inner.commit()
+        inner.rollback()
+        inner.close()
+        self.assertEqual(self.log, ["INSERT outer"])
+
+    def test_handle_after_commit_owns_new_transaction(self):
+        with self.handle() as first:
+            with first.cursor() as cursor:
+                cursor.execute("INSERT first")
+        second = self.handle()
+        with second.cursor() as cursor:
+            cursor.execute("INSERT second")
+        second.commit()
+        self.assertEqual(self.log, ["INSERT first", "COMMIT", "INSERT second", "COMMIT"])
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip_date_and_uuid(self):
+        pesanan_id = str(uuid.uuid4())
+        cursor = encode_cursor(date(2024, 5, 1), pesanan_id)
+        self.assertEqual(
+            decode_cursor(cursor, parse_timestamp, parse_uuid_strict),
+            (date(2024, 5, 1), pesanan_id),
+        )
+
+    def test_round_trip_datetime(self):
+        waktu = datetime(2024, 5, 1, 13, 45, 10, 123456)
+        cursor = encode_cursor(waktu, 'abc')
+        self.assertEqual(decode_cursor(cursor, parse_timestamp, str), (waktu, 'abc'))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(date(2024, 5, 1), str(uuid.uuid4()))
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+
+    def test_invalid_cursor(self):
+        for cursor in ('', '!!!', encode_cursor('2024-05-01'), encode_cursor('bukan-tanggal', str(uuid.uuid4())),
+                       encode_cursor('2024-05-01', 'bukan-uuid')):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, parse_timestamp, parse_uuid_strict)
+
+
+class FakeLoader:
+    """Loader snapshot yang mengembalikan (atau raise) hasil berikutnya secara berurutan."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, version):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@override_settings(TEST_SNAPSHOT_TTL=300, TEST_SNAPSHOT_MISS_RELOAD=0, SNAPSHOT_SYNC_INTERVAL=0)
+class SnapshotCacheTests(SimpleTestCase):
+    def snapshots(self, loader):
+        return SnapshotCache(self.id(), loader, 'TEST_SNAPSHOT_TTL', 'TEST_SNAPSHOT_MISS_RELOAD')
+
+    def test_first_load_failure_is_raised(self):
+        with self.assertRaises(RuntimeError):
+            self.snapshots(FakeLoader(RuntimeError('db down'))).get()
+
+    def test_failed_reload_after_invalidate_keeps_old_snapshot(self):
+        loader = FakeLoader({'a': 1}, RuntimeError('db down'), {'a': 2})
+        snapshots = self.snapshots(loader)
+        snapshots.get()
+        snapshots.invalidate()
+        with self.assertLogs('utils.snapshot_cache', 'ERROR'):
+            self.assertEqual(snapshots.get(), {'a': 1})
+        # Reload dicoba lagi pada pemanggilan berikutnya
+        self.assertEqual(snapshots.get(), {'a': 2})
+
+    def test_failed_miss_reload_keeps_old_snapshot(self):
+        snapshots = self.snapshots(FakeLoader({'a': 1}, RuntimeError('db down')))
+        with self.assertLogs('utils.snapshot_cache', 'ERROR'):
+            self.assertIsNone(snapshots.lookup(lambda data: data.get('b')))
+        self.assertEqual(snapshots.lookup(lambda data: data.get('a')), 1)
+
+    def test_miss_reload_finds_new_row(self):
+        loader = FakeLoader({'a': 1}, {'a': 1, 'b': 2})
+        snapshots = self.snapshots(loader)
+        self.assertEqual(snapshots.lookup(lambda data: data.get('b')), 2)
+        self.assertEqual(snapshots.lookup(lambda data: data.get('b')), 2)
+        self.assertEqual(loader.calls, 2)
+
+    @override_settings(TEST_SNAPSHOT_MISS_RELOAD=300)
+    def test_miss_reload_is_rate_limited(self):
+        loader = FakeLoader({'a': 1})
+        snapshots = self.snapshots(loader)
+        self.assertIsNone(snapshots.lookup(lambda data: data.get('b')))
+        self.assertEqual(loader.calls, 1)
+
+    def test_invalidate_reaches_other_processes(self):
+        worker_a = self.snapshots(FakeLoader({'nama': 'Lama'}, {'nama': 'Baru'}))
+        worker_b = self.snapshots(FakeLoader({'nama': 'Lama'}))
+        self.assertEqual(worker_a.get(), {'nama': 'Lama'})
+        worker_b.get()
+
+        worker_b.invalidate()
+        self.assertEqual(worker_a.get(), {'nama': 'Baru'})
+
+    @override_settings(SNAPSHOT_SYNC_INTERVAL=300)
+    def test_shared_generation_checked_once_per_interval(self):
+        loader = FakeLoader({'nama': 'Lama'}, {'nama': 'Baru'})
+        worker_a = self.snapshots(loader)
+        worker_a.get()
+        self.snapshots(FakeLoader()).invalidate()
+        self.assertEqual(worker_a.get(), {'nama': 'Lama'})
+        self.assertEqual(loader.calls, 1)